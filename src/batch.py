@@ -0,0 +1,349 @@
+"""
+Program: Odin Digital
+Headless batch processing of images
+
+Usage:
+    python src/odindigital.py gray img/ -o out/
+    python src/odindigital.py rotate "img/*.png" --angle 30 -o out/ --workers 4
+    python src/odindigital.py resize img/ --width 256 --height 256 --mode fill -o out/
+    python src/odindigital.py pipeline img/ --spec edges.json -o out/
+    python src/odindigital.py gray img/ -o out/ --format png --format webp --encode webp_quality=80
+"""
+
+# IMPORTS
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import os
+import time
+
+from compare import diff_images
+from core import (FILES_ALLOWED, PROGRAM_NAME, VERSION_NUMBER,
+    compare_size_of_images, detect_edges, find_template, rotate_without_cropping, to_gray)
+from edges import THRESHOLD_METHODS
+from encoding import ENCODER_FORMATS, Output, encoder_params, parse_setting, write_outputs
+from geometry import INTERPOLATIONS, interpolation_flag
+from imagecache import read_image, set_raw_cache
+from instrument import (add_records, enable, stage, take_records, write_log,
+    write_trace)
+from lazyimport import lazy_import
+from pipeline import Pipeline
+from resizing import RESIZE_MODES, resize
+from roi import clip_roi, crop, parse_roi, to_image_point
+from tiling import TILED_OPERATIONS, process_tiled
+
+cv2 = lazy_import("cv2")
+
+# CONSTANTS
+
+IMAGE_EXTENSIONS = tuple(FILES_ALLOWED[0][1])
+OPERATIONS = ["gray", "rotate", "resize", "edges", "match", "compare", "pipeline"]
+
+# Image loaded once in every worker process: template of "match" and
+# reference of "compare"
+_worker_image = None
+# Pipeline of "pipeline", loaded once in every worker process so that its
+# buffers are reused from one image to the next
+_worker_pipeline = None
+
+# FUNCTIONS
+
+def collect_images(inputs):
+    """Expands directories and glob patterns into a list of image files
+
+    Args:
+        inputs (list of str): files, directories or glob patterns
+
+    Returns:
+        list of str: sorted paths of the image files, without duplicates
+    """
+
+    paths = set()
+
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = [os.path.join(entry, name) for name in os.listdir(entry)]
+        else:
+            candidates = glob.glob(entry) or [entry]
+
+        paths.update(path for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+
+    return sorted(paths)
+
+def init_worker(image_path, pipeline_path, trace, raw_cache = None):
+    """Loads the template, reference image or pipeline of the batch in a
+    worker process
+
+    Args:
+        image_path (str): path of the image, or None if not needed
+        pipeline_path (str): path of the pipeline JSON file, or None if not
+            needed
+        trace (bool): True to record the processing stages
+        raw_cache (str): directory of the raw cache the images are read
+            from, or None
+    """
+
+    global _worker_image, _worker_pipeline
+
+    if trace:
+        enable()
+    if raw_cache is not None:
+        set_raw_cache(raw_cache)
+
+    if image_path is not None:
+        _worker_image = read_image(image_path)
+    if pipeline_path is not None:
+        _worker_pipeline = Pipeline.load(pipeline_path)
+
+def parse_arguments(argv):
+    """Parses the command line of the batch mode
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        prog = "odindigital",
+        description = f"{PROGRAM_NAME} v{VERSION_NUMBER} batch processing"
+    )
+    subparsers = parser.add_subparsers(dest = "operation", required = True)
+
+    operation_parsers = {}
+    for operation in OPERATIONS:
+        operation_parsers[operation] = subparsers.add_parser(operation)
+        operation_parsers[operation].add_argument("inputs", nargs = "+",
+            help = "image files, directories or glob patterns")
+        operation_parsers[operation].add_argument("-o", "--output", required = True,
+            help = "directory where the results are saved")
+        operation_parsers[operation].add_argument("-w", "--workers", type = int,
+            default = os.cpu_count(), help = "number of worker processes")
+        operation_parsers[operation].add_argument("--trace",
+            help = "file where the time and memory of every processing stage "
+            "are saved: a Chrome trace for .json, JSON lines otherwise")
+        operation_parsers[operation].add_argument("--roi", type = parse_roi,
+            help = "region X,Y,WIDTH,HEIGHT of the images to process, the "
+            "result is that of the region and locations are those of the image")
+        operation_parsers[operation].add_argument("--format", action = "append",
+            help = "extension of a format the results are saved in, repeated to "
+            "save several formats in parallel (default: that of the input)")
+        operation_parsers[operation].add_argument("--encode", type = parse_setting,
+            action = "append", metavar = "KEY=VALUE", help = "encoder setting, such as "
+            "png_compression=6 or jpeg_quality=90 (see src/encoding.py), repeatable")
+        operation_parsers[operation].add_argument("--raw-cache",
+            help = "directory where decoded images are kept as raw files, "
+            "mapped instead of decoded by later runs (see src/rawcache.py)")
+        if operation in TILED_OPERATIONS:
+            operation_parsers[operation].add_argument("--tiled", action = "store_true",
+                help = "process the images in strips to bound memory, PGM/PPM "
+                "files are read and written without loading them whole")
+
+    operation_parsers["rotate"].add_argument("--angle", type = float, required = True,
+        help = "rotation angle in degrees, counterclockwise")
+    operation_parsers["resize"].add_argument("--width", type = int,
+        help = "new width, omit it to keep the aspect ratio")
+    operation_parsers["resize"].add_argument("--height", type = int,
+        help = "new height, omit it to keep the aspect ratio")
+    operation_parsers["resize"].add_argument("--mode", choices = RESIZE_MODES,
+        default = "stretch", help = "with both sizes, stretch to them, fit within "
+        "them or fill them cropping the center (default: stretch)")
+    operation_parsers["resize"].add_argument("--interpolation",
+        choices = ["auto"] + list(INTERPOLATIONS), default = "auto",
+        help = "default: area when shrinking, bicubic or Lanczos when enlarging, "
+        "the only choice with --tiled")
+    operation_parsers["rotate"].add_argument("--interpolation",
+        choices = list(INTERPOLATIONS), default = "linear")
+    operation_parsers["edges"].add_argument("--thresholds", type = parse_thresholds,
+        default = "median", help = "median, otsu or the low and high thresholds "
+        "of the hysteresis as LOW,HIGH (default: median)")
+    operation_parsers["match"].add_argument("--template", required = True,
+        help = "image to find within every input image")
+    operation_parsers["match"].add_argument("--levels", type = int, default = None,
+        help = "pyramid levels of the search, 0 for an exhaustive search "
+        "(default: chosen from the template size)")
+    operation_parsers["compare"].add_argument("--reference", required = True,
+        help = "image every input image is compared with")
+    operation_parsers["pipeline"].add_argument("--spec", required = True,
+        help = "JSON file of the pipeline, as saved by Pipeline.save")
+    operation_parsers["compare"].add_argument("--tolerance", type = int, default = 0,
+        help = "largest difference of a channel that is not counted as a change")
+
+    arguments = parser.parse_args(argv)
+
+    if getattr(arguments, "tiled", False) and arguments.roi is not None:
+        parser.error("--tiled and --roi cannot be combined")
+    if getattr(arguments, "tiled", False) and (arguments.format or arguments.encode):
+        parser.error("--tiled results are saved in the format of the input, "
+            "without --format or --encode")
+    for extension in arguments.format or []:
+        if not cv2.haveImageWriter(f"image.{extension.lstrip('.')}"):
+            parser.error(f"{extension} is not a format that can be written")
+    try:
+        for extension in ENCODER_FORMATS:
+            encoder_params(extension, dict(arguments.encode or []))
+    except ValueError as error:
+        parser.error(str(error))
+    if arguments.operation == "resize":
+        if arguments.width is None and arguments.height is None:
+            parser.error("resize needs --width, --height or both")
+        if arguments.tiled and (arguments.width is None or arguments.height is None
+            or arguments.mode != "stretch" or arguments.interpolation != "auto"):
+            parser.error("--tiled resizes need --width and --height, the stretch "
+                "mode and the default interpolation")
+
+    return arguments
+
+def parse_thresholds(text):
+    """Parses the --thresholds option of edges
+
+    Args:
+        text (str): threshold method, or LOW,HIGH
+
+    Returns:
+        str or tuple (int, int): threshold method, or low and high thresholds
+    """
+
+    if text in THRESHOLD_METHODS:
+        return text
+
+    try:
+        low, high = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected {', '.join(THRESHOLD_METHODS)} or LOW,HIGH") from None
+
+    return (low, high)
+
+def process_file(operation, options, input_path, output_dir):
+    """Applies an operation to an image file and saves the result
+
+    Args:
+        operation (str): one of OPERATIONS
+        options (dict): parsed command-line options of the operation
+        input_path (str): path of the image to process
+        output_dir (str): directory where the result is saved
+
+    Returns:
+        tuple (str, str, list of dict): input path, a short report of the
+            result and the records of its processing stages
+    """
+
+    output_path = os.path.join(output_dir, os.path.basename(input_path))
+
+    if options.get("tiled") and operation in TILED_OPERATIONS:
+        with stage("process_tiled", path = input_path):
+            process_tiled(input_path, output_path, operation,
+                width = options.get("width"), height = options.get("height"),
+                thresholds = options.get("thresholds"))
+        return (input_path, "done (tiled)", take_records())
+
+    image = read_image(input_path)
+    if image is None:
+        raise ValueError(f"{input_path} cannot be read as an image")
+
+    # the operations work on a view of the region, match and compare on the
+    # whole images so that the locations they report are those of the image
+    roi = options.get("roi")
+    if roi is not None:
+        roi = clip_roi(roi, image.shape)
+    region = crop(image, roi)
+    report = "done"
+
+    if operation == "gray":
+        result = to_gray(region)
+    elif operation == "rotate":
+        result = rotate_without_cropping(region, options["angle"],
+            interpolation_flag(options["interpolation"]))
+    elif operation == "resize":
+        result = resize(region, options["width"], options["height"], options["mode"],
+            interpolation_flag(options["interpolation"]))
+    elif operation == "edges":
+        result = detect_edges(region, options["thresholds"])
+    elif operation == "pipeline":
+        result = _worker_pipeline.run(region)
+        if _worker_pipeline.detections:
+            report = ("matches at "
+                f"{[to_image_point(corners[0], roi) for corners in _worker_pipeline.detections]}")
+    elif operation == "match":
+        top_left, bottom_right = find_template(image, _worker_image, options["levels"], roi)
+        result = image.copy()
+        cv2.rectangle(result, top_left, bottom_right, (0, 255, 0), 3)
+        report = f"match at {top_left}"
+    else:
+        if not compare_size_of_images(image, _worker_image):
+            raise ValueError(f"{input_path} and the reference image differ in size")
+        difference = diff_images(image, _worker_image, options["tolerance"], roi)
+        result = difference.mask
+        report = (f"difference: "
+            f"{100 * difference.changed_pixels / result.size:.2f}%, "
+            f"largest change {max(difference.max_delta)}, "
+            f"region {difference.bounding_box}")
+
+    # several formats are encoded in parallel from the same result
+    settings = dict(options.get("encode") or [])
+    if options.get("format"):
+        stem = os.path.splitext(output_path)[0]
+        outputs = [Output(f"{stem}.{extension.lstrip('.')}", settings)
+            for extension in options["format"]]
+    else:
+        outputs = [Output(output_path, settings)]
+    write_outputs(result, outputs)
+
+    return (input_path, report, take_records())
+
+def main(argv):
+    """Runs the batch mode
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        int: exit status, 0 if every image was processed
+    """
+
+    args = parse_arguments(argv)
+    options = vars(args)
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        print("No images found")
+        return 1
+
+    os.makedirs(args.output, exist_ok = True)
+    worker_image_path = options.get("template", options.get("reference"))
+
+    failures = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers = args.workers,
+        initializer = init_worker,
+        initargs = (worker_image_path, options.get("spec"), bool(args.trace),
+            args.raw_cache)) as executor:
+        futures = [executor.submit(process_file, args.operation, options, path, args.output)
+            for path in paths]
+        for future in futures:
+            try:
+                input_path, report, records = future.result()
+                add_records(records)
+                print(f"{input_path}: {report}")
+            except Exception as error: # pylint: disable=broad-except
+                failures += 1
+                print(f"Error: {error}")
+
+    elapsed = time.perf_counter() - start
+    processed = len(paths) - failures
+    print(f"{processed} images processed in {elapsed:.2f} s "
+        f"({processed / elapsed:.1f} images/sec), {failures} errors")
+
+    if args.trace:
+        if args.trace.lower().endswith(".json"):
+            write_trace(args.trace)
+        else:
+            write_log(args.trace)
+
+    return 0 if failures == 0 else 1
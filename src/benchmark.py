@@ -0,0 +1,683 @@
+"""
+Program: Odin Digital
+Benchmarks of the image processing functions
+
+Usage:
+    python src/benchmark.py
+"""
+
+# IMPORTS
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from compare import diff_images, perceptual_hash, query_hash_index
+from core import (PROGRAM_NAME, detect_edges, find_template, image_cv2_to_pil, is_grayscale,
+    rotate_without_cropping)
+from edges import compute_gradients, edges_from_gradients, find_edges, find_edges_multi
+from encoding import Output, SaveQueue, encode_image, write_image, write_outputs
+from geometry import rotation_transform
+from instrument import disable, enable, instrumented, take_records
+from matching import choose_correlation, match_templates, prepare_scene, score_map
+from pipeline import Pipeline
+from rawcache import build_raw, open_raw
+from regression import run_regression
+from resizing import resize, thumbnail_ladder
+from roi import crop
+from stream import FrameStream, TemplateTracker, run_stream
+from tiling import create_netpbm, process_tiled
+
+# CONSTANTS
+
+REPEATS = 5
+
+# FUNCTIONS
+
+def best_time(function, *args):
+    """Measures the best wall time of several calls to a function
+
+    Args:
+        function (callable): function to measure
+        *args: arguments passed to the function
+
+    Returns:
+        float: best time in seconds
+    """
+
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+def import_time(statement):
+    """Measures the import time of a statement in a new interpreter
+
+    Args:
+        statement (str): Python statement run with python -X importtime
+
+    Returns:
+        float: best time in seconds of the modules the statement imports
+    """
+
+    times = []
+    for _ in range(REPEATS):
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+            cwd = os.path.dirname(os.path.abspath(__file__)), capture_output = True,
+            text = True, check = True).stderr
+        # sum of the cumulative times in microseconds of the top-level
+        # imports, which include those of the modules they import
+        total = 0
+        for line in output.splitlines()[1:]:
+            _, cumulative, name = line.split("|")
+            if not name.startswith("  "):
+                total += int(cumulative)
+        times.append(total / 1e6)
+
+    return min(times)
+
+def legacy_is_grayscale(image):
+    """Pixel-by-pixel is_grayscale of Odin Digital v1.3, kept as a reference
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        bool: True if the image is grayscale, False otherwise
+    """
+
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    for i in range(rgb_image.shape[0]):
+        for j in range(rgb_image.shape[1]):
+            (r_value, g_value, b_value) = rgb_image[i, j]
+            if not r_value == g_value == b_value:
+                return False
+
+    return True
+
+def benchmark_image_cv2_to_pil():
+    """Compares image_cv2_to_pil with the cvtColor and fromarray calls of
+    Odin Digital v1.3, which only supported BGR images
+    """
+
+    print("image_cv2_to_pil")
+
+    color = cv2.resize(cv2.imread("img/baboon.png"), (4000, 3000))
+    layouts = (
+        ("gray", cv2.cvtColor(color, cv2.COLOR_BGR2GRAY)),
+        ("BGR", color),
+        ("BGRA", cv2.cvtColor(color, cv2.COLOR_BGR2BGRA)),
+        ("16-bit BGR", color.astype(np.uint16) * 257)
+    )
+
+    def legacy_conversion(image):
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    for name, image in layouts:
+        new_seconds = best_time(image_cv2_to_pil, image)
+        report = f"    12 MP {name}: {new_seconds * 1e3:.2f} ms"
+        if name == "BGR":
+            legacy_seconds = best_time(legacy_conversion, image)
+            report += f", v1.3 {legacy_seconds * 1e3:.1f} ms"
+        print(report)
+
+def benchmark_instrumentation():
+    """Measures the cost of the instrumentation hooks per call"""
+
+    print("instrumentation")
+
+    calls = 100000
+    image = np.zeros((8, 8, 3), np.uint8)
+
+    def plain(image):
+        return image
+
+    hooked = instrumented()(plain)
+
+    def call_all(function):
+        for _ in range(calls):
+            function(image)
+
+    plain_seconds = best_time(call_all, plain)
+    disabled_seconds = best_time(call_all, hooked)
+    enable()
+    enabled_seconds = best_time(call_all, hooked)
+    disable()
+    take_records()
+
+    print(f"    overhead per call: disabled {(disabled_seconds - plain_seconds) / calls * 1e9:.0f} ns, "
+        f"enabled {(enabled_seconds - plain_seconds) / calls * 1e6:.1f} us")
+
+def benchmark_is_grayscale():
+    """Compares the vectorized is_grayscale with the pixel loop of v1.3
+
+    The pixel loop is timed on a small image only, its cost per megapixel
+    is extrapolated to the large image.
+    """
+
+    print("is_grayscale")
+
+    small_gray = cv2.cvtColor(
+        cv2.cvtColor(cv2.imread("img/baboon.png"), cv2.COLOR_BGR2GRAY),
+        cv2.COLOR_GRAY2BGR)
+    legacy_seconds_per_mp = best_time(legacy_is_grayscale, small_gray) / (
+        small_gray.shape[0] * small_gray.shape[1] / 1e6)
+
+    large_gray = cv2.resize(small_gray, (6000, 4000))
+    large_color = cv2.resize(cv2.imread("img/baboon.png"), (6000, 4000))
+    megapixels = 6000 * 4000 / 1e6
+
+    gray_seconds = best_time(is_grayscale, large_gray)
+    legacy_seconds = legacy_seconds_per_mp * megapixels
+    print(f"    24 MP grayscale: {gray_seconds * 1e3:.2f} ms, "
+        f"v1.3 loop ~{legacy_seconds:.1f} s ({legacy_seconds / gray_seconds:.0f}x faster)")
+
+    # colored pixels are found in the row sample, before the full scan
+    color_seconds = best_time(is_grayscale, large_color)
+    print(f"    24 MP color: {color_seconds * 1e3:.2f} ms")
+
+def benchmark_diff_images():
+    """Compares diff_images with the absdiff, cvtColor and countNonZero calls
+    of Odin Digital v1.3
+    """
+
+    print("diff_images")
+
+    image_a = cv2.resize(cv2.imread("img/image_a.png"), (6000, 4000))
+    image_b = cv2.resize(cv2.imread("img/image_b.png"), (6000, 4000))
+
+    def legacy_difference():
+        difference = cv2.absdiff(image_a, image_b)
+        return cv2.countNonZero(cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY))
+
+    for name, function in (("v1.3 calls", legacy_difference),
+        ("diff_images", lambda: diff_images(image_a, image_b))):
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"    24 MP {name}: {best_time(function) * 1e3:.1f} ms, "
+            f"{peak / 2**20:.0f} MiB allocated")
+
+def benchmark_hash_index():
+    """Measures a query of a perceptual hash against 100k references"""
+
+    print("hash index")
+
+    rng = np.random.default_rng(0)
+    index = {
+        "paths": [f"reference_{i}.png" for i in range(100000)],
+        "hashes": rng.integers(0, 2**63, 100000, dtype = np.int64).astype(np.uint64),
+        "hash_function": "phash"
+    }
+    image_hash_value = perceptual_hash(cv2.imread("img/lena.bmp"))
+
+    hash_seconds = best_time(perceptual_hash, cv2.imread("img/lena.bmp"))
+    query_seconds = best_time(query_hash_index, index, image_hash_value, 10)
+    print(f"    pHash of a 512x512 image: {hash_seconds * 1e3:.2f} ms, "
+        f"query of 100k references: {query_seconds * 1e3:.2f} ms")
+
+def benchmark_encoders():
+    """Measures the encoding time against the file size of every encoder
+    setting, the parallel writing of several outputs and the time the save
+    queue blocks its caller
+    """
+
+    print("encoders (encode time, size)")
+
+    photo = cv2.resize(cv2.imread("img/baboon.png"), (2400, 1800),
+        interpolation = cv2.INTER_CUBIC)
+    # flat areas, lines and text, as a screenshot
+    screenshot = np.full((1800, 2400, 3), 240, np.uint8)
+    for index in range(60):
+        cv2.rectangle(screenshot, (40 * index, 30 * index), (40 * index + 300, 30 * index + 80),
+            (index * 4, 128, 255 - index * 4), -1)
+        cv2.putText(screenshot, f"Row {index}: {PROGRAM_NAME} regression screenshot",
+            (20, 30 * index + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1)
+
+    settings = [(".png", {"png_compression": level}) for level in (0, 1, 3, 6, 9)]
+    settings += [(".jpg", {"jpeg_quality": quality}) for quality in (75, 90, 95)]
+    settings += [(".jpg", {"jpeg_quality": 90, "jpeg_progressive": True}),
+        (".jpg", {"jpeg_quality": 90, "jpeg_optimize": True})]
+    settings += [(".webp", {"webp_quality": quality}) for quality in (75, 90)]
+    settings += [(".webp", {"webp_lossless": True})]
+    settings += [(".tif", {"tiff_compression": compression, "tiff_predictor": predictor})
+        for compression, predictor in (("none", False), ("lzw", False), ("lzw", True),
+        ("deflate", True), ("packbits", False))]
+
+    for name, image in (("photo", photo), ("screenshot", screenshot)):
+        print(f"    {name} 2400x1800 ({image.nbytes / 2**20:.1f} MiB raw)")
+        for extension, setting in settings:
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                size = encode_image(image, extension, setting).nbytes
+                times.append(time.perf_counter() - start)
+            description = ", ".join(f"{key} {value}" for key, value in setting.items())
+            print(f"        {extension} {description}: {min(times) * 1e3:.0f} ms, "
+                f"{size / 2**20:.2f} MiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        outputs = [Output(os.path.join(directory, "full.png")),
+            Output(os.path.join(directory, "full.jpg")),
+            Output(os.path.join(directory, "full.webp")),
+            Output(os.path.join(directory, "full.tif")),
+            Output(os.path.join(directory, "large.jpg"), size = (1200, 1200)),
+            Output(os.path.join(directory, "thumbnail.jpg"), size = (256, 256))]
+        sequential_seconds = best_time(lambda: write_outputs(photo, outputs, 1))
+        parallel_seconds = best_time(write_outputs, photo, outputs)
+        print(f"    {len(outputs)} outputs of one photo: one thread {sequential_seconds:.2f} s, "
+            f"{os.cpu_count()} threads {parallel_seconds:.2f} s")
+
+        path = os.path.join(directory, "queued.png")
+        synchronous_seconds = best_time(write_image, path, photo)
+        with SaveQueue() as saves:
+            start = time.perf_counter()
+            saves.submit(photo, path)
+            submit_seconds = time.perf_counter() - start
+            saves.wait()
+        print(f"    PNG save: {synchronous_seconds * 1e3:.0f} ms synchronous, caller "
+            f"blocked {submit_seconds * 1e3:.2f} ms with the save queue")
+
+def benchmark_find_edges():
+    """Compares find_edges with the Canny call of Odin Digital v1.3, and the
+    reuse of the gradients for several thresholds
+    """
+
+    print("find_edges")
+
+    image = np.tile(cv2.imread("img/baboon.png"), (8, 12, 1))[:4000, :6000]
+
+    legacy_seconds = best_time(cv2.Canny, image, 100, 200)
+    print(f"    24 MP v1.3 Canny on BGR: {legacy_seconds * 1e3:.1f} ms")
+
+    for workers in sorted({1, os.cpu_count()}):
+        seconds = best_time(find_edges, image, "median", 5, workers)
+        print(f"    24 MP find_edges, {workers} threads: {seconds * 1e3:.1f} ms")
+
+    gradients = compute_gradients(image)
+    blurred_canny = cv2.Canny(gradients.gray, 100, 200)
+    identical = np.array_equal(edges_from_gradients(gradients, 100, 200), blurred_canny)
+    print(f"    banded gradients identical to a single Canny call: {identical}")
+
+    thresholds_list = [(25, 50), (50, 100), (100, 200), (150, 300), "median", "otsu"]
+    separate_seconds = best_time(
+        lambda: [find_edges(image, thresholds) for thresholds in thresholds_list])
+    shared_seconds = best_time(find_edges_multi, image, thresholds_list)
+    print(f"    {len(thresholds_list)} thresholds: separate {separate_seconds * 1e3:.1f} ms, "
+        f"shared gradients {shared_seconds * 1e3:.1f} ms")
+
+def benchmark_find_template():
+    """Compares the pyramid search of find_template with the exhaustive one"""
+
+    print("find_template")
+
+    image = cv2.imread("img/match_image.png")
+    template = cv2.imread("img/match_template.png")
+
+    for scale in (1, 2, 4):
+        scaled_image = cv2.resize(image, None, fx = scale, fy = scale)
+        scaled_template = cv2.resize(template, None, fx = scale, fy = scale)
+
+        exhaustive_seconds = best_time(find_template, scaled_image, scaled_template, 0)
+        pyramid_seconds = best_time(find_template, scaled_image, scaled_template)
+
+        exhaustive_loc = find_template(scaled_image, scaled_template, 0)[0]
+        pyramid_loc = find_template(scaled_image, scaled_template)[0]
+        offset = max(abs(exhaustive_loc[0] - pyramid_loc[0]),
+            abs(exhaustive_loc[1] - pyramid_loc[1]))
+
+        print(f"    {scaled_image.shape[1]}x{scaled_image.shape[0]} image, "
+            f"{scaled_template.shape[1]}x{scaled_template.shape[0]} template: "
+            f"exhaustive {exhaustive_seconds * 1e3:.1f} ms, "
+            f"pyramid {pyramid_seconds * 1e3:.1f} ms "
+            f"({exhaustive_seconds / pyramid_seconds:.1f}x), offset {offset} px")
+
+def benchmark_raw_cache():
+    """Compares decoding with cv2.imread and mapping the raw cache
+
+    The raw files are read from the page cache, right after being written:
+    from disk, mapping them whole costs the read of the pixels, while a crop
+    still reads only its rows.
+    """
+
+    print("raw cache")
+
+    image = np.ascontiguousarray(np.tile(cv2.imread("img/baboon.png"), (8, 12, 1))[:4000, :6000])
+    template = image[1800:2000, 2800:3100].copy()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in (".png", ".jpg", ".tiff"):
+            path = os.path.join(directory, "large" + extension)
+            cv2.imwrite(path, image)
+
+            decode_seconds = best_time(cv2.imread, path)
+            start = time.perf_counter()
+            build_raw(path, directory, image = cv2.imread(path))
+            first_seconds = time.perf_counter() - start
+            map_seconds = best_time(open_raw, path, directory)
+            whole_seconds = best_time(lambda: open_raw(path, directory).copy())
+            crop_seconds = best_time(lambda: open_raw(path, directory)[1000:1512, 1000:1512].copy())
+            decoded_match_seconds = best_time(lambda: find_template(cv2.imread(path), template))
+            match_seconds = best_time(lambda: find_template(open_raw(path, directory), template))
+
+            print(f"    24 MP {extension[1:]}: imread {decode_seconds * 1e3:.1f} ms, "
+                f"first access (decode and write) {first_seconds * 1e3:.1f} ms, "
+                f"repeat access {map_seconds * 1e3:.2f} ms")
+            print(f"        then read whole {whole_seconds * 1e3:.1f} ms, "
+                f"crop 512x512 {crop_seconds * 1e3:.2f} ms; read and find_template: "
+                f"imread {decoded_match_seconds * 1e3:.1f} ms, map {match_seconds * 1e3:.1f} ms")
+
+def benchmark_match_backends():
+    """Compares the spatial and Fourier correlations of match_templates and
+    shows where the automatic choice switches between them
+    """
+
+    print("template matching backends (spatial / FFT / FFT with the scene transform shared)")
+
+    source = cv2.imread("img/baboon.png", cv2.IMREAD_GRAYSCALE)
+
+    for width, height in ((640, 480), (1280, 960), (2560, 1920)):
+        image = np.ascontiguousarray(np.tile(source, (4, 6))[:height, :width])
+        line = []
+
+        for fraction in (0.05, 0.1, 0.2, 0.3, 0.5, 0.7):
+            template = image[:int(height * fraction), :int(width * fraction)].astype(np.float32)
+            scene = prepare_scene(image)
+            spatial_seconds = best_time(score_map, scene, template, "spatial")
+            # a copy without the transform of the scene, computed every time
+            fft_seconds = best_time(lambda: score_map(dict(scene), template, "fft"))
+            score_map(scene, template, "fft")
+            shared_seconds = best_time(score_map, scene, template, "fft")
+            chosen = choose_correlation(image.shape, template.shape)
+            line.append(f"{fraction:g}: {spatial_seconds * 1e3:.0f}/{fft_seconds * 1e3:.0f}/"
+                f"{shared_seconds * 1e3:.0f} ms ({chosen})")
+
+        print(f"    {width}x{height}, template side fraction " + ", ".join(line))
+
+    image = cv2.imread("img/baboon.png")
+    image = np.ascontiguousarray(np.tile(image, (4, 4, 1))[:1440, :1920])
+    templates = [image[y:y + 160, x:x + 200].copy() for y in range(0, 1200, 300)
+        for x in range(0, 1600, 400)]
+
+    for method in ("spatial", "fft", "auto"):
+        seconds = best_time(match_templates, image, templates, (1.0,), (0,), 0.8, 0.3, None,
+            method)
+        print(f"    {len(templates)} templates of 200x160 in 1920x1440, {method}: "
+            f"{seconds * 1e3:.0f} ms")
+
+def benchmark_regression():
+    """Measures the throughput of the visual regression over generated
+    screenshots, and the memory of the main process as the pairs grow
+    """
+
+    print("visual regression")
+
+    source = cv2.resize(cv2.imread("img/baboon.png"), (320, 240))
+
+    for count in (1000, 4000):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_dir = os.path.join(directory, "baseline")
+            candidate_dir = os.path.join(directory, "candidate")
+            os.makedirs(baseline_dir)
+            os.makedirs(candidate_dir)
+
+            # 80% identical files, 10% identical pixels encoded differently
+            # and 10% changed pixels
+            for index in range(count):
+                name = f"screen_{index:05d}.png"
+                image = np.roll(source, index, axis = 1)
+                cv2.imwrite(os.path.join(baseline_dir, name), image)
+                if index % 10 == 8:
+                    cv2.imwrite(os.path.join(candidate_dir, name), image,
+                        [cv2.IMWRITE_PNG_COMPRESSION, 9])
+                elif index % 10 == 9:
+                    image = image.copy()
+                    image[100:120, 150:200] = 0
+                    cv2.imwrite(os.path.join(candidate_dir, name), image)
+                else:
+                    shutil.copyfile(os.path.join(baseline_dir, name),
+                        os.path.join(candidate_dir, name))
+
+            tracemalloc.start()
+            summary = run_regression(baseline_dir, candidate_dir,
+                os.path.join(directory, "report"))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        print(f"    {count} pairs of 320x240: {summary['pairs_per_s']:.0f} pairs/sec "
+            f"({summary['identical']} identical, {summary['failed']} failed), "
+            f"peak allocated in the main process {peak / 2**20:.1f} MiB")
+
+def benchmark_resize():
+    """Compares the resizing engine with the bilinear cv2.resize of
+    Odin Digital v1.3
+
+    Downscales are scored against a direct INTER_AREA resize, which averages
+    every source pixel; enlargements against the image they were shrunk from.
+    """
+
+    print("resize")
+
+    # tiled rather than enlarged, so that it keeps fine detail that aliases
+    image = np.tile(cv2.imread("img/baboon.png"), (8, 12, 1))[:4000, :6000]
+    megapixels = 6000 * 4000 / 1e6
+
+    for size in ((1500, 1000), (1234, 823), (256, 171)):
+        reference = cv2.resize(image, size, interpolation = cv2.INTER_AREA)
+        for name, function in (("v1.3 bilinear", lambda: cv2.resize(image, size)),
+            ("resize", lambda: resize(image, *size))):
+            seconds = best_time(function)
+            print(f"    24 MP to {size[0]}x{size[1]} {name}: {seconds * 1e3:.1f} ms "
+                f"({megapixels / seconds:.0f} MP/s), "
+                f"PSNR {cv2.PSNR(function(), reference):.1f} dB")
+
+    original = cv2.imread("img/baboon.png")
+    small = cv2.resize(original, None, fx = 0.25, fy = 0.25, interpolation = cv2.INTER_AREA)
+    size = (original.shape[1], original.shape[0])
+    print(f"    4x enlargement, PSNR to the original: "
+        f"v1.3 bilinear {cv2.PSNR(cv2.resize(small, size), original):.1f} dB, "
+        f"resize {cv2.PSNR(resize(small, *size), original):.1f} dB")
+
+    sizes = [(2048, 2048), (1024, 1024), (512, 512), (256, 256), (128, 128), (64, 64)]
+    separate_seconds = best_time(lambda: [resize(image, *size, "fit") for size in sizes])
+    ladder_seconds = best_time(thumbnail_ladder, image, sizes)
+    print(f"    ladder of {len(sizes)} thumbnails: separate {separate_seconds * 1e3:.1f} ms, "
+        f"shared levels {ladder_seconds * 1e3:.1f} ms")
+
+def benchmark_roi():
+    """Compares the tools on a whole 24 MP image and on regions of interest
+    of several sizes, whose cost should scale with their area
+    """
+
+    print("regions of interest of a 6144x4096 image (whole image / regions)")
+
+    image = np.ascontiguousarray(np.tile(cv2.imread("img/baboon.png"), (8, 12, 1)))
+    other = image.copy()
+    other[2000:2010, 3000:3010] = 0
+    template = image[2100:2160, 3100:3180].copy()
+    regions = [(3000, 2000, side, side) for side in (256, 512, 1024)]
+
+    operations = {
+        "gray": lambda roi: cv2.cvtColor(crop(image, roi), cv2.COLOR_BGR2GRAY),
+        "edges": lambda roi: detect_edges(image, "median", roi),
+        "diff": lambda roi: diff_images(image, other, 0, roi),
+        "find_template": lambda roi: find_template(image, template, None, roi)
+    }
+
+    for name, operation in operations.items():
+        whole_seconds = best_time(operation, None)
+        line = [f"{roi[2]}x{roi[3]} {best_time(operation, roi) * 1e3:.1f} ms"
+            for roi in regions]
+        print(f"    {name}: {whole_seconds * 1e3:.0f} ms / " + ", ".join(line))
+
+def benchmark_rotate():
+    """Compares the right-angle rotation and the composed transforms with
+    the warps of Odin Digital v1.3
+    """
+
+    print("rotate")
+
+    image = cv2.resize(cv2.imread("img/baboon.png"), (6000, 4000))
+
+    def legacy_rotate(angle):
+        # v1.3 warped every angle, even right ones
+        matrix, size = rotation_transform((6000, 4000), angle + 1e-9)
+        return cv2.warpAffine(image, matrix[:2], size)
+
+    for angle in (90, 30):
+        legacy_seconds = best_time(legacy_rotate, angle)
+        seconds = best_time(rotate_without_cropping, image, angle)
+        print(f"    24 MP by {angle} degrees: v1.3 {legacy_seconds * 1e3:.1f} ms, "
+            f"now {seconds * 1e3:.1f} ms ({legacy_seconds / seconds:.1f}x)")
+
+    def legacy_steps():
+        resized = cv2.resize(image, (3000, 2000))
+        return rotate_without_cropping(resized, 30)
+
+    composed = Pipeline().resize(3000, 2000).rotate(30)
+    legacy_seconds = best_time(legacy_steps)
+    seconds = best_time(composed.run, image)
+    print(f"    24 MP resize then rotate by 30 degrees: separate {legacy_seconds * 1e3:.1f} ms, "
+        f"composed {seconds * 1e3:.1f} ms")
+
+def benchmark_startup():
+    """Compares the cold start of the program with the eager imports of
+    Odin Digital v1.3
+    """
+
+    print("startup")
+
+    # v1.3 imported OpenCV, NumPy, PIL and tkinter before anything else
+    legacy_seconds = import_time("import cv2, numpy, PIL.Image, PIL.ImageTk, tkinter, "
+        "tkinter.ttk, tkinter.filedialog, tkinter.messagebox, concurrent.futures; "
+        "import odindigital")
+    for module in ("core", "odindigital"):
+        seconds = import_time(f"import {module}")
+        print(f"    import {module}: v1.3 {legacy_seconds * 1e3:.1f} ms, "
+            f"now {seconds * 1e3:.1f} ms ({legacy_seconds / seconds:.1f}x)")
+
+def benchmark_stream():
+    """Measures edge detection and template tracking on a generated video,
+    and compares the windowed tracking with a search of every whole frame
+    """
+
+    print("stream")
+
+    background = cv2.resize(cv2.imread("img/lena.bmp"), (1280, 720))
+    template = cv2.imread("img/baboon.png")[200:300, 200:320]
+    positions = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "moving.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (1280, 720))
+        for index in range(150):
+            frame = background.copy()
+            x, y = 40 + 7 * index, int(300 + 200 * np.sin(index / 15))
+            frame[y:y + 100, x:x + 120] = template
+            positions.append((x, y))
+            writer.write(frame)
+        writer.release()
+
+        tracker = TemplateTracker(template)
+        found = []
+        for name, process in (
+            ("decode only", lambda frame: None),
+            ("edges", lambda frame: find_edges(frame.image)),
+            ("whole-frame find_template", lambda frame: find_template(frame.image, template)),
+            ("tracking", lambda frame: found.append(tracker.update(frame.image)))):
+            with FrameStream(path) as frames:
+                report = run_stream(frames, process)
+            print(f"    720p {name}: {report['fps']:.0f} FPS, latency median "
+                f"{report['latency_median_ms']:.1f} ms, p95 {report['latency_p95_ms']:.1f} ms")
+
+        errors = [abs(corners[0][0] - x) + abs(corners[0][1] - y)
+            for corners, (x, y) in zip(found, positions) if corners is not None]
+        print(f"    tracking: {len(errors)} of {len(positions)} frames found, largest error "
+            f"{max(errors)} px, {tracker.full_searches} whole-frame searches")
+
+        # the processing is slower than the 30 FPS of the video
+        with FrameStream(path, queue_size = 2, realtime = True) as frames:
+            report = run_stream(frames, lambda frame: time.sleep(0.05))
+        print(f"    real-time playback with 50 ms of processing: {report['frames']} frames "
+            f"processed, {report['dropped']} dropped, latency median "
+            f"{report['latency_median_ms']:.1f} ms")
+
+def benchmark_tiled_processing():
+    """Compares the peak memory of tiled and whole-image processing
+
+    Peak memory is measured with tracemalloc, which tracks the NumPy buffers
+    returned by OpenCV but not memory-mapped pages.
+    """
+
+    print("tiled processing (peak allocated memory)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "large.ppm")
+        output_path = os.path.join(directory, "result.pgm")
+
+        # 12000 x 8000 RGB, written tile by tile so it is never in memory
+        large = create_netpbm(input_path, 8000, 12000, 3)
+        tile = cv2.resize(cv2.imread("img/baboon.png"), (12000, 500))
+        for first_row in range(0, 8000, 500):
+            large[first_row:first_row + 500] = tile
+        large.flush()
+        del large
+
+        for operation in ("gray", "edges"):
+            tracemalloc.start()
+            start = time.perf_counter()
+            process_tiled(input_path, output_path, operation)
+            tiled_seconds = time.perf_counter() - start
+            tiled_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            image = cv2.imread(input_path)
+            if operation == "edges":
+                result = find_edges(image)
+            else:
+                result = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            cv2.imwrite(output_path, result)
+            whole_seconds = time.perf_counter() - start
+            whole_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del image, result
+
+            print(f"    96 MP {operation}: tiled {tiled_peak / 2**20:.0f} MiB "
+                f"in {tiled_seconds:.2f} s, whole image {whole_peak / 2**20:.0f} MiB "
+                f"in {whole_seconds:.2f} s")
+
+# MAIN
+
+if __name__ == "__main__":
+    benchmark_is_grayscale()
+    benchmark_instrumentation()
+    benchmark_diff_images()
+    benchmark_encoders()
+    benchmark_find_edges()
+    benchmark_find_template()
+    benchmark_match_backends()
+    benchmark_hash_index()
+    benchmark_image_cv2_to_pil()
+    benchmark_raw_cache()
+    benchmark_regression()
+    benchmark_resize()
+    benchmark_roi()
+    benchmark_rotate()
+    benchmark_startup()
+    benchmark_stream()
+    benchmark_tiled_processing()
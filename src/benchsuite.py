@@ -0,0 +1,277 @@
+"""
+Program: Odin Digital
+Benchmark suite of the image operations
+
+Every operation runs over the images of img/ and over synthetic images of 1,
+12 and 48 megapixels, made by tiling img/baboon.png so that they keep its
+detail. Each case runs in a new process, so that its peak resident memory
+is its own. The results can be saved as a baseline, and later runs compared
+with it: a case whose median time grew by more than the tolerance is flagged
+as a regression and the exit status is 1.
+
+Usage:
+    python src/benchsuite.py --save baseline.json
+    python src/benchsuite.py --baseline baseline.json
+    python src/benchsuite.py --operations rotate edges --sizes 1 12
+"""
+
+# IMPORTS
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak memory is not reported there
+    resource = None
+
+import cv2
+import numpy as np
+
+from compare import diff_images, perceptual_hash
+from core import (find_template, image_cv2_to_pil, is_grayscale,
+    rotate_without_cropping)
+from edges import find_edges
+from resizing import resize
+
+# CONSTANTS
+
+IMAGE_DIR = "img"
+SYNTHETIC_SOURCE = os.path.join(IMAGE_DIR, "baboon.png")
+SYNTHETIC_MEGAPIXELS = [1, 12, 48]
+SUITE_REPEATS = 7
+# a median this much slower than the baseline is a regression
+REGRESSION_TOLERANCE = 0.2
+
+# FUNCTIONS
+
+def compare_with_baseline(results, baseline, tolerance = REGRESSION_TOLERANCE):
+    """Finds the cases that got slower than in a baseline
+
+    Args:
+        results (dict): results returned by run_suite
+        baseline (dict): results of an earlier run
+        tolerance (float): allowed relative growth of the median time
+
+    Returns:
+        list of tuple (str, float, float): case, baseline and current median
+            times in milliseconds of every regression
+    """
+
+    regressions = []
+
+    for case, stats in results["cases"].items():
+        reference = baseline["cases"].get(case)
+        if reference is not None and stats["median_ms"] > reference["median_ms"] * (1 + tolerance):
+            regressions.append((case, reference["median_ms"], stats["median_ms"]))
+
+    return regressions
+
+def load_input(name):
+    """Loads an input image of the suite
+
+    Args:
+        name (str): file name within IMAGE_DIR, or "<n>MP" for a synthetic
+            image of n megapixels
+
+    Returns:
+        numpy.ndarray: OpenCV-compatible image
+    """
+
+    if not name.endswith("MP"):
+        return cv2.imread(os.path.join(IMAGE_DIR, name))
+
+    # 4:3 image tiled from the source, so that it has detail at every scale
+    megapixels = float(name[:-2])
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    source = cv2.imread(SYNTHETIC_SOURCE)
+    tiles = (-(-height // source.shape[0]), -(-width // source.shape[1]), 1)
+
+    return np.ascontiguousarray(np.tile(source, tiles)[:height, :width])
+
+def make_operations(image, name):
+    """Prepares the operations of the suite for an input image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        name (str): name of the input, as in load_input
+
+    Returns:
+        dict: callables without arguments, by operation name
+    """
+
+    height, width = image.shape[:2]
+
+    # match_image.png has its own template, other images are searched for
+    # their central eighth
+    if name == "match_image.png":
+        template = cv2.imread(os.path.join(IMAGE_DIR, "match_template.png"))
+    else:
+        template = image[height * 7 // 16:height * 9 // 16, width * 7 // 16:width * 9 // 16].copy()
+
+    changed = image.copy()
+    changed[height // 4:height // 2, width // 4:width // 2] //= 2
+
+    return {
+        "is_grayscale": lambda: is_grayscale(image),
+        "rotate": lambda: rotate_without_cropping(image, 30),
+        "rotate_90": lambda: rotate_without_cropping(image, 90),
+        "resize": lambda: resize(image, max(1, width // 3), max(1, height // 3)),
+        "edges": lambda: find_edges(image),
+        "find_template": lambda: find_template(image, template),
+        "diff_images": lambda: diff_images(image, changed),
+        "to_pil": lambda: image_cv2_to_pil(image),
+        "phash": lambda: perceptual_hash(image)
+    }
+
+def peak_rss_mib():
+    """Gets the peak resident memory of the process
+
+    Returns:
+        float: peak resident memory in MiB, None if it is not available
+    """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+def print_case(case, stats):
+    """Prints the results of a case
+
+    Args:
+        case (str): "operation/input" name of the case
+        stats (dict): results returned by run_case
+    """
+
+    rss = "" if stats["peak_rss_mib"] is None else f", peak RSS {stats['peak_rss_mib']:.0f} MiB"
+    print(f"{case:<36} median {stats['median_ms']:9.2f} ms, p95 {stats['p95_ms']:9.2f} ms, "
+        f"{stats['megapixels_per_s']:8.1f} MP/s{rss}")
+
+def run_case(name, operation, repeats):
+    """Measures an operation on an input, in the current process
+
+    Args:
+        name (str): name of the input, as in load_input
+        operation (str): name of the operation, as in make_operations
+        repeats (int): number of timed runs, after a warm-up run
+
+    Returns:
+        dict: "megapixels" of the input, "median_ms", "p95_ms",
+            "megapixels_per_s" and "peak_rss_mib" (None if not available)
+    """
+
+    image = load_input(name)
+    function = make_operations(image, name)[operation]
+    megapixels = image.shape[0] * image.shape[1] / 1e6
+
+    function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    median = float(np.median(times))
+    return {
+        "megapixels": round(megapixels, 2),
+        "median_ms": median * 1e3,
+        "p95_ms": float(np.percentile(times, 95)) * 1e3,
+        "megapixels_per_s": megapixels / median,
+        "peak_rss_mib": peak_rss_mib()
+    }
+
+def run_suite(inputs, operations, repeats = SUITE_REPEATS):
+    """Runs every operation over every input, each case in a new process
+
+    Args:
+        inputs (list of str): names of the inputs, as in load_input
+        operations (list of str): names of the operations
+        repeats (int): number of timed runs of every case
+
+    Returns:
+        dict: environment and results by "operation/input" case
+    """
+
+    results = {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "cases": {}
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for operation in operations:
+        for name in inputs:
+            with ProcessPoolExecutor(max_workers = 1, mp_context = context) as executor:
+                stats = executor.submit(run_case, name, operation, repeats).result()
+            results["cases"][f"{operation}/{name}"] = stats
+            print_case(f"{operation}/{name}", stats)
+
+    return results
+
+def main(argv):
+    """Runs the benchmark suite
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        int: exit status, 1 if a regression was found
+    """
+
+    all_operations = list(make_operations(np.zeros((8, 8, 3), np.uint8), "").keys())
+    corpus = sorted(name for name in os.listdir(IMAGE_DIR)
+        if cv2.haveImageReader(os.path.join(IMAGE_DIR, name)))
+
+    parser = argparse.ArgumentParser(description = "Benchmark suite of the image operations")
+    parser.add_argument("--operations", nargs = "+", choices = all_operations,
+        default = all_operations)
+    parser.add_argument("--sizes", nargs = "*", type = float, default = SYNTHETIC_MEGAPIXELS,
+        help = "megapixels of the synthetic images (default: 1 12 48)")
+    parser.add_argument("--no-corpus", action = "store_true",
+        help = f"skip the images of {IMAGE_DIR}/")
+    parser.add_argument("--repeats", type = int, default = SUITE_REPEATS)
+    parser.add_argument("--save", help = "JSON file where the results are saved")
+    parser.add_argument("--baseline", help = "JSON file of earlier results to compare with")
+    parser.add_argument("--tolerance", type = float, default = REGRESSION_TOLERANCE,
+        help = "allowed relative growth of the median time (default: 0.2)")
+    arguments = parser.parse_args(argv)
+
+    inputs = [] if arguments.no_corpus else corpus
+    inputs += [f"{size:g}MP" for size in arguments.sizes]
+
+    results = run_suite(inputs, arguments.operations, arguments.repeats)
+
+    if arguments.save:
+        with open(arguments.save, "w", encoding = "utf-8") as file:
+            json.dump(results, file, indent = 4)
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding = "utf-8") as file:
+            regressions = compare_with_baseline(results, json.load(file), arguments.tolerance)
+        for case, before, after in regressions:
+            print(f"REGRESSION {case}: {before:.2f} ms -> {after:.2f} ms "
+                f"({100 * (after / before - 1):+.0f}%)")
+        if regressions:
+            return 1
+        print("No regressions")
+
+    return 0
+
+# MAIN
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
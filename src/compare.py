@@ -0,0 +1,459 @@
+"""
+Program: Odin Digital
+Comparison of images
+"""
+
+# IMPORTS
+
+from collections import namedtuple
+import hashlib
+import os
+
+from imagecache import read_image
+from instrument import instrumented
+from lazyimport import lazy_import
+from roi import clip_roi, crop, to_image_box
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+DIFF_STRIP_ROWS = 256
+FILE_CHUNK_BYTES = 2**20
+HASH_FUNCTIONS = ["ahash", "dhash", "phash"]
+# number of set bits of every byte value
+POPCOUNT_TABLE = [bin(value).count("1") for value in range(256)]
+
+ImageDifference = namedtuple("ImageDifference",
+    ["changed_pixels", "max_delta", "bounding_box", "mask"])
+IDENTICAL_IMAGES = ImageDifference(0, None, None, None)
+
+# FUNCTIONS
+
+def average_hash(image):
+    """Computes the average hash (aHash) of an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        int: 64-bit hash, a bit is set where the 8x8 thumbnail is brighter
+            than its mean
+    """
+
+    thumbnail = cv2.resize(hash_gray(image), (8, 8), interpolation = cv2.INTER_AREA)
+    return bits_to_int(thumbnail > thumbnail.mean())
+
+def bits_to_int(bits):
+    """Packs an array of 64 booleans into an integer
+
+    Args:
+        bits (numpy.ndarray): 64 booleans, most significant first
+
+    Returns:
+        int: packed bits
+    """
+
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+def build_hash_index(paths, hash_function = "phash"):
+    """Computes the perceptual hashes of a corpus of reference images
+
+    Args:
+        paths (list of str): paths of the reference images
+        hash_function (str): one of HASH_FUNCTIONS
+
+    Returns:
+        dict: "paths" of the readable images, their "hashes" as a uint64
+            array and the name of the "hash_function"
+    """
+
+    indexed_paths = []
+    hashes = []
+
+    for path in paths:
+        image = read_image(path)
+        if image is not None:
+            indexed_paths.append(path)
+            hashes.append(image_hash(image, hash_function))
+
+    return {
+        "paths": indexed_paths,
+        "hashes": np.array(hashes, np.uint64),
+        "hash_function": hash_function
+    }
+
+def compare_files(path_a, path_b, tolerance = 0):
+    """Compares two image files, skipping the work for identical ones
+
+    Files with the same bytes are identical without decoding them, and
+    images with the same pixels are identical without computing their
+    difference.
+
+    Args:
+        path_a (str): path of the first image
+        path_b (str): path of the second image
+        tolerance (int): largest difference of a channel that is not counted
+            as a change
+
+    Returns:
+        ImageDifference: differences of the images, with max_delta,
+            bounding_box and mask None when they are identical
+    """
+
+    if files_identical(path_a, path_b):
+        return IDENTICAL_IMAGES
+
+    image_a = read_image(path_a)
+    image_b = read_image(path_b)
+    if image_a is None or image_b is None:
+        raise ValueError(f"{path_a} or {path_b} cannot be read as an image")
+
+    if images_equal(image_a, image_b):
+        return IDENTICAL_IMAGES
+
+    return diff_images(image_a, image_b, tolerance)
+
+def difference_hash(image):
+    """Computes the difference hash (dHash) of an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        int: 64-bit hash, a bit is set where a pixel of the 9x8 thumbnail is
+            brighter than its right neighbour
+    """
+
+    thumbnail = cv2.resize(hash_gray(image), (9, 8), interpolation = cv2.INTER_AREA)
+    return bits_to_int(thumbnail[:, :-1] > thumbnail[:, 1:])
+
+@instrumented()
+def diff_images(image_a, image_b, tolerance = 0, roi = None):
+    """Computes the differences between two images of the same size
+
+    The images are compared in strips of rows, reusing a strip-sized buffer
+    for the absolute difference, so that the mask is the only full-size
+    allocation.
+
+    Args:
+        image_a (numpy.ndarray): OpenCV-compatible image
+        image_b (numpy.ndarray): OpenCV-compatible image, same shape as image_a
+        tolerance (int): largest difference of a channel that is not counted
+            as a change, to ignore compression noise
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+            to compare, None for the whole images
+
+    Returns:
+        ImageDifference: number of changed pixels, maximum difference of every
+            channel, (x, y, width, height) box around the changes in the
+            coordinates of the whole images (None if there are none) and mask
+            of the region with the changed pixels in white
+    """
+
+    if image_a.shape != image_b.shape:
+        raise ValueError("Both images must be the same size")
+    if roi is not None:
+        roi = clip_roi(roi, image_a.shape)
+        image_a = crop(image_a, roi)
+        image_b = crop(image_b, roi)
+
+    height, width = image_a.shape[:2]
+    channels = 1 if image_a.ndim == 2 else image_a.shape[2]
+
+    mask = np.empty((height, width), np.uint8)
+    strip_difference = np.empty((min(height, DIFF_STRIP_ROWS),) + image_a.shape[1:],
+        image_a.dtype)
+    max_delta = np.zeros(channels, np.int64)
+    changed_pixels = 0
+    bounding_box = None
+
+    for first_row in range(0, height, DIFF_STRIP_ROWS):
+        last_row = min(height, first_row + DIFF_STRIP_ROWS)
+        difference = strip_difference[:last_row - first_row]
+        strip_mask = mask[first_row:last_row]
+
+        cv2.absdiff(image_a[first_row:last_row], image_b[first_row:last_row], difference)
+
+        # reducing along the rows first keeps the reduction vectorized
+        strip_max_delta = np.maximum.reduce(difference, axis = 0).reshape(-1, channels)
+        np.maximum(max_delta, strip_max_delta.max(axis = 0), out = max_delta)
+
+        threshold_changes(difference, tolerance, strip_mask)
+
+        strip_changes = cv2.countNonZero(strip_mask)
+        if strip_changes:
+            changed_pixels += strip_changes
+            x, y, box_width, box_height = cv2.boundingRect(strip_mask)
+            bounding_box = merge_boxes(bounding_box,
+                (x, first_row + y, box_width, box_height))
+
+    return ImageDifference(changed_pixels, tuple(int(delta) for delta in max_delta),
+        to_image_box(bounding_box, roi), mask)
+
+def file_digest(path):
+    """Computes the BLAKE2b digest of a file, to store or compare it
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        str: hexadecimal digest
+    """
+
+    digest = hashlib.blake2b()
+
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(FILE_CHUNK_BYTES), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def files_identical(path_a, path_b):
+    """Checks if two files have the same bytes
+
+    The sizes are compared first, then the contents chunk by chunk, stopping
+    at the first different chunk.
+
+    Args:
+        path_a (str): path of the first file
+        path_b (str): path of the second file
+
+    Returns:
+        bool: True if the files are identical, False otherwise
+    """
+
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+
+    with open(path_a, "rb") as file_a, open(path_b, "rb") as file_b:
+        while True:
+            chunk_a = file_a.read(FILE_CHUNK_BYTES)
+            if chunk_a != file_b.read(FILE_CHUNK_BYTES):
+                return False
+            if not chunk_a:
+                return True
+
+def find_near_matches(image, index, max_distance = 10, tolerance = 0):
+    """Finds the references of a hash index that are close to an image
+
+    Only the references within max_distance of the hash of the image are
+    decoded and compared pixel by pixel.
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        index (dict): hash index returned by build_hash_index
+        max_distance (int): maximum number of different bits of the hashes
+        tolerance (int): largest difference of a channel that is not counted
+            as a change
+
+    Returns:
+        list of tuple (str, int, ImageDifference): path, hash distance and
+            differences of the references with the same size as the image,
+            closest first
+    """
+
+    matches = []
+
+    for path, distance in query_hash_index(index,
+        image_hash(image, index["hash_function"]), max_distance):
+        reference = read_image(path)
+        if reference is not None and reference.shape == image.shape:
+            matches.append((path, distance, diff_images(image, reference, tolerance)))
+
+    return matches
+
+def hamming_distance(hash_a, hash_b):
+    """Counts the different bits of two hashes
+
+    Args:
+        hash_a (int): first hash
+        hash_b (int): second hash
+
+    Returns:
+        int: number of different bits
+    """
+
+    return bin(hash_a ^ hash_b).count("1")
+
+def hash_gray(image):
+    """Converts an image to the grayscale used by the perceptual hashes
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        numpy.ndarray: float32 single-channel image
+    """
+
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    elif image.ndim == 3 and image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    return image.reshape(image.shape[:2]).astype(np.float32)
+
+def image_hash(image, hash_function = "phash"):
+    """Computes a perceptual hash of an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        hash_function (str): one of HASH_FUNCTIONS
+
+    Returns:
+        int: 64-bit hash
+    """
+
+    if hash_function == "ahash":
+        return average_hash(image)
+    if hash_function == "dhash":
+        return difference_hash(image)
+    if hash_function == "phash":
+        return perceptual_hash(image)
+
+    raise ValueError(f"Unknown hash function {hash_function}")
+
+def images_equal(image_a, image_b):
+    """Checks if two images have the same pixels
+
+    The images are compared strip by strip, stopping at the first different
+    strip.
+
+    Args:
+        image_a (numpy.ndarray): OpenCV-compatible image
+        image_b (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        bool: True if the images are equal, False otherwise
+    """
+
+    if image_a.shape != image_b.shape or image_a.dtype != image_b.dtype:
+        return False
+
+    for first_row in range(0, image_a.shape[0], DIFF_STRIP_ROWS):
+        last_row = first_row + DIFF_STRIP_ROWS
+        if not np.array_equal(image_a[first_row:last_row], image_b[first_row:last_row]):
+            return False
+
+    return True
+
+def load_hash_index(path):
+    """Loads a hash index saved by save_hash_index
+
+    Args:
+        path (str): path of the .npz file
+
+    Returns:
+        dict: hash index, as returned by build_hash_index
+    """
+
+    with np.load(path) as data:
+        return {
+            "paths": data["paths"].tolist(),
+            "hashes": data["hashes"],
+            "hash_function": str(data["hash_function"])
+        }
+
+def merge_boxes(box_a, box_b):
+    """Computes the smallest box containing two boxes
+
+    Args:
+        box_a (tuple (int, int, int, int)): (x, y, width, height) box, or None
+        box_b (tuple (int, int, int, int)): (x, y, width, height) box
+
+    Returns:
+        tuple (int, int, int, int): (x, y, width, height) box
+    """
+
+    if box_a is None:
+        return box_b
+
+    x_1 = min(box_a[0], box_b[0])
+    y_1 = min(box_a[1], box_b[1])
+    x_2 = max(box_a[0] + box_a[2], box_b[0] + box_b[2])
+    y_2 = max(box_a[1] + box_a[3], box_b[1] + box_b[3])
+    return (x_1, y_1, x_2 - x_1, y_2 - y_1)
+
+def perceptual_hash(image):
+    """Computes the perceptual hash (pHash) of an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        int: 64-bit hash, a bit is set where a low-frequency DCT coefficient
+            of the 32x32 thumbnail is above their median
+    """
+
+    thumbnail = cv2.resize(hash_gray(image), (32, 32), interpolation = cv2.INTER_AREA)
+    low_frequencies = cv2.dct(thumbnail)[:8, :8]
+    # the DC coefficient is the mean brightness, it is left out of the median
+    median = np.median(low_frequencies.ravel()[1:])
+    return bits_to_int(low_frequencies > median)
+
+def query_hash_index(index, image_hash_value, max_distance):
+    """Finds the references of a hash index within a Hamming distance
+
+    Args:
+        index (dict): hash index returned by build_hash_index
+        image_hash_value (int): hash of the image
+        max_distance (int): maximum number of different bits
+
+    Returns:
+        list of tuple (str, int): path and distance of the references,
+            closest first
+    """
+
+    different_bits = np.bitwise_xor(index["hashes"], np.uint64(image_hash_value))
+    distances = np.array(POPCOUNT_TABLE, np.uint8)[different_bits.view(np.uint8)].reshape(-1, 8).sum(
+        axis = 1, dtype = np.int64)
+
+    close = np.flatnonzero(distances <= max_distance)
+    close = close[np.argsort(distances[close], kind = "stable")]
+
+    return [(index["paths"][i], int(distances[i])) for i in close]
+
+def save_hash_index(index, path):
+    """Saves a hash index to a .npz file
+
+    Args:
+        index (dict): hash index returned by build_hash_index
+        path (str): path of the .npz file
+    """
+
+    np.savez(path, paths = np.array(index["paths"]), hashes = index["hashes"],
+        hash_function = np.array(index["hash_function"]))
+
+def threshold_changes(difference, tolerance, mask):
+    """Marks the pixels with a channel that differs more than a tolerance
+
+    Args:
+        difference (numpy.ndarray): absolute difference of two images, it
+            is overwritten
+        tolerance (int): largest difference of a channel that is not a change
+        mask (numpy.ndarray): uint8 single-channel output, 255 where a pixel
+            changed and 0 elsewhere
+    """
+
+    channels = 1 if difference.ndim == 2 else difference.shape[2]
+
+    if difference.dtype != np.uint8 or channels not in (1, 3, 4):
+        changed = difference.reshape(mask.shape + (channels,)) > tolerance
+        np.any(changed, axis = 2, out = mask.view(bool))
+        mask *= 255
+        return
+
+    flat = difference.reshape(mask.shape[0], -1)
+    if channels == 1:
+        cv2.threshold(flat, tolerance, 255, cv2.THRESH_BINARY, mask)
+        return
+
+    cv2.threshold(flat, tolerance, 255, cv2.THRESH_BINARY, flat)
+    if channels == 3:
+        # every channel has a positive weight, so the gray value is not 0
+        # as soon as one channel is 255
+        cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY, mask)
+    else:
+        np.not_equal(difference.view(np.uint32)[..., 0], 0, out = mask.view(bool))
+    cv2.threshold(mask, 0, 255, cv2.THRESH_BINARY, mask)
@@ -0,0 +1,365 @@
+"""
+Program: Odin Digital
+Image processing library of Odin Digital, without the graphical interface
+
+OpenCV, NumPy and PIL are imported lazily, so importing this module is fast
+and they are only loaded by the first function that needs them.
+
+Usage:
+    from core import read_image, rotate_without_cropping
+    rotated = rotate_without_cropping(read_image("img/lena.bmp"), 30)
+"""
+
+# IMPORTS
+
+from edges import find_edges
+from geometry import apply_transform, rotation_transform
+from imagecache import read_image
+from instrument import instrumented
+from lazyimport import lazy_import
+from resizing import downscale
+from roi import clip_roi, crop, to_image_point
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# CONSTANTS
+
+PROGRAM_NAME = "Odin Digital"
+VERSION_NUMBER = "1.3"
+FILES_ALLOWED = [("Image Files",
+    [".bmp", ".dib", ".jpeg", ".jpg", ".jpe", ".jp2", ".png",
+    ".pbm", ".pgm", ".ppm", ".sr", ".ras", ".tiff", ".tif", ".webp"])]
+GRAYSCALE_SAMPLE_ROWS = 64
+GRAYSCALE_CHUNK_ROWS = 256
+CANNY_THRESHOLD_1 = 100
+CANNY_THRESHOLD_2 = 200
+PYRAMID_MAX_LEVELS = 4
+PYRAMID_MIN_TEMPLATE_SIZE = 16
+PYRAMID_CANDIDATES = 3
+PYRAMID_SEARCH_RADIUS = 4
+# PIL mode and raw layout of OpenCV images by number of channels
+PIL_MODES = {1: ("L", "L"), 3: ("RGB", "BGR"), 4: ("RGBA", "BGRA")}
+# cv2.imread flags that decode at 1/2, 1/4 and 1/8 of the size, by name so
+# that OpenCV is not loaded on import
+REDUCED_READ_FLAGS = [(8, "IMREAD_REDUCED_COLOR_8"), (4, "IMREAD_REDUCED_COLOR_4"),
+    (2, "IMREAD_REDUCED_COLOR_2")]
+
+# FUNCTIONS
+
+def compare_size_of_images(image1, image2):
+    """Compares the size of two images
+
+    Args:
+        image1 (numpy.ndarray): OpenCV-compatible image
+        image2 (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        bool: True if sizes are equal, False otherwise
+    """
+
+    if get_image_size(image1) == get_image_size(image2):
+        return True
+
+    return False
+
+def detect_edges(image, thresholds = "median", roi = None):
+    """Detects the edges of an image with the Canny algorithm
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        thresholds (str or tuple (int, int)): "median" or "otsu" to compute
+            the thresholds from the image, or the low and high thresholds
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+            to process, None for the whole image
+
+    Returns:
+        numpy.ndarray: single-channel image with the edges in white, the
+            size of the region
+    """
+
+    return find_edges(crop(image, roi), thresholds)
+
+@instrumented()
+def find_template(image, template, levels = None, roi = None):
+    """Finds the location of a template within an image
+
+    The search runs coarse-to-fine on an image pyramid: the whole image is
+    searched only at the coarsest level, and every finer level refines the
+    best candidates within a few pixels of their previous location.
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image with 1, 3 or 4
+            channels
+        template (numpy.ndarray): OpenCV-compatible image with 1, 3 or 4
+            channels, smaller than image
+        levels (int): number of pyramid levels above full resolution, 0 for
+            an exhaustive search at full resolution, None to choose it from
+            the size of the template
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+            of the image to search, None for the whole image
+
+    Returns:
+        tuple (tuple, tuple): top-left and bottom-right (x, y) corners of
+            the best match, in the coordinates of the whole image
+    """
+
+    if roi is not None:
+        roi = clip_roi(roi, image.shape)
+        image = crop(image, roi)
+        if template.shape[0] > roi[3] or template.shape[1] > roi[2]:
+            raise ValueError("The template is larger than the region")
+
+    image_gray = to_gray(image)
+    template_gray = to_gray(template)
+
+    if levels is None:
+        levels = 0
+        while (levels < PYRAMID_MAX_LEVELS
+            and min(template_gray.shape) >> (levels + 1) >= PYRAMID_MIN_TEMPLATE_SIZE):
+            levels += 1
+
+    image_pyramid = [image_gray]
+    template_pyramid = [template_gray]
+    for _ in range(levels):
+        image_pyramid.append(cv2.pyrDown(image_pyramid[-1]))
+        template_pyramid.append(cv2.pyrDown(template_pyramid[-1]))
+
+    res = cv2.matchTemplate(image_pyramid[-1], template_pyramid[-1], cv2.TM_SQDIFF)
+    candidates = find_template_minima(res, PYRAMID_CANDIDATES if levels else 1,
+        min(template_pyramid[-1].shape))
+
+    for level in range(levels - 1, -1, -1):
+        level_image = image_pyramid[level]
+        template_height, template_width = template_pyramid[level].shape
+        refined = []
+
+        for x_coarse, y_coarse in candidates:
+            # region of the image where the template can lie around the
+            # candidate, clipped to the valid positions of the template
+            x_min = max(0, 2 * x_coarse - PYRAMID_SEARCH_RADIUS)
+            y_min = max(0, 2 * y_coarse - PYRAMID_SEARCH_RADIUS)
+            x_max = min(level_image.shape[1] - template_width,
+                2 * x_coarse + PYRAMID_SEARCH_RADIUS)
+            y_max = min(level_image.shape[0] - template_height,
+                2 * y_coarse + PYRAMID_SEARCH_RADIUS)
+
+            region = level_image[y_min:y_max + template_height, x_min:x_max + template_width]
+            res = cv2.matchTemplate(region, template_pyramid[level], cv2.TM_SQDIFF)
+            min_val, _, min_loc, _ = cv2.minMaxLoc(res)
+            refined.append((min_val, (x_min + min_loc[0], y_min + min_loc[1])))
+
+        refined.sort()
+        candidates = [location for _, location in refined]
+
+    min_loc = to_image_point(candidates[0], roi)
+
+    x_1, y_1 = min_loc
+    x_2, y_2 = min_loc[0] + template.shape[1], min_loc[1] + template.shape[0]
+
+    return ((x_1, y_1), (x_2, y_2))
+
+def find_template_minima(res, count, min_distance):
+    """Finds the best separated minima of a template matching result
+
+    Args:
+        res (numpy.ndarray): result of cv2.matchTemplate with TM_SQDIFF
+        count (int): maximum number of minima
+        min_distance (int): minimum distance in pixels between two minima
+
+    Returns:
+        list of tuple (int, int): (x, y) locations of the minima, best first
+    """
+
+    res = res.copy()
+    max_val = float(res.max())
+    minima = []
+
+    for _ in range(count):
+        min_val, _, min_loc, _ = cv2.minMaxLoc(res)
+        if minima and min_val >= max_val:
+            break
+        minima.append(min_loc)
+        cv2.circle(res, min_loc, min_distance, max_val, -1)
+
+    return minima
+
+def get_image_size(image):
+    """Gets the size of an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        tuple (int, int, int): (height, width, channels) of the image
+    """
+
+    height = image.shape[0]
+    width = image.shape[1]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    return (height, width, channels)
+
+def image_cv2_to_pil(image_cv2):
+    """Transforms a OpenCV-compatible image to a PIL image
+
+    The NumPy buffer is read directly by PIL in its BGR(A) or L layout, with
+    no intermediate RGB copy; grayscale images share the buffer. 16-bit
+    images are reduced to 8 bits.
+
+    Args:
+        image_cv2 (numpy.ndarray): OpenCV-compatible image with 1, 3 or 4
+            channels, 8 or 16 bits
+
+    Returns:
+        PIL.Image.Image: PIL image
+    """
+
+    if image_cv2.dtype == np.uint16:
+        image_cv2 = cv2.convertScaleAbs(image_cv2, alpha = 1 / 257)
+    elif image_cv2.dtype != np.uint8:
+        raise ValueError(f"Images of type {image_cv2.dtype} cannot be displayed")
+
+    height, width, channels = get_image_size(image_cv2)
+    mode, raw_mode = PIL_MODES[channels]
+
+    return Image.frombuffer(mode, (width, height), np.ascontiguousarray(image_cv2),
+        "raw", raw_mode, 0, 1)
+
+@instrumented()
+def is_grayscale(image):
+    """Detects if an image is grayscale or not
+
+    The channel planes are compared as NumPy views, so no copy of the image
+    is made. A strided sample of rows is checked first, which finds colored
+    pixels in most color images without scanning the whole buffer, and then
+    the remaining rows are scanned in chunks, stopping at the first chunk
+    that contains a colored pixel.
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image with 1, 3 or 4 channels
+
+    Returns:
+        bool: True if the image is grayscale, False otherwise
+    """
+
+    if image.ndim == 2 or image.shape[2] == 1:
+        return True
+
+    # the alpha channel of BGRA images does not take part in the comparison
+    blue, green, red = image[..., 0], image[..., 1], image[..., 2]
+
+    def same_channels(rows):
+        return (np.array_equal(blue[rows], green[rows])
+            and np.array_equal(green[rows], red[rows]))
+
+    height = image.shape[0]
+    sample_step = max(1, height // GRAYSCALE_SAMPLE_ROWS)
+
+    if not same_channels(slice(0, height, sample_step)):
+        return False
+
+    for first_row in range(0, height, GRAYSCALE_CHUNK_ROWS):
+        if not same_channels(slice(first_row, first_row + GRAYSCALE_CHUNK_ROWS)):
+            return False
+
+    return True
+
+@instrumented("decode_preview")
+def load_preview(filename, max_width, max_height):
+    """Reads an image file downscaled to fit within a size
+
+    JPEG files are decoded directly at 1/2, 1/4 or 1/8 of their size when
+    that is still larger than the requested size, so the full-resolution
+    image is never decoded.
+
+    Args:
+        filename (str): path of the image
+        max_width (int): maximum width of the preview
+        max_height (int): maximum height of the preview
+
+    Returns:
+        numpy.ndarray: OpenCV-compatible image, or None if the file cannot be
+            read as an image
+    """
+
+    try:
+        with Image.open(filename) as header:
+            width, height = header.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # too large for PIL, or unknown to it: decoded at full size
+        image = read_image(filename)
+        return None if image is None else make_preview(image, max_width, max_height)
+
+    flags = cv2.IMREAD_COLOR
+    for factor, reduced_flags in REDUCED_READ_FLAGS:
+        if width // factor >= max_width or height // factor >= max_height:
+            flags = getattr(cv2, reduced_flags)
+            break
+
+    image = cv2.imread(filename, flags)
+    if image is None:
+        return None
+
+    return make_preview(image, max_width, max_height)
+
+def make_preview(image, max_width, max_height):
+    """Downscales an image to fit within a size, keeping its aspect ratio
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        max_width (int): maximum width of the preview
+        max_height (int): maximum height of the preview
+
+    Returns:
+        numpy.ndarray: downscaled image, or image itself if it already fits
+    """
+
+    height, width = image.shape[:2]
+    scale = min(max_width / width, max_height / height)
+    if scale >= 1:
+        return image
+
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return downscale(image, size)
+
+@instrumented()
+def rotate_without_cropping(image, angle, interpolation = None):
+    """Rotates an image without cropping
+
+    Rotations by multiples of 90 degrees are exact, the image is not
+    resampled.
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        angle (int): rotation angle in degrees
+        interpolation (int): OpenCV interpolation flag, None for bilinear
+
+    Returns:
+        numpy.ndarray: rotated OpenCV-compatible image
+    """
+
+    height, width = image.shape[:2]
+    return apply_transform(image, rotation_transform((width, height), angle), interpolation)
+
+def to_gray(image, dst = None):
+    """Converts an image to grayscale if it is not already
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image with 1, 3 or 4 channels
+        dst (numpy.ndarray): array the conversion of a color image is written
+            to, None for a new array
+
+    Returns:
+        numpy.ndarray: single-channel image, the image itself or a view of
+            it if it has a single channel
+    """
+
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 1:
+        return image[..., 0]
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY, dst = dst)
+
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst = dst)
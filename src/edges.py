@@ -0,0 +1,187 @@
+"""
+Program: Odin Digital
+Edge detection with automatic thresholds
+
+The image is converted to grayscale, blurred and differentiated with Sobel
+once, in parallel horizontal bands. The bands overlap by the radius of the
+blur and Sobel kernels, so that the gradients are exactly those of the whole
+image. Non-maximum suppression and hysteresis need the whole image and run
+in a single cv2.Canny call on the gradients, which can be reused for any
+number of threshold pairs. Thresholds are chosen from the median or the Otsu
+threshold of a downsampled copy of the blurred image.
+
+Usage:
+    edges = find_edges(image)
+    gradients = compute_gradients(image)
+    low, high = auto_thresholds(gradients.gray, "otsu")
+    edges = edges_from_gradients(gradients, low, high)
+"""
+
+# IMPORTS
+
+from collections import namedtuple
+import os
+
+from instrument import instrumented
+from lazyimport import lazy_import
+from resizing import downscale
+
+futures = lazy_import("concurrent.futures")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+EDGE_BLUR_SIZE = 5
+# images are split in bands of at least this many rows
+EDGE_BAND_MIN_ROWS = 256
+THRESHOLD_METHODS = ["median", "otsu"]
+# spread of the thresholds around the median of the gray levels
+MEDIAN_THRESHOLD_SIGMA = 0.33
+# thresholds are computed on a copy of the image downscaled to this size
+THRESHOLD_SAMPLE_SIZE = 512
+
+Gradients = namedtuple("Gradients", ["gray", "dx", "dy"])
+
+# FUNCTIONS
+
+def auto_thresholds(gray, method = "median"):
+    """Computes the hysteresis thresholds of Canny from the gray levels
+
+    Args:
+        gray (numpy.ndarray): blurred 8-bit single-channel image
+        method (str): one of THRESHOLD_METHODS
+
+    Returns:
+        tuple (int, int): low and high thresholds
+    """
+
+    if method not in THRESHOLD_METHODS:
+        raise ValueError(f"Unknown threshold method {method}")
+
+    height, width = gray.shape
+    scale = min(1, THRESHOLD_SAMPLE_SIZE / max(height, width))
+    sample = downscale(gray, (max(1, round(width * scale)), max(1, round(height * scale))))
+
+    if method == "otsu":
+        high, _ = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        return (int(high) // 2, int(high))
+
+    histogram = np.bincount(sample.ravel(), minlength = 256)
+    median = int(np.searchsorted(np.cumsum(histogram), (sample.size + 1) // 2))
+    return (int(max(0, (1 - MEDIAN_THRESHOLD_SIGMA) * median)),
+        int(min(255, (1 + MEDIAN_THRESHOLD_SIGMA) * median)))
+
+@instrumented()
+def compute_gradients(image, blur_size = EDGE_BLUR_SIZE, workers = None):
+    """Converts an image to grayscale, blurs it and computes its gradients
+
+    Args:
+        image (numpy.ndarray): 8-bit OpenCV-compatible image
+        blur_size (int): odd size of the Gaussian blur, 0 or 1 for none
+        workers (int): number of threads, None for the CPU count
+
+    Returns:
+        Gradients: blurred grayscale image and its int16 Sobel derivatives,
+            as computed by cv2.Canny
+    """
+
+    height = image.shape[0]
+    gray = np.empty(image.shape[:2], np.uint8)
+    dx = np.empty(image.shape[:2], np.int16)
+    dy = np.empty(image.shape[:2], np.int16)
+
+    # rows of a band affected by the border of its slice
+    halo = (blur_size // 2 if blur_size > 1 else 0) + 1
+    workers = workers or os.cpu_count()
+    bands = max(1, min(workers, height // EDGE_BAND_MIN_ROWS))
+    bounds = [height * i // bands for i in range(bands + 1)]
+
+    def process_band(first, last):
+        start, stop = max(0, first - halo), min(height, last + halo)
+        band = image[start:stop]
+
+        if band.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if band.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            band = cv2.cvtColor(band, code)
+        if blur_size > 1:
+            band = cv2.GaussianBlur(band, (blur_size, blur_size), 0)
+
+        # cv2.Canny differentiates with a 3x3 Sobel and a replicated border
+        band_dx = cv2.Sobel(band, cv2.CV_16S, 1, 0, borderType = cv2.BORDER_REPLICATE)
+        band_dy = cv2.Sobel(band, cv2.CV_16S, 0, 1, borderType = cv2.BORDER_REPLICATE)
+
+        rows = slice(first - start, last - start)
+        gray[first:last] = band[rows]
+        dx[first:last] = band_dx[rows]
+        dy[first:last] = band_dy[rows]
+
+    if bands == 1:
+        process_band(0, height)
+    else:
+        with futures.ThreadPoolExecutor(max_workers = bands) as executor:
+            list(executor.map(process_band, bounds[:-1], bounds[1:]))
+
+    return Gradients(gray, dx, dy)
+
+@instrumented()
+def edges_from_gradients(gradients, threshold1, threshold2):
+    """Runs the non-maximum suppression and hysteresis of Canny
+
+    Args:
+        gradients (Gradients): gradients returned by compute_gradients
+        threshold1 (int): first threshold of the hysteresis
+        threshold2 (int): second threshold of the hysteresis
+
+    Returns:
+        numpy.ndarray: single-channel image with the edges in white
+    """
+
+    return cv2.Canny(gradients.dx, gradients.dy, threshold1, threshold2)
+
+@instrumented()
+def find_edges(image, thresholds = "median", blur_size = EDGE_BLUR_SIZE, workers = None):
+    """Detects the edges of an image with the Canny algorithm
+
+    Args:
+        image (numpy.ndarray): 8-bit OpenCV-compatible image
+        thresholds (str or tuple (int, int)): one of THRESHOLD_METHODS, or
+            the low and high thresholds of the hysteresis
+        blur_size (int): odd size of the Gaussian blur, 0 or 1 for none
+        workers (int): number of threads, None for the CPU count
+
+    Returns:
+        numpy.ndarray: single-channel image with the edges in white
+    """
+
+    gradients = compute_gradients(image, blur_size, workers)
+    if isinstance(thresholds, str):
+        thresholds = auto_thresholds(gradients.gray, thresholds)
+
+    return edges_from_gradients(gradients, *thresholds)
+
+def find_edges_multi(image, thresholds_list, blur_size = EDGE_BLUR_SIZE, workers = None):
+    """Detects the edges of an image with several thresholds
+
+    The gradients are computed once and shared.
+
+    Args:
+        image (numpy.ndarray): 8-bit OpenCV-compatible image
+        thresholds_list (list of str or tuple (int, int)): thresholds, as in
+            find_edges
+        blur_size (int): odd size of the Gaussian blur, 0 or 1 for none
+        workers (int): number of threads, None for the CPU count
+
+    Returns:
+        list of numpy.ndarray: edges, in the order of thresholds_list
+    """
+
+    gradients = compute_gradients(image, blur_size, workers)
+    results = []
+
+    for thresholds in thresholds_list:
+        if isinstance(thresholds, str):
+            thresholds = auto_thresholds(gradients.gray, thresholds)
+        results.append(edges_from_gradients(gradients, *thresholds))
+
+    return results
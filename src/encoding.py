@@ -0,0 +1,350 @@
+"""
+Program: Odin Digital
+Encoding of images with explicit settings, in parallel and in the background
+
+Every format is written with explicit encoder settings instead of the
+defaults of cv2.imwrite: PNG compression level, JPEG quality, progressive
+and optimized Huffman tables, WebP quality or lossless, and TIFF compression
+(LZW by default), predictor and strip height. TIFF files are written in
+strips, not tiles: neither OpenCV nor Pillow writes tiled TIFF, the strip
+height sets how many rows a reader decodes at once. Several formats or sizes
+of one image are encoded in parallel threads, OpenCV releasing the GIL while
+it encodes, and a SaveQueue writes images in the background so that the
+caller (the interface) does not wait for large PNG files. Files are written
+to a temporary file and renamed, so that a file is never seen half written.
+
+Usage:
+    write_image("out.png", image, {"png_compression": 1})
+    write_outputs(image, [Output("out.png"), Output("out.webp", {"webp_quality": 80}),
+        Output("thumb.jpg", size = (256, 256))])
+    with SaveQueue() as saves:
+        future = saves.submit(image, "big.png")
+"""
+
+# IMPORTS
+
+from collections import namedtuple
+import argparse
+import os
+import threading
+
+from instrument import stage
+from lazyimport import lazy_import
+from resizing import thumbnail_ladder
+
+futures = lazy_import("concurrent.futures")
+cv2 = lazy_import("cv2")
+
+# CONSTANTS
+
+# settings of every format, prefixed by the format (see benchmark_encoders)
+DEFAULT_ENCODER_SETTINGS = {
+    # level 1 is a few percent larger than 3 in two thirds of the time,
+    # levels above 3 take two to four times longer for a few percent less
+    "png_compression": 1,
+    "jpeg_quality": 95,
+    "jpeg_progressive": False,
+    "jpeg_optimize": False,
+    "webp_quality": 90,
+    "webp_lossless": False,
+    "tiff_compression": "lzw",
+    "tiff_predictor": True,
+    # 0 for the libtiff default, about 8 kB per strip; there is no tile
+    # setting, OpenCV only writes strips
+    "tiff_rows_per_strip": 0
+}
+ENCODER_FORMATS = {
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".jpe": "jpeg",
+    ".webp": "webp",
+    ".tif": "tiff",
+    ".tiff": "tiff"
+}
+# compression codes of the TIFF specification
+TIFF_COMPRESSIONS = {
+    "none": 1,
+    "lzw": 5,
+    "deflate": 8,
+    "packbits": 32773
+}
+TIFF_PREDICTOR_NONE = 1
+TIFF_PREDICTOR_HORIZONTAL = 2
+
+Output = namedtuple("Output", ["path", "settings", "size"], defaults = [None, None])
+
+# FUNCTIONS
+
+def encode_image(image, extension, settings = None):
+    """Encodes an image in memory
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        extension (str): extension of the format, such as ".png"
+        settings (dict): encoder settings overriding DEFAULT_ENCODER_SETTINGS
+
+    Returns:
+        numpy.ndarray: bytes of the encoded file
+
+    Raises:
+        ValueError: if the image cannot be encoded in the format
+    """
+
+    try:
+        encoded, buffer = cv2.imencode(extension, image, encoder_params(extension, settings))
+    except cv2.error:
+        encoded = False
+    if not encoded:
+        raise ValueError(f"The image cannot be encoded as {extension}")
+
+    return buffer
+
+def encoder_params(extension, settings = None):
+    """Gets the cv2.imwrite parameters of a format
+
+    Args:
+        extension (str): extension of the format, such as ".png"
+        settings (dict): encoder settings overriding DEFAULT_ENCODER_SETTINGS,
+            the settings of the other formats are ignored
+
+    Returns:
+        list of int: flags and values, empty for the formats without settings
+
+    Raises:
+        ValueError: if a setting is unknown or a value is invalid
+    """
+
+    settings = dict(DEFAULT_ENCODER_SETTINGS, **(settings or {}))
+    unknown = set(settings).difference(DEFAULT_ENCODER_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown encoder settings {sorted(unknown)}")
+
+    encoder_format = ENCODER_FORMATS.get(extension.lower())
+
+    if encoder_format == "png":
+        if not 0 <= settings["png_compression"] <= 9:
+            raise ValueError("The PNG compression level must be between 0 and 9")
+        return [cv2.IMWRITE_PNG_COMPRESSION, settings["png_compression"]]
+    if encoder_format == "jpeg":
+        if not 0 <= settings["jpeg_quality"] <= 100:
+            raise ValueError("The JPEG quality must be between 0 and 100")
+        return [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"],
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(settings["jpeg_progressive"]),
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(settings["jpeg_optimize"])]
+    if encoder_format == "webp":
+        if not 1 <= settings["webp_quality"] <= 100:
+            raise ValueError("The WebP quality must be between 1 and 100")
+        # qualities above 100 are lossless
+        return [cv2.IMWRITE_WEBP_QUALITY,
+            101 if settings["webp_lossless"] else settings["webp_quality"]]
+    if encoder_format == "tiff":
+        if settings["tiff_compression"] not in TIFF_COMPRESSIONS:
+            raise ValueError("The TIFF compression must be one of "
+                f"{', '.join(TIFF_COMPRESSIONS)}")
+        params = [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSIONS[settings["tiff_compression"]]]
+        # the predictor only applies to LZW and deflate
+        if settings["tiff_compression"] in ("lzw", "deflate"):
+            params += [cv2.IMWRITE_TIFF_PREDICTOR, TIFF_PREDICTOR_HORIZONTAL
+                if settings["tiff_predictor"] else TIFF_PREDICTOR_NONE]
+        if settings["tiff_rows_per_strip"]:
+            params += [cv2.IMWRITE_TIFF_ROWSPERSTRIP, settings["tiff_rows_per_strip"]]
+        return params
+
+    return []
+
+def parse_setting(text):
+    """Parses an encoder setting of the command line
+
+    Args:
+        text (str): setting as KEY=VALUE, KEY one of DEFAULT_ENCODER_SETTINGS
+
+    Returns:
+        tuple (str, int or bool or str): key and value, of the type of the
+            default value
+    """
+
+    key, separator, value = text.partition("=")
+    if not separator or key not in DEFAULT_ENCODER_SETTINGS:
+        raise argparse.ArgumentTypeError(
+            f"expected KEY=VALUE, KEY one of {', '.join(DEFAULT_ENCODER_SETTINGS)}")
+
+    default = DEFAULT_ENCODER_SETTINGS[key]
+    if isinstance(default, bool):
+        if value.lower() not in ("true", "false", "1", "0"):
+            raise argparse.ArgumentTypeError(f"{key} must be true or false")
+        return (key, value.lower() in ("true", "1"))
+    if isinstance(default, int):
+        try:
+            return (key, int(value))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"{key} must be an integer") from None
+
+    return (key, value)
+
+def write_image(path, image, settings = None):
+    """Encodes an image and writes it to a file
+
+    Args:
+        path (str): path of the file, whose extension sets the format
+        image (numpy.ndarray): OpenCV-compatible image
+        settings (dict): encoder settings overriding DEFAULT_ENCODER_SETTINGS
+
+    Returns:
+        int: size of the file in bytes
+
+    Raises:
+        ValueError: if the image cannot be encoded in the format
+        OSError: if the file cannot be written
+    """
+
+    with stage("encode", path = path):
+        buffer = encode_image(image, os.path.splitext(path)[1], settings)
+
+    # renamed once complete, so that the file is never seen half written
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(buffer)
+        os.replace(temporary_path, path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    return buffer.nbytes
+
+def write_outputs(image, outputs, workers = None):
+    """Writes several formats and sizes of an image in parallel threads
+
+    The sizes are computed from the image once, sharing their halved levels
+    (see thumbnail_ladder), and every output is then encoded in a thread.
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        outputs (list of Output): path, encoder settings and (width, height)
+            to fit the image within, None for its own size
+        workers (int): number of encoding threads, None for the CPU count
+
+    Returns:
+        list of int: size in bytes of every file, in the order of outputs
+
+    Raises:
+        ValueError: if an image cannot be encoded in its format
+        OSError: if a file cannot be written
+    """
+
+    sizes = sorted({output.size for output in outputs if output.size is not None})
+    resized = dict(zip(sizes, thumbnail_ladder(image, sizes, "fit")))
+
+    with futures.ThreadPoolExecutor(max_workers = workers or os.cpu_count()) as executor:
+        jobs = [executor.submit(write_image, output.path,
+            image if output.size is None else resized[output.size], output.settings)
+            for output in outputs]
+        return [job.result() for job in jobs]
+
+# CLASSES
+
+class SaveQueue:
+    """Writes images in background threads
+
+    The images must not be modified until they are written: they are
+    encoded from the array given to submit, not from a copy.
+    """
+
+    def __init__(self, workers = 1):
+        """Starts the queue
+
+        Args:
+            workers (int): number of writing threads
+        """
+
+        self._executor = futures.ThreadPoolExecutor(max_workers = workers,
+            thread_name_prefix = "save")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @property
+    def pending(self):
+        """int: number of images waiting to be written or being written"""
+
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        """Waits for the queued images to be written and stops the threads"""
+
+        self._executor.shutdown(wait = True)
+
+    def submit(self, image, path, settings = None):
+        """Queues an image to be written
+
+        Args:
+            image (numpy.ndarray): OpenCV-compatible image
+            path (str): path of the file, whose extension sets the format
+            settings (dict): encoder settings overriding
+                DEFAULT_ENCODER_SETTINGS
+
+        Returns:
+            concurrent.futures.Future: future of the size of the file in
+                bytes, or of the error of write_image
+        """
+
+        return self._track(self._executor.submit(write_image, path, image, settings))
+
+    def submit_outputs(self, image, outputs, workers = None):
+        """Queues several formats and sizes of an image to be written
+
+        Args:
+            image (numpy.ndarray): OpenCV-compatible image
+            outputs (list of Output): see write_outputs
+            workers (int): number of encoding threads, None for the CPU count
+
+        Returns:
+            concurrent.futures.Future: future of the sizes of the files
+        """
+
+        return self._track(self._executor.submit(write_outputs, image, outputs, workers))
+
+    def wait(self, timeout = None):
+        """Waits for the images queued so far to be written
+
+        Args:
+            timeout (float): maximum time to wait in seconds, None for no
+                limit
+
+        Returns:
+            bool: True if they are all written
+        """
+
+        with self._lock:
+            pending = list(self._pending)
+        _, not_done = futures.wait(pending, timeout = timeout)
+
+        return not not_done
+
+    def _track(self, future):
+        """Counts a job as pending until it is done
+
+        Args:
+            future (concurrent.futures.Future): job of the executor
+
+        Returns:
+            concurrent.futures.Future: future
+        """
+
+        with self._lock:
+            self._pending.add(future)
+
+        def forget(done):
+            with self._lock:
+                self._pending.discard(done)
+
+        future.add_done_callback(forget)
+        return future
@@ -0,0 +1,200 @@
+"""
+Program: Odin Digital
+Geometric transforms of images
+
+Transforms are 3x3 affine matrices mapping input pixel coordinates to output
+pixel coordinates, paired with the (width, height) of the output. Successive
+transforms (rotate, scale, crop) are composed into a single matrix so that
+the image is resampled once. Rotations by right angles are done exactly with
+cv2.rotate instead of being resampled, and large downscales are prefiltered
+by halving the image along the shrunk axes so that they do not alias.
+"""
+
+# IMPORTS
+
+from lazyimport import lazy_import
+from resizing import halve
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+# names of the OpenCV constants, so that OpenCV is not loaded on import
+RIGHT_ANGLE_ROTATIONS = {
+    90: "ROTATE_90_COUNTERCLOCKWISE",
+    180: "ROTATE_180",
+    270: "ROTATE_90_CLOCKWISE"
+}
+INTERPOLATIONS = {
+    "nearest": "INTER_NEAREST",
+    "linear": "INTER_LINEAR",
+    "cubic": "INTER_CUBIC",
+    "area": "INTER_AREA",
+    "lanczos": "INTER_LANCZOS4"
+}
+
+# FUNCTIONS
+
+def apply_transform(image, transform, interpolation = None):
+    """Applies a transform to an image, resampling it once
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        transform (tuple (numpy.ndarray, tuple (int, int))): matrix and output
+            (width, height), as returned by the *_transform functions
+        interpolation (int): OpenCV interpolation flag, None for bilinear
+
+    Returns:
+        numpy.ndarray: transformed image
+    """
+
+    matrix, size = transform
+    if interpolation is None:
+        interpolation = cv2.INTER_LINEAR
+
+    # warpAffine samples the image without averaging, shrinking by 2x or
+    # more skips pixels: halve the image first and map from the halved one,
+    # every axis on its own, the norm of a column of the matrix being the
+    # scale of the image along that axis
+    while True:
+        scales = np.linalg.norm(matrix[:2, :2], axis = 0)
+        columns = scales[0] <= 0.5 and image.shape[1] >= 2
+        rows = scales[1] <= 0.5 and image.shape[0] >= 2
+        if not columns and not rows:
+            break
+        halved = halve(image, columns, rows)
+        halved_matrix = scale_transform((image.shape[1], image.shape[0]),
+            (halved.shape[1], halved.shape[0]))[0]
+        matrix = matrix @ np.linalg.inv(halved_matrix)
+        image = halved
+
+    height, width = image.shape[:2]
+
+    for angle in (0, 90, 180, 270):
+        right_angle_matrix, right_angle_size = rotation_transform((width, height), angle)
+        if size == right_angle_size and np.allclose(matrix, right_angle_matrix):
+            if angle == 0:
+                return image.copy()
+            return cv2.rotate(image, getattr(cv2, RIGHT_ANGLE_ROTATIONS[angle]))
+
+    return cv2.warpAffine(image, matrix[:2], size, flags = interpolation)
+
+def compose_transforms(*transforms):
+    """Composes transforms applied one after the other
+
+    Args:
+        *transforms (tuple (numpy.ndarray, tuple (int, int))): transforms, in
+            the order they are applied
+
+    Returns:
+        tuple (numpy.ndarray, tuple (int, int)): single transform with the
+            output size of the last one
+    """
+
+    matrix = np.eye(3)
+    for transform_matrix, _ in transforms:
+        matrix = transform_matrix @ matrix
+
+    return (matrix, transforms[-1][1])
+
+def crop_transform(x, y, width, height):
+    """Builds the transform that crops a rectangle
+
+    Args:
+        x (int): left column of the rectangle
+        y (int): top row of the rectangle
+        width (int): width of the rectangle
+        height (int): height of the rectangle
+
+    Returns:
+        tuple (numpy.ndarray, tuple (int, int)): matrix and output size
+    """
+
+    matrix = np.array([[1., 0., -x], [0., 1., -y], [0., 0., 1.]])
+    return (matrix, (width, height))
+
+def interpolation_flag(name):
+    """Gets the OpenCV flag of an interpolation
+
+    Args:
+        name (str): one of INTERPOLATIONS, or "auto"
+
+    Returns:
+        int: OpenCV interpolation flag, None for "auto"
+    """
+
+    if name == "auto":
+        return None
+
+    return getattr(cv2, INTERPOLATIONS[name])
+
+def rotation_transform(size, angle):
+    """Builds the transform that rotates an image without cropping it
+
+    Source:
+        https://stackoverflow.com/questions/43892506/opencv-python-rotate-image-without-cropping-sides
+
+    Args:
+        size (tuple (int, int)): (width, height) of the image
+        angle (float): rotation angle in degrees, counterclockwise
+
+    Returns:
+        tuple (numpy.ndarray, tuple (int, int)): matrix and output size
+    """
+
+    width, height = size
+
+    if angle % 90 == 0:
+        # exact matrix, without the rounding errors of cos and sin, rotating
+        # about the center of the pixels so that it matches cv2.rotate
+        quarter_turns = int(angle // 90) % 4
+        cos, sin = [(1, 0), (0, 1), (-1, 0), (0, -1)][quarter_turns]
+        bound_w, bound_h = (height, width) if quarter_turns % 2 else (width, height)
+        center_x, center_y = (width - 1) / 2, (height - 1) / 2
+        matrix = np.array([
+            [cos, sin, (bound_w - 1) / 2 - cos * center_x - sin * center_y],
+            [-sin, cos, (bound_h - 1) / 2 + sin * center_x - cos * center_y],
+            [0., 0., 1.]])
+        return (matrix, (bound_w, bound_h))
+
+    # getRotationMatrix2D needs coordinates in reverse order (width, height) compared to shape
+    image_center = (width/2, height/2)
+    rotation_mat = cv2.getRotationMatrix2D(image_center, angle, 1.)
+
+    # rotation calculates the cos and sin, taking absolutes of those.
+    abs_cos = abs(rotation_mat[0,0])
+    abs_sin = abs(rotation_mat[0,1])
+
+    # find the new width and height bounds
+    bound_w = int(height * abs_sin + width * abs_cos)
+    bound_h = int(height * abs_cos + width * abs_sin)
+
+    # subtract old image center (bringing image back to origo)
+    # and adding the new image center coordinates
+    rotation_mat[0, 2] += bound_w/2 - image_center[0]
+    rotation_mat[1, 2] += bound_h/2 - image_center[1]
+
+    return (np.vstack([rotation_mat, [0, 0, 1]]), (bound_w, bound_h))
+
+def scale_transform(size, new_size):
+    """Builds the transform that resizes an image
+
+    Pixel centers are mapped as cv2.resize does.
+
+    Args:
+        size (tuple (int, int)): (width, height) of the image
+        new_size (tuple (int, int)): (width, height) of the resized image
+
+    Returns:
+        tuple (numpy.ndarray, tuple (int, int)): matrix and output size
+    """
+
+    scale_x = new_size[0] / size[0]
+    scale_y = new_size[1] / size[1]
+
+    matrix = np.array([
+        [scale_x, 0., 0.5 * scale_x - 0.5],
+        [0., scale_y, 0.5 * scale_y - 0.5],
+        [0., 0., 1.]])
+    return (matrix, tuple(new_size))
@@ -0,0 +1,164 @@
+"""
+Program: Odin Digital
+Cache of decoded images
+
+Decoded images are kept in memory, least recently used first out, within a
+limit on their total size in bytes. An entry is decoded again when the file
+changes (modification time or size). Cached images are read-only: copy
+them before drawing on them.
+
+With a raw cache directory set, images are mapped from their raw files (see
+rawcache) instead of being decoded, and the raw file of an image is written
+the first time it is decoded. Mapped images are not kept in memory.
+"""
+
+# IMPORTS
+
+from collections import OrderedDict
+import os
+import threading
+
+from instrument import stage
+from lazyimport import lazy_import
+from rawcache import RAW_CACHE_ENVIRONMENT_VARIABLE, build_raw, open_raw
+
+cv2 = lazy_import("cv2")
+
+# CONSTANTS
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0, "max_bytes": DEFAULT_MAX_BYTES,
+    "raw_hits": 0, "raw_cache": None}
+
+# FUNCTIONS
+
+def cache_info():
+    """Gets the statistics of the cache
+
+    Returns:
+        dict: number of "hits", "misses" and "evictions", number of cached
+            "images", their total size "bytes", the limit "max_bytes", the
+            number of images mapped from the raw cache "raw_hits" and its
+            directory "raw_cache"
+    """
+
+    with _lock:
+        return dict(_stats, images = len(_cache))
+
+def clear_cache():
+    """Removes every image from the cache and resets its statistics"""
+
+    with _lock:
+        _cache.clear()
+        _stats.update(hits = 0, misses = 0, evictions = 0, bytes = 0, raw_hits = 0)
+
+def read_image(path, flags = None):
+    """Reads an image, decoding it only if it is not cached
+
+    Args:
+        path (str): path of the image
+        flags (int): cv2.imread flags, None for cv2.IMREAD_COLOR
+
+    Returns:
+        numpy.ndarray: read-only OpenCV-compatible image, or None if the file
+            cannot be read as an image
+    """
+
+    if flags is None:
+        flags = cv2.IMREAD_COLOR
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (os.path.abspath(path), flags)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[1]
+        raw_cache = _stats["raw_cache"]
+
+    if raw_cache is not None:
+        image = open_raw(path, raw_cache, flags)
+        if image is not None:
+            with _lock:
+                _stats["raw_hits"] += 1
+            return image
+
+    with _lock:
+        _stats["misses"] += 1
+
+    # decoded outside the lock, so that other threads can use the cache
+    with stage("decode", path = path):
+        image = cv2.imread(path, flags)
+    if image is None:
+        return None
+    image.flags.writeable = False
+
+    if raw_cache is not None:
+        try:
+            build_raw(path, raw_cache, flags, image)
+        except OSError:
+            # the image is still cached in memory
+            pass
+
+    with _lock:
+        previous = _cache.pop(key, None)
+        if previous is not None:
+            _stats["bytes"] -= previous[1].nbytes
+
+        if image.nbytes <= _stats["max_bytes"]:
+            _cache[key] = (version, image)
+            _stats["bytes"] += image.nbytes
+            evict(_stats["max_bytes"])
+
+    return image
+
+def evict(max_bytes):
+    """Removes the least recently used images until the cache fits a size
+
+    Must be called with the lock of the cache held.
+
+    Args:
+        max_bytes (int): maximum total size of the cached images
+    """
+
+    while _stats["bytes"] > max_bytes:
+        _, (_, image) = _cache.popitem(last = False)
+        _stats["bytes"] -= image.nbytes
+        _stats["evictions"] += 1
+
+def set_cache_limit(max_bytes):
+    """Sets the maximum total size of the cached images
+
+    Args:
+        max_bytes (int): maximum size in bytes, 0 disables the cache
+    """
+
+    with _lock:
+        _stats["max_bytes"] = max_bytes
+        evict(max_bytes)
+
+def set_raw_cache(directory):
+    """Sets the directory of the raw cache, where decoded images are mapped
+    from
+
+    Args:
+        directory (str): directory of the raw files, None to not use them
+    """
+
+    with _lock:
+        _stats["raw_cache"] = directory
+
+# MAIN
+
+if os.environ.get(RAW_CACHE_ENVIRONMENT_VARIABLE):
+    set_raw_cache(os.environ[RAW_CACHE_ENVIRONMENT_VARIABLE])
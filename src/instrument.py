@@ -0,0 +1,290 @@
+"""
+Program: Odin Digital
+Timing and memory instrumentation of the processing stages
+
+Stages are recorded with the instrumented decorator or the stage context
+manager: wall time, CPU time of the process, bytes allocated (net and peak,
+as traced by tracemalloc) and the dimensions of the images. tracemalloc
+sees the Python objects and NumPy arrays, including the arrays returned by
+OpenCV, but not the buffers OpenCV allocates for itself while it works
+(cv::Mat temporaries, such as the maps of cv2.Canny), so the peaks of the
+OpenCV stages are lower bounds; benchsuite reports the peak resident memory,
+which covers them. Recording is off by default, and then costs a flag test
+per call. The records are written as JSON lines or as a Chrome
+trace, to open in chrome://tracing or https://ui.perfetto.dev.
+
+Setting the ODIN_DIGITAL_TRACE environment variable to a file path enables
+recording and writes the records there on exit: a Chrome trace for a .json
+path, JSON lines otherwise.
+
+Usage:
+    enable()
+    with stage("decode", path = path):
+        image = cv2.imread(path)
+    write_trace("trace.json")
+"""
+
+# IMPORTS
+
+from collections import deque
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from lazyimport import lazy_import
+
+multiprocessing = lazy_import("multiprocessing")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+TRACE_ENVIRONMENT_VARIABLE = "ODIN_DIGITAL_TRACE"
+# oldest records are dropped beyond this number
+MAX_RECORDS = 100000
+
+_state = {"enabled": False, "started_tracemalloc": False}
+_records = deque(maxlen = MAX_RECORDS)
+_local = threading.local()
+_lock = threading.Lock()
+_disabled_stage = contextlib.nullcontext()
+
+# FUNCTIONS
+
+def add_records(records):
+    """Adds records made elsewhere, such as in a worker process
+
+    Args:
+        records (list of dict): records returned by take_records
+    """
+
+    with _lock:
+        _records.extend(records)
+
+def disable():
+    """Stops recording, the records made so far are kept"""
+
+    _state["enabled"] = False
+    if _state["started_tracemalloc"]:
+        tracemalloc.stop()
+        _state["started_tracemalloc"] = False
+
+def enable():
+    """Starts recording the stages"""
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state["started_tracemalloc"] = True
+    _state["enabled"] = True
+
+def image_dimensions(values):
+    """Gets the dimensions of the images among some values
+
+    Args:
+        values (iterable): arguments or results of a function
+
+    Returns:
+        list of list of int: shapes of the NumPy arrays among the values
+    """
+
+    return [list(value.shape) for value in values if isinstance(value, np.ndarray)]
+
+def instrumented(name = None):
+    """Decorator that records every call of a function as a stage
+
+    The dimensions of the image arguments are recorded in "inputs" and those
+    of the image results in "outputs".
+
+    Args:
+        name (str): name of the stage, the name of the function by default
+
+    Returns:
+        callable: decorator
+    """
+
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return function(*args, **kwargs)
+
+            with stage(stage_name, inputs = image_dimensions(args)) as details:
+                result = function(*args, **kwargs)
+                results = result if isinstance(result, tuple) else (result,)
+                details["outputs"] = image_dimensions(results)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+def is_enabled():
+    """Tells whether the stages are recorded
+
+    Returns:
+        bool: True if recording is on
+    """
+
+    return _state["enabled"]
+
+def records():
+    """Gets a copy of the records
+
+    Returns:
+        list of dict: records, oldest first
+    """
+
+    with _lock:
+        return list(_records)
+
+def stage(name, **details):
+    """Context manager that records a stage
+
+    The value of the with statement is a dict of details of the record,
+    where the body can add its own.
+
+    Args:
+        name (str): name of the stage
+        **details: details of the record, such as the path of a file
+
+    Returns:
+        context manager: records the stage on exit, does nothing and gives
+            None if recording is off
+    """
+
+    if not _state["enabled"]:
+        return _disabled_stage
+
+    return _recorded_stage(name, details)
+
+def take_records():
+    """Removes and returns the records
+
+    Returns:
+        list of dict: records, oldest first
+    """
+
+    with _lock:
+        taken = list(_records)
+        _records.clear()
+
+    return taken
+
+def write_log(path):
+    """Writes the records as JSON lines
+
+    Args:
+        path (str): path of the log file
+    """
+
+    with open(path, "w", encoding = "utf-8") as file:
+        for record in records():
+            file.write(json.dumps(record) + "\n")
+
+def write_trace(path):
+    """Writes the records as a Chrome trace
+
+    Args:
+        path (str): path of the JSON trace file
+    """
+
+    events = []
+    for record in records():
+        args = {key: value for key, value in record.items()
+            if key not in ("name", "start_us", "wall_ms", "pid", "tid")}
+        events.append({
+            "name": record["name"],
+            "cat": "odindigital",
+            "ph": "X",
+            "ts": record["start_us"],
+            "dur": record["wall_ms"] * 1e3,
+            "pid": record["pid"],
+            "tid": record["tid"],
+            "args": args
+        })
+
+    with open(path, "w", encoding = "utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+@contextlib.contextmanager
+def _recorded_stage(name, details):
+    """Records a stage, see stage
+
+    Nested stages are tracked per thread. Memory is traced for the whole
+    process, so stages running at the same time in several threads share
+    their allocations.
+
+    Args:
+        name (str): name of the stage
+        details (dict): details of the record
+    """
+
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+
+    # the peak of tracemalloc is reset for this stage, the enclosing stages
+    # keep the peak reached so far
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in frames:
+        frame["peak"] = max(frame["peak"], peak)
+    tracemalloc.reset_peak()
+    frame = {"start": current, "peak": current}
+    frames.append(frame)
+
+    start_wall = time.perf_counter_ns()
+    start_cpu = time.process_time_ns()
+
+    try:
+        yield details
+    finally:
+        wall = time.perf_counter_ns() - start_wall
+        cpu = time.process_time_ns() - start_cpu
+        current, peak = tracemalloc.get_traced_memory()
+        frames.pop()
+        frame["peak"] = max(frame["peak"], peak)
+        if frames:
+            frames[-1]["peak"] = max(frames[-1]["peak"], frame["peak"])
+
+        record = {
+            "name": name,
+            "start_us": start_wall / 1e3,
+            "wall_ms": wall / 1e6,
+            "cpu_ms": cpu / 1e6,
+            "allocated_bytes": current - frame["start"],
+            "peak_bytes": frame["peak"] - frame["start"],
+            "pid": os.getpid(),
+            "tid": threading.get_ident()
+        }
+        record.update(details)
+
+        with _lock:
+            _records.append(record)
+
+def _write_on_exit(path):
+    """Writes the records when the program exits
+
+    Args:
+        path (str): path of the trace (.json) or log file
+    """
+
+    if path.lower().endswith(".json"):
+        write_trace(path)
+    else:
+        write_log(path)
+
+# MAIN
+
+if os.environ.get(TRACE_ENVIRONMENT_VARIABLE):
+    enable()
+    # worker processes inherit the variable, their records are sent back to
+    # the main process, which writes the file
+    if multiprocessing.parent_process() is None:
+        atexit.register(_write_on_exit, os.environ[TRACE_ENVIRONMENT_VARIABLE])
@@ -0,0 +1,121 @@
+"""
+Program: Odin Digital
+Lazy imports of the heavy modules
+
+OpenCV, NumPy, PIL and tkinter take most of the startup time. A module
+imported with lazy_import is registered at once but only executed when one
+of its attributes is first used, so that startup does not pay for the
+tools that are not used. The parent packages of a submodule are imported
+lazily as well. Later imports of the same module, with import or
+lazy_import, share it.
+
+A module is executed once under a lock, so that threads which use it first
+at the same time wait for it to be complete. importlib.util.LazyLoader is
+not used, as before Python 3.12 it hands a module that is still executing
+to the other threads.
+
+Usage:
+    cv2 = lazy_import("cv2")
+"""
+
+# IMPORTS
+
+import importlib.machinery
+import importlib.util
+import sys
+import threading
+import types
+
+# CONSTANTS
+
+# specs of the modules imported lazily, read without executing them
+_specs = {}
+# lock of every module imported lazily, held while it is executed
+_locks = {}
+# modules being executed, whose attributes the executing thread reads as is
+_executing = set()
+_registry_lock = threading.RLock()
+
+# FUNCTIONS
+
+def lazy_import(name):
+    """Imports a module, deferring its execution until its first use
+
+    Args:
+        name (str): full name of the module, such as "PIL.Image"
+
+    Returns:
+        module: the module, loaded on first attribute access
+    """
+
+    with _registry_lock:
+        if name in sys.modules:
+            return sys.modules[name]
+
+        parent_name = name.rpartition(".")[0]
+        if parent_name:
+            lazy_import(parent_name)
+
+        spec = _find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name = name)
+
+        module = importlib.util.module_from_spec(spec)
+        _specs[name] = spec
+        _locks[name] = threading.RLock()
+        module.__class__ = _LazyModule
+        sys.modules[name] = module
+        if parent_name:
+            # bound on the parent as by import, without executing the parent
+            setattr(sys.modules[parent_name], name.rpartition(".")[2], module)
+
+    return module
+
+def _find_spec(name):
+    """Finds the spec of a module without executing it or its parents
+
+    importlib.util.find_spec imports the parent packages, and reads the
+    spec of a module already imported from the module, which executes a
+    lazy one.
+
+    Args:
+        name (str): full name of the module
+
+    Returns:
+        importlib.machinery.ModuleSpec: spec of the module, or None if it is
+            not found
+    """
+
+    if name in _specs:
+        return _specs[name]
+
+    parent_name = name.rpartition(".")[0]
+    if not parent_name or parent_name not in _specs:
+        return importlib.util.find_spec(name)
+
+    locations = _specs[parent_name].submodule_search_locations
+    if locations is None:
+        return None
+
+    return importlib.machinery.PathFinder.find_spec(name, locations)
+
+# CLASSES
+
+class _LazyModule(types.ModuleType):
+    """Module executed on the first access to one of its attributes"""
+
+    def __getattribute__(self, attribute):
+        spec = types.ModuleType.__getattribute__(self, "__spec__")
+
+        with _locks[spec.name]:
+            # the module may have been executed while waiting for the lock,
+            # and it reads its own attributes while executing
+            if type(self) is _LazyModule and spec.name not in _executing:
+                _executing.add(spec.name)
+                try:
+                    spec.loader.exec_module(self)
+                    self.__class__ = types.ModuleType
+                finally:
+                    _executing.discard(spec.name)
+
+        return types.ModuleType.__getattribute__(self, attribute)
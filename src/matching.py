@@ -0,0 +1,334 @@
+"""
+Program: Odin Digital
+Matching of several templates at several scales and rotations
+
+Every template variant is scored with the normalized cross-correlation of
+cv2.TM_CCOEFF_NORMED. The correlation is computed in the spatial domain by
+cv2.matchTemplate, whose cost grows with the size of the template, or as a
+product of Fourier transforms, whose cost depends only on the size of the
+scene. The Fourier transform wins for templates that are a sizeable part of
+the scene, and for smaller ones when the transform of the scene is shared
+by several templates. The grayscale scene, its integral images and its
+transform are computed once and shared by all the variants, which are
+scored in parallel threads; a prepared scene can be reused between calls.
+
+Usage:
+    detections = match_templates(image, templates, scales = (0.5, 1.0, 2.0))
+    scene = prepare_scene(image)
+    for templates in batches:
+        detections = match_templates(image, templates, scene = scene)
+"""
+
+# IMPORTS
+
+from collections import namedtuple
+
+from core import rotate_without_cropping, to_gray
+from instrument import instrumented
+from lazyimport import lazy_import
+
+futures = lazy_import("concurrent.futures")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+# Windows of the scene with a lower standard deviation (in gray levels) are
+# flat, their correlation is meaningless and scores 0
+MIN_WINDOW_STD = 1.0
+NMS_OVERLAP = 0.3
+CORRELATION_METHODS = ["auto", "spatial", "fft"]
+# smallest template, as a fraction of the area of the scene, correlated with
+# Fourier transforms when the transform of the scene is computed for it
+# alone, and when it is shared (see benchmark_match_backends)
+FFT_MIN_AREA_FRACTION = 0.08
+FFT_SHARED_MIN_AREA_FRACTION = 0.01
+
+Detection = namedtuple("Detection",
+    ["x", "y", "width", "height", "score", "template", "scale", "angle"])
+
+# FUNCTIONS
+
+def choose_correlation(scene_shape, template_shape, shared = False):
+    """Chooses how to correlate a template with a scene
+
+    Args:
+        scene_shape (tuple (int, int)): (height, width) of the scene
+        template_shape (tuple (int, int)): (height, width) of the template
+        shared (bool): True if the Fourier transform of the scene is
+            already computed, or shared by several templates
+
+    Returns:
+        str: "fft" or "spatial"
+    """
+
+    fraction = (template_shape[0] * template_shape[1]) / (scene_shape[0] * scene_shape[1])
+    min_fraction = FFT_SHARED_MIN_AREA_FRACTION if shared else FFT_MIN_AREA_FRACTION
+
+    return "fft" if fraction >= min_fraction else "spatial"
+
+def intersection_over_union(box_a, box_b):
+    """Computes the overlap of two detections
+
+    Args:
+        box_a (Detection): first detection
+        box_b (Detection): second detection
+
+    Returns:
+        float: area of the intersection divided by area of the union
+    """
+
+    width = min(box_a.x + box_a.width, box_b.x + box_b.width) - max(box_a.x, box_b.x)
+    height = min(box_a.y + box_a.height, box_b.y + box_b.height) - max(box_a.y, box_b.y)
+    if width <= 0 or height <= 0:
+        return 0.0
+
+    intersection = width * height
+    union = box_a.width * box_a.height + box_b.width * box_b.height - intersection
+    return intersection / union
+
+def make_template_variant(template_gray, scale, angle):
+    """Scales and rotates a grayscale template
+
+    The corners uncovered by the rotation are filled with the mean of the
+    template, so that they do not take part in the correlation.
+
+    Args:
+        template_gray (numpy.ndarray): single-channel template
+        scale (float): scale factor
+        angle (float): rotation angle in degrees, counterclockwise
+
+    Returns:
+        numpy.ndarray: float32 template variant
+    """
+
+    variant = template_gray.astype(np.float32)
+
+    if scale != 1:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        variant = cv2.resize(variant, None, fx = scale, fy = scale,
+            interpolation = interpolation)
+
+    if angle % 360 != 0:
+        coverage = rotate_without_cropping(np.ones_like(variant), angle)
+        mean = float(variant.mean())
+        variant = rotate_without_cropping(variant, angle)
+        variant += (1 - coverage) * mean
+
+    return variant
+
+@instrumented()
+def match_templates(image, templates, scales = (1.0,), angles = (0,), threshold = 0.8,
+    overlap = NMS_OVERLAP, workers = None, method = "auto", scene = None):
+    """Finds every occurrence of several templates within an image
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        templates (list of numpy.ndarray): OpenCV-compatible templates
+        scales (tuple of float): scale factors applied to every template
+        angles (tuple of float): rotation angles in degrees applied to every
+            template, counterclockwise
+        threshold (float): minimum normalized correlation of a detection,
+            between -1 and 1
+        overlap (float): maximum intersection over union of two detections,
+            the worst one is discarded above it
+        workers (int): number of scoring threads, None for the CPU count
+        method (str): one of CORRELATION_METHODS, "auto" to choose it for
+            every variant from its size
+        scene (dict): data of image returned by prepare_scene, to share it
+            between calls, None to compute it
+
+    Returns:
+        list of Detection: detections sorted by decreasing score; template is
+            the index of the template in templates
+    """
+
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method {method}")
+    if scene is None:
+        scene = prepare_scene(image)
+
+    variants = []
+    for index, template in enumerate(templates):
+        template_gray = to_gray(template)
+        for scale in scales:
+            for angle in angles:
+                variants.append((index, scale, angle,
+                    make_template_variant(template_gray, scale, angle)))
+
+    shared = len(variants) > 1 or "spectrum" in scene
+    methods = [method if method != "auto"
+        else choose_correlation(scene["gray"].shape, variant[3].shape, shared)
+        for variant in variants]
+    # computed before the threads start, which then only read it
+    if "fft" in methods:
+        scene_spectrum(scene)
+
+    with futures.ThreadPoolExecutor(max_workers = workers) as executor:
+        results = executor.map(
+            lambda variant, variant_method: score_variant(scene, *variant, threshold,
+                variant_method),
+            variants, methods)
+        detections = [detection for result in results for detection in result]
+
+    return non_maximum_suppression(detections, overlap)
+
+def non_maximum_suppression(detections, overlap):
+    """Discards the detections that overlap a better one
+
+    Args:
+        detections (list of Detection): detections to filter
+        overlap (float): maximum intersection over union of two detections
+
+    Returns:
+        list of Detection: kept detections, sorted by decreasing score
+    """
+
+    kept = []
+
+    for detection in sorted(detections, key = lambda detection: -detection.score):
+        if all(intersection_over_union(detection, other) <= overlap for other in kept):
+            kept.append(detection)
+
+    return kept
+
+def prepare_scene(image):
+    """Precomputes the data of an image shared by all the template variants
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+
+    Returns:
+        dict: grayscale image ("gray") and its integral images ("sum" and
+            "sqsum"); its Fourier transform ("spectrum") is added by
+            scene_spectrum
+    """
+
+    gray = to_gray(image).astype(np.float32)
+    window_sum, window_sqsum = cv2.integral2(gray, sdepth = cv2.CV_64F,
+        sqdepth = cv2.CV_64F)
+
+    return {
+        "gray": gray,
+        "sum": window_sum,
+        "sqsum": window_sqsum
+    }
+
+def scene_spectrum(scene):
+    """Gets the Fourier transform of a scene, computing it on first use
+
+    Args:
+        scene (dict): data returned by prepare_scene
+
+    Returns:
+        numpy.ndarray: transform of the grayscale scene padded to an optimal
+            size, in the packed format of cv2.dft
+    """
+
+    if "spectrum" not in scene:
+        height, width = scene["gray"].shape
+        padded = np.zeros((cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width)),
+            np.float32)
+        padded[:height, :width] = scene["gray"]
+        # the packed real transform is several times faster than the
+        # complex one
+        scene["spectrum"] = cv2.dft(padded)
+
+    return scene["spectrum"]
+
+def score_map(scene, template, method = "auto"):
+    """Computes the normalized cross-correlation of a template over a scene
+
+    Args:
+        scene (dict): data returned by prepare_scene
+        template (numpy.ndarray): float32 single-channel template
+        method (str): one of CORRELATION_METHODS
+
+    Returns:
+        numpy.ndarray: scores of every template position, as the result of
+            cv2.matchTemplate with TM_CCOEFF_NORMED
+    """
+
+    height, width = scene["gray"].shape
+    template_height, template_width = template.shape
+    result_shape = (height - template_height + 1, width - template_width + 1)
+
+    zero_mean = template - template.mean()
+    template_norm = float(np.sqrt(np.square(zero_mean).sum()))
+    if template_norm == 0:
+        return np.zeros(result_shape, np.float32)
+
+    if method == "auto":
+        method = choose_correlation(scene["gray"].shape, template.shape, "spectrum" in scene)
+
+    # the correlation with a zero-mean template is that with the zero-mean
+    # windows of the scene
+    if method == "spatial":
+        correlation = cv2.matchTemplate(scene["gray"], zero_mean, cv2.TM_CCORR)
+    else:
+        spectrum = scene_spectrum(scene)
+        padded = np.zeros(spectrum.shape, np.float32)
+        padded[:template_height, :template_width] = zero_mean
+
+        # circular correlation: no wrap-around at the valid positions
+        # because the padded size is at least the size of the scene
+        correlation = cv2.idft(cv2.mulSpectrums(spectrum, cv2.dft(padded), 0, conjB = True),
+            flags = cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[:result_shape[0], :result_shape[1]]
+
+    area = template_height * template_width
+    window_sum = window_sums(scene["sum"], template_height, template_width)
+    window_sqsum = window_sums(scene["sqsum"], template_height, template_width)
+    window_variance = np.maximum(window_sqsum - np.square(window_sum) / area, 0)
+
+    denominator = np.sqrt(window_variance) * template_norm
+    flat = window_variance < area * MIN_WINDOW_STD ** 2
+    denominator[flat] = 1
+
+    scores = (correlation / denominator).astype(np.float32)
+    scores[flat] = 0
+    return np.clip(scores, -1, 1, out = scores)
+
+def score_variant(scene, index, scale, angle, template, threshold, method = "auto"):
+    """Finds the detections of a template variant
+
+    Args:
+        scene (dict): data returned by prepare_scene
+        index (int): index of the original template
+        scale (float): scale factor of the variant
+        angle (float): rotation angle of the variant
+        template (numpy.ndarray): float32 template variant
+        threshold (float): minimum score of a detection
+        method (str): one of CORRELATION_METHODS
+
+    Returns:
+        list of Detection: local maxima of the score map above threshold
+    """
+
+    template_height, template_width = template.shape
+    if (template_height > scene["gray"].shape[0]
+        or template_width > scene["gray"].shape[1]):
+        return []
+
+    scores = score_map(scene, template, method)
+
+    # a peak is the best score within half the size of the template
+    kernel = np.ones((max(1, template_height // 2), max(1, template_width // 2)), np.uint8)
+    peaks = (scores >= threshold) & (scores >= cv2.dilate(scores, kernel))
+
+    return [Detection(int(x), int(y), template_width, template_height,
+        float(scores[y, x]), index, scale, angle) for y, x in zip(*np.nonzero(peaks))]
+
+def window_sums(integral, height, width):
+    """Sums every window of an image from its integral image
+
+    Args:
+        integral (numpy.ndarray): integral image, as returned by cv2.integral
+        height (int): height of the windows
+        width (int): width of the windows
+
+    Returns:
+        numpy.ndarray: sum of the window at every top-left position
+    """
+
+    return (integral[height:, width:] - integral[:-height, width:]
+        - integral[height:, :-width] + integral[:-height, :-width])
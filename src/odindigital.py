@@ -3,34 +3,63 @@ Program: Odin Digital
 Version: 1.3
 Author: Andrés González Méndez
 Date: 28 Oct 2022
-Main script
+Main script: graphical interface, and batch mode with arguments
+
+Usage:
+    python src/odindigital.py              starts the graphical interface
+    python src/odindigital.py -h           shows the batch processing options
 """
 
 # IMPORTS
 
-from tkinter import messagebox, filedialog, IntVar
-import tkinter as tk
-from PIL import Image, ImageTk
-import cv2
+import os
+import sys
+import time
+
+from compare import diff_images
+from core import (FILES_ALLOWED, PROGRAM_NAME, VERSION_NUMBER, compare_size_of_images,
+    detect_edges, find_template, get_image_size, image_cv2_to_pil, is_grayscale, load_preview,
+    make_preview, rotate_without_cropping, to_gray)
+from edges import THRESHOLD_METHODS, auto_thresholds, compute_gradients, edges_from_gradients
+from encoding import SaveQueue
+from imagecache import read_image
+from instrument import instrumented
+from lazyimport import lazy_import
+from resizing import RESIZE_MODES, resize
+from roi import clip_roi, crop
+
+# the widgets and OpenCV are loaded on first use, so that the batch mode does
+# not pay for them and the main window shows sooner
+futures = lazy_import("concurrent.futures")
+tk = lazy_import("tkinter")
+filedialog = lazy_import("tkinter.filedialog")
+messagebox = lazy_import("tkinter.messagebox")
+ttk = lazy_import("tkinter.ttk")
+ImageTk = lazy_import("PIL.ImageTk")
+cv2 = lazy_import("cv2")
 
 # CONSTANTS
 
-PROGRAM_NAME = "Odin Digital"
-VERSION_NUMBER = "1.3"
 FONT = "Verdana"
 WINDOW_BACKGROUND_COLOR = "light gray"
 WELCOME_TEXT = f"""Welcome to {PROGRAM_NAME} v{VERSION_NUMBER}, a digital image processing tool
 developed by your QA friend Andrés González.
 \nPlease select an option:"""
-FILES_ALLOWED = [("Image Files",
-    [".bmp", ".dib", ".jpeg", ".jpg", ".jpe", ".jp2", ".png",
-    ".pbm", ".pgm", ".ppm", ".sr", ".ras", ".tiff", ".tif"])]
+PIPELINE_FILES_ALLOWED = [("Pipeline Files", [".json"])]
 EXIT_APP_LABEL = "See you soon!"
 PADY_FRAMES = 30
 PADX_LABELS = 50
 PADY_LABELS = 5
 PADX_BUTTONS = 20
 PADY_BUTTONS = 20
+# fraction of the screen that an image window can take
+PREVIEW_SCREEN_FRACTION = 0.8
+# size of the live previews of rotate and resize, and delay after the last
+# change before they are rendered
+LIVE_PREVIEW_SIZE = 400
+LIVE_PREVIEW_DELAY_MS = 150
+JOB_POLL_INTERVAL_MS = 50
+ROI_COLOR = (0, 0, 255)
 
 # FUNCTIONS
 
@@ -53,7 +82,7 @@ def color_to_gray():
 
     display_image(color_image, "Color image")
 
-    gray_image = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
+    gray_image = to_gray(color_image)
     display_image(gray_image, "Gray image")
 
     return True
@@ -74,51 +103,22 @@ def compare_two_images():
             )
         return False
 
-    difference = cv2.absdiff(image_a, image_b)
-
-    num_different_pixels = cv2.countNonZero(
-        cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY))
+    difference = diff_images(image_a, image_b)
 
-    if num_different_pixels == 0:
+    if difference.changed_pixels == 0:
         messagebox.showinfo(
             title = "Result",
             message = "Both images are the same!"
             )
         return False
 
-    percentage_different_pixels = 100 * num_different_pixels/(
-        get_image_size(difference)[0]*get_image_size(difference)[1])
-
-    # TO DO:
-    # show the differences in white, instead of the difference color itself
-
     display_image(image_a, "Image n.1")
     display_image(image_b, "Image n.2")
-    display_image(difference, "Difference")
+    display_image(difference.mask, "Difference")
+    show_difference(difference)
 
-    messagebox.showinfo(
-        title = "Result",
-        message = f"""There are differences between the two images!
-        Difference: {percentage_different_pixels:.2f}%"""
-        )
     return True
 
-def compare_size_of_images(image1, image2):
-    """Compares the size of two images
-
-    Args:
-        image1 (numpy.ndarray): OpenCV-compatible image
-        image2 (numpy.ndarray): OpenCV-compatible image
-
-    Returns:
-        bool: True if sizes are equal, False otherwise
-    """
-
-    if get_image_size(image1) == get_image_size(image2):
-        return True
-
-    return False
-
 def digit_validation(char):
     """Checks that only numbers are entered in the Entry box
 
@@ -134,51 +134,177 @@ def digit_validation(char):
 
     return False
 
-def display_image(image, label):
+def display_image(image, label, window = None):
     """Displays an image in a new window
 
+    Images larger than the screen are shown downscaled, the full-resolution
+    image is only kept to be saved and processed. A region of interest can be
+    dragged over the image with the left button and processed from the menu
+    of the right button (see select_region).
+
     Args:
         image (numpy.ndarray): OpenCV-compatible image
         label (str): Text label shown above the image
+        window (tkinter.Toplevel): window of a previous display_image call to
+            show the image in, instead of a new window
+
+    Returns:
+        tkinter.Toplevel: window showing the image
     """
 
+    if window is not None and window.winfo_exists():
+        return update_image_window(window, image, label)
+
     window = tk.Toplevel(bg = WINDOW_BACKGROUND_COLOR)
     window.title(f"Image - {PROGRAM_NAME} v{VERSION_NUMBER}")
     window.resizable(False, False)
 
-    text_label = tk.Label(
+    window.text_label = tk.Label(
         window,
-        text = label,
         font = (FONT, 30),
         bg = WINDOW_BACKGROUND_COLOR
         )
-    text_label.pack(pady = PADY_LABELS)
-
-    image_tk = image_cv2_to_tk(image)
+    window.text_label.pack(pady = PADY_LABELS)
 
-    image_label = tk.Label(
+    # no border, so that the mouse coordinates are those of the preview
+    window.image_label = tk.Label(
         window,
         bg = WINDOW_BACKGROUND_COLOR,
-        image = image_tk
+        borderwidth = 0
     )
-    image_label.image = image_tk
-    image_label.pack()
+    window.image_label.pack()
+    select_region(window)
 
-    window.protocol("WM_DELETE_WINDOW", lambda: save_image(
-        window,
-        image,
-        "img",
-        "Select path to save image:")
-    )
+    return update_image_window(window, image, label)
 
 def edge_detection():
     """Script that detects edges in an image"""
 
-    image = open_image_dialog("img", "Select image")
-    edges = cv2.Canny(image,100,200)
+    preview, image = open_image_preview("img", "Select image", "Original image")
+    if preview is None:
+        return
 
-    display_image(image, "Original image")
-    display_image(edges, "Edges of the image")
+    dialog = tk.Toplevel(bg = WINDOW_BACKGROUND_COLOR)
+    dialog.title(f"Edge detection - {PROGRAM_NAME} v{VERSION_NUMBER}")
+    dialog.resizable(False, False)
+
+    thresholds_frame = tk.Frame(
+        dialog,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    thresholds_frame.pack()
+
+    thresholds_text_label = tk.Label(
+        thresholds_frame,
+        text = """Thresholds of the edges""",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR
+        )
+    thresholds_text_label.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+
+    # the preview detects the edges of a screen-sized copy of the image, and
+    # is rendered once the user stops dragging; the gradients of the image
+    # are computed once and reused for every threshold
+    proxy_gradients = compute_gradients(
+        make_preview(preview, LIVE_PREVIEW_SIZE, LIVE_PREVIEW_SIZE))
+    gradients = None
+    pending_preview = None
+    result_window = None
+
+    threshold_sliders = []
+    for text in ("Low", "High"):
+        threshold_sliders.append(
+            tk.Scale(
+                thresholds_frame,
+                from_ = 0,
+                to = 255,
+                orient = tk.HORIZONTAL,
+                length = 300,
+                label = text,
+                bg = WINDOW_BACKGROUND_COLOR
+            )
+        )
+        threshold_sliders[-1].pack(pady = PADY_LABELS)
+
+    def set_auto_thresholds(method):
+        for slider, threshold in zip(threshold_sliders,
+            auto_thresholds(proxy_gradients.gray, method)):
+            slider.set(threshold)
+
+    auto_frame = tk.Frame(
+        thresholds_frame,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    auto_frame.pack(pady = PADY_LABELS)
+
+    for method in THRESHOLD_METHODS:
+        auto_button = tk.Button(
+            auto_frame,
+            text = f"Auto ({method})",
+            bg = WINDOW_BACKGROUND_COLOR,
+            command = lambda method = method: set_auto_thresholds(method)
+        )
+        auto_button.pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.LEFT)
+
+    preview_label = tk.Label(
+        dialog,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    preview_label.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+
+    def get_thresholds():
+        return (threshold_sliders[0].get(), threshold_sliders[1].get())
+
+    def render_preview():
+        nonlocal pending_preview
+        pending_preview = None
+
+        preview_tk = image_cv2_to_tk(edges_from_gradients(proxy_gradients, *get_thresholds()))
+        preview_label.configure(image = preview_tk)
+        preview_label.image = preview_tk
+
+    def schedule_preview(*_):
+        nonlocal pending_preview
+        if pending_preview is not None:
+            dialog.after_cancel(pending_preview)
+        pending_preview = dialog.after(LIVE_PREVIEW_DELAY_MS, render_preview)
+
+    for slider in threshold_sliders:
+        slider.configure(command = schedule_preview)
+    set_auto_thresholds(THRESHOLD_METHODS[0])
+
+    def find_image_edges(threshold1, threshold2):
+        nonlocal gradients
+        if gradients is None:
+            gradients = compute_gradients(image.result())
+        return edges_from_gradients(gradients, threshold1, threshold2)
+
+    def show_edges(edges):
+        nonlocal result_window
+        result_window = display_image(edges, "Edges of the image", result_window)
+
+    buttons_frame = tk.Frame(
+        dialog,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    buttons_frame.pack()
+
+    go_button = tk.Button(
+        buttons_frame,
+        text = "Detect!",
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = lambda: run_job("Detecting edges", find_image_edges, *get_thresholds(),
+            on_done = show_edges)
+    )
+    go_button.pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.RIGHT)
+
+    close_button = tk.Button(
+        buttons_frame,
+        text = "Close",
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = dialog.destroy
+    )
+    close_button.pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.LEFT)
 
 def exit_app():
     """Manages exit confirmation dialog"""
@@ -186,23 +312,11 @@ def exit_app():
     if messagebox.askyesno(
         message = "Are you sure you want to exit the app?",
         default = messagebox.NO):
+        # the images being saved are written before leaving
+        save_queue.close()
         root.destroy()
 
-def get_image_size(image):
-    """Gets the size of an image
-
-    Args:
-        image (numpy.ndarray): OpenCV-compatible image
-
-    Returns:
-        tuple (int, int, int): (height, width, channels) of the image
-    """
-
-    height = image.shape[0]
-    width = image.shape[1]
-    channels = image.shape[2]
-    return (height, width, channels)
-
+@instrumented("tk_convert")
 def image_cv2_to_tk(image_cv2):
     """Transforms a OpenCV-compatible image to a Tkinter-compatible image
 
@@ -213,50 +327,24 @@ def image_cv2_to_tk(image_cv2):
         PIL.ImageTk.PhotoImage: Tkinter-compatible image
     """
 
-    image_rgb = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2RGB)
-
-    return ImageTk.PhotoImage(Image.fromarray(image_rgb))
-
-def is_grayscale(image):
-    """Detects if an image is grayscale or not
-
-    Args:
-        image (numpy.ndarray): OpenCV-compatible image
-
-    Returns:
-        bool: True if the image is grayscale, False otherwise
-    """
-
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    for i in range(get_image_size(rgb_image)[0]):
-        for j in range(get_image_size(rgb_image)[1]):
-            (r_value, g_value, b_value) = rgb_image[i, j]
-            if not r_value == g_value == b_value:
-                return False
-
-    return True
+    return ImageTk.PhotoImage(image_cv2_to_pil(image_cv2))
 
 def match_template():
     """Script that finds if an image is contained within another image"""
 
     image = open_image_dialog("img", "Select the image")
-    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     display_image(image, "Original image")
 
     template = open_image_dialog("img", "Select the template")
-    template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
     display_image(template, "Template image")
 
-    res = cv2.matchTemplate(image_gray, template_gray, cv2.TM_SQDIFF)
-    _, _, min_loc, _ = cv2.minMaxLoc(res)
-
-    x_1, y_1 = min_loc
-    x_2, y_2 = min_loc[0] + template.shape[1], min_loc[1] + template.shape[0]
-
-    cv2.rectangle(image, (x_1, y_1), (x_2, y_2), (0, 255, 0), 3)
+    def show_detection(corners):
+        detection = image.copy()
+        cv2.rectangle(detection, corners[0], corners[1], (0, 255, 0), 3)
+        display_image(detection, "Detection")
 
-    display_image(image, "Detection")
+    run_job("Matching template", find_template, image, template,
+        on_done = show_detection)
 
 def open_image_dialog(initial_dir, dialog_title):
     """Asks the user to select an image and reads it
@@ -266,7 +354,8 @@ def open_image_dialog(initial_dir, dialog_title):
         dialog_title (str): title of the dialog
 
     Returns:
-        numpy.ndarray: OpenCV-compatible image
+        numpy.ndarray: read-only OpenCV-compatible image, shared with the
+            other reads of the same file
     """
 
     filename = filedialog.askopenfilename(
@@ -274,7 +363,119 @@ def open_image_dialog(initial_dir, dialog_title):
         title = dialog_title,
         filetypes = FILES_ALLOWED)
 
-    return cv2.imread(filename)
+    return read_image(filename)
+
+def open_image_preview(initial_dir, dialog_title, label):
+    """Asks the user to select an image, shows it decoded at screen size and
+    decodes it at full resolution in the background
+
+    The window of the image shows the reduced decode of load_preview at
+    once, and gets the full-resolution image, to be saved or processed, when
+    its decoding ends (see show_full_image).
+
+    Args:
+        initial_dir (str): path of the initial directory
+        dialog_title (str): title of the dialog
+        label (str): Text label shown above the image
+
+    Returns:
+        tuple (numpy.ndarray, concurrent.futures.Future): screen-sized
+            preview, None if no image is read, and future of the read-only
+            full-resolution image
+    """
+
+    filename = filedialog.askopenfilename(
+        initialdir = initial_dir,
+        title = dialog_title,
+        filetypes = FILES_ALLOWED)
+    if not filename:
+        return (None, None)
+
+    image = job_executor.submit(read_image, filename)
+    preview = load_preview(filename, *screen_preview_size(root))
+    if preview is None:
+        messagebox.showerror(
+            title = "Error",
+            message = f"{filename} cannot be read as an image"
+        )
+        return (None, None)
+
+    window = display_image(preview, label)
+    # nothing to save until the full-resolution image is there
+    window.protocol("WM_DELETE_WINDOW", window.destroy)
+    show_full_image(window, image, label, preview)
+
+    return (preview, image)
+
+def process_region(window, operation):
+    """Runs a tool on the region of interest of an image window
+
+    The tools work on a view of the region, the whole image when no region
+    is selected, and show the locations they find in the whole image.
+
+    Args:
+        window (tkinter.Toplevel): window created by display_image
+        operation (str): "edges", "gray", "match", "compare" or "show"
+    """
+
+    image = window.image
+    roi = window.roi
+
+    if operation == "edges":
+        run_job("Detecting edges", detect_edges, image, "median", roi,
+            on_done = lambda edges: display_image(edges, "Edges of the region"))
+    elif operation == "gray":
+        region = crop(image, roi)
+        if is_grayscale(region):
+            messagebox.showwarning(
+                title = "Warning",
+                message = "The region is grayscale already"
+                )
+            return
+        display_image(to_gray(region), "Gray region")
+    elif operation == "match":
+        template = open_image_dialog("img", "Select the template")
+        if template is None:
+            return
+
+        def show_detection(corners):
+            # the rectangles are drawn in color, on a BGR copy of the image
+            if image.ndim == 2 or image.shape[2] == 1:
+                detection = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            elif image.shape[2] == 4:
+                detection = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+            else:
+                detection = image.copy()
+            if roi is not None:
+                x, y, width, height = roi
+                cv2.rectangle(detection, (x, y), (x + width, y + height), ROI_COLOR, 1)
+            cv2.rectangle(detection, corners[0], corners[1], (0, 255, 0), 3)
+            display_image(detection, "Detection")
+
+        run_job("Matching template", find_template, image, template, None, roi,
+            on_done = show_detection)
+    elif operation == "compare":
+        other = open_image_dialog("img", "Select the image to compare with")
+        if other is None:
+            return
+        if not compare_size_of_images(image, other):
+            messagebox.showwarning(
+                title = "Warning",
+                message = "Both images must be the same size"
+                )
+            return
+
+        difference = diff_images(image, other, 0, roi)
+        if difference.changed_pixels == 0:
+            messagebox.showinfo(
+                title = "Result",
+                message = "Both regions are the same!"
+                )
+            return
+        display_image(difference.mask, "Difference of the region")
+        show_difference(difference)
+    elif operation == "show":
+        display_image(crop(image, roi), "Region")
 
 def resize_image():
     """Script that resizes an image"""
@@ -377,8 +578,11 @@ def resize_image():
     )
     frames[5].grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 1, column = 2)
 
+    new_width_text = tk.StringVar()
+
     new_width = tk.Entry(
         frames[5],
+        textvariable = new_width_text,
         validate = 'key',
         validatecommand = (frames[5].register(digit_validation), '%S')
     )
@@ -424,13 +628,102 @@ def resize_image():
     )
     frames[8].grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 2, column = 2)
 
+    new_height_text = tk.StringVar()
+
     new_height = tk.Entry(
         frames[8],
+        textvariable = new_height_text,
         validate = 'key',
         validatecommand = (frames[8].register(digit_validation), '%S')
     )
     new_height.pack()
 
+    def set_scale(percentage):
+        new_width_text.set(max(1, get_image_size(original_image)[1] * int(percentage) // 100))
+        new_height_text.set(max(1, get_image_size(original_image)[0] * int(percentage) // 100))
+
+    scale_slider = tk.Scale(
+        blocks[0],
+        from_ = 1,
+        to = 400,
+        orient = tk.HORIZONTAL,
+        length = 300,
+        label = "Scale (%)",
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = set_scale
+    )
+    scale_slider.set(100)
+    scale_slider.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 3, column = 0,
+        columnspan = 3)
+
+    label_mode = tk.Label(
+        blocks[0],
+        text = "Mode",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    label_mode.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 4, column = 0)
+
+    # stretch to the new size, fit within it or fill it cropping the center
+    mode_text = tk.StringVar(value = RESIZE_MODES[0])
+
+    mode_menu = tk.OptionMenu(
+        blocks[0],
+        mode_text,
+        *RESIZE_MODES
+    )
+    mode_menu.configure(bg = WINDOW_BACKGROUND_COLOR)
+    mode_menu.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 4, column = 1,
+        columnspan = 2)
+
+    # the preview resizes a screen-sized copy of the image, and is rendered
+    # once the user stops typing or dragging
+    proxy_image = make_preview(original_image, LIVE_PREVIEW_SIZE, LIVE_PREVIEW_SIZE)
+    proxy_scale = get_image_size(proxy_image)[1] / get_image_size(original_image)[1]
+    pending_preview = None
+    result_window = None
+
+    preview_label = tk.Label(
+        dialog,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    preview_label.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+
+    def get_size():
+        if (len(new_width.get()) == 0) or (len(new_height.get()) == 0):
+            return None
+
+        size = (int(new_width.get()), int(new_height.get()))
+        if min(size) == 0:
+            return None
+
+        return size
+
+    def render_preview():
+        nonlocal pending_preview
+        pending_preview = None
+
+        size = get_size()
+        if size is None:
+            return
+
+        proxy_size = (max(1, round(size[0] * proxy_scale)), max(1, round(size[1] * proxy_scale)))
+        preview = make_preview(resize(proxy_image, *proxy_size, mode_text.get()),
+            LIVE_PREVIEW_SIZE, LIVE_PREVIEW_SIZE)
+        preview_tk = image_cv2_to_tk(preview)
+        preview_label.configure(image = preview_tk)
+        preview_label.image = preview_tk
+
+    def schedule_preview(*_):
+        nonlocal pending_preview
+        if pending_preview is not None:
+            dialog.after_cancel(pending_preview)
+        pending_preview = dialog.after(LIVE_PREVIEW_DELAY_MS, render_preview)
+
+    new_width_text.trace_add("write", schedule_preview)
+    new_height_text.trace_add("write", schedule_preview)
+    mode_text.trace_add("write", schedule_preview)
+
     blocks.append(
         tk.Frame(
             dialog,
@@ -439,16 +732,21 @@ def resize_image():
     )
     blocks[1].pack()
 
-    def resize():
-        if (len(new_width.get()) == 0) or (len(new_height.get()) == 0):
+    def show_resized(resized_image):
+        nonlocal result_window
+        result_window = display_image(resized_image, "Resized image", result_window)
+
+    def start_resize():
+        size = get_size()
+        if size is None:
             messagebox.showwarning(
                 title = "Warning",
                 message = "Please fill in all required fields"
             )
             return False
 
-        resized_image = cv2.resize(original_image, (int(new_width.get()), int(new_height.get())))
-        display_image(resized_image, "Resized image")
+        run_job("Resizing image", resize, original_image, *size, mode_text.get(),
+            on_done = show_resized)
         return True
 
     buttons = []
@@ -458,7 +756,7 @@ def resize_image():
             blocks[1],
             text = "Resize!",
             bg = WINDOW_BACKGROUND_COLOR,
-            command = resize
+            command = start_resize
         )
     )
     buttons[0].pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.RIGHT)
@@ -473,49 +771,12 @@ def resize_image():
     )
     buttons[1].pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.LEFT)
 
-def rotate_without_cropping(image, angle):
-    """Rotates an image without cropping
-
-    Source:
-        https://stackoverflow.com/questions/43892506/opencv-python-rotate-image-without-cropping-sides
-
-    Args:
-        image (numpy.ndarray): OpenCV-compatible image
-        angle (int): rotation angle in degrees
-
-    Returns:
-        numpy.ndarray: rotated OpenCV-compatible image
-    """
-
-    # image shape has 3 dimensions
-    height, width = image.shape[:2]
-    # getRotationMatrix2D needs coordinates in reverse order (width, height) compared to shape
-    image_center = (width/2, height/2)
-
-    rotation_mat = cv2.getRotationMatrix2D(image_center, angle, 1.)
-
-    # rotation calculates the cos and sin, taking absolutes of those.
-    abs_cos = abs(rotation_mat[0,0])
-    abs_sin = abs(rotation_mat[0,1])
-
-    # find the new width and height bounds
-    bound_w = int(height * abs_sin + width * abs_cos)
-    bound_h = int(height * abs_cos + width * abs_sin)
-
-    # subtract old image center (bringing image back to origo)
-    # and adding the new image center coordinates
-    rotation_mat[0, 2] += bound_w/2 - image_center[0]
-    rotation_mat[1, 2] += bound_h/2 - image_center[1]
-
-    # rotate image with the new bounds and translated rotation matrix
-    rotated_mat = cv2.warpAffine(image, rotation_mat, (bound_w, bound_h))
-    return rotated_mat
-
 def rotate_image():
     """Script that rotates an image"""
 
-    original_image = open_image_dialog("img", "Select image")
-    display_image(original_image, "Original image")
+    preview, original_image = open_image_preview("img", "Select image", "Original image")
+    if preview is None:
+        return
 
     dialog = tk.Toplevel(bg = WINDOW_BACKGROUND_COLOR)
     dialog.title(f"Image rotation - {PROGRAM_NAME} v{VERSION_NUMBER}")
@@ -541,7 +802,7 @@ def rotate_image():
     )
     direction_checkboxes_frame.pack(pady = PADY_LABELS)
 
-    rot_direction = IntVar()
+    rot_direction = tk.IntVar()
     rot_direction.set(0)
 
     clockwise_checkbox = tk.Radiobutton(
@@ -576,34 +837,90 @@ def rotate_image():
         )
     angle_text_label.pack(pady = PADY_LABELS)
 
+    angle_text = tk.StringVar()
+
     angle_entrybox = tk.Entry(
         angle_frame,
+        textvariable = angle_text,
         validate = 'key',
         validatecommand = (angle_frame.register(digit_validation), '%S')
     )
-    angle_entrybox.pack(pady = PADY_BUTTONS)
+    angle_entrybox.pack(pady = PADY_LABELS)
 
-    def rotate():
+    angle_slider = tk.Scale(
+        angle_frame,
+        from_ = 0,
+        to = 360,
+        orient = tk.HORIZONTAL,
+        length = 300,
+        showvalue = False,
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = angle_text.set
+    )
+    angle_slider.pack(pady = PADY_LABELS)
+
+    # the preview rotates a screen-sized copy of the image, and is rendered
+    # once the user stops typing or dragging
+    proxy_image = make_preview(preview, LIVE_PREVIEW_SIZE, LIVE_PREVIEW_SIZE)
+    pending_preview = None
+    result_window = None
+
+    preview_label = tk.Label(
+        dialog,
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    preview_label.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+
+    def get_angle():
         if len(angle_entrybox.get()) == 0:
-            messagebox.showwarning(
-                title = "Warning",
-                message = "Please fill in all required fields"
-            )
-            return False
+            return None
 
         if rot_direction.get() == 1:
-            angle = -int(angle_entrybox.get())
-        elif rot_direction.get() == 2:
-            angle = int(angle_entrybox.get())
-        else:
+            return -int(angle_entrybox.get())
+        if rot_direction.get() == 2:
+            return int(angle_entrybox.get())
+
+        return None
+
+    def render_preview():
+        nonlocal pending_preview
+        pending_preview = None
+
+        angle = get_angle()
+        if angle is None:
+            return
+
+        preview = make_preview(rotate_without_cropping(proxy_image, angle),
+            LIVE_PREVIEW_SIZE, LIVE_PREVIEW_SIZE)
+        preview_tk = image_cv2_to_tk(preview)
+        preview_label.configure(image = preview_tk)
+        preview_label.image = preview_tk
+
+    def schedule_preview(*_):
+        nonlocal pending_preview
+        if pending_preview is not None:
+            dialog.after_cancel(pending_preview)
+        pending_preview = dialog.after(LIVE_PREVIEW_DELAY_MS, render_preview)
+
+    angle_text.trace_add("write", schedule_preview)
+    rot_direction.trace_add("write", schedule_preview)
+
+    def show_rotated(rot_image):
+        nonlocal result_window
+        result_window = display_image(rot_image, "Rotated image", result_window)
+
+    def rotate():
+        angle = get_angle()
+        if angle is None:
             messagebox.showwarning(
                 title = "Warning",
                 message = "Please fill in all required fields"
             )
             return False
 
-        rot_image = rotate_without_cropping(original_image, angle)
-        display_image(rot_image, "Rotated image")
+        run_job("Rotating image",
+            lambda angle: rotate_without_cropping(original_image.result(), angle), angle,
+            on_done = show_rotated)
         return True
 
     buttons_frame = tk.Frame(
@@ -628,9 +945,125 @@ def rotate_image():
     )
     close_button.pack(pady = PADY_BUTTONS, padx = PADX_BUTTONS, side = tk.LEFT)
 
+def run_pipeline():
+    """Script that applies a pipeline saved as JSON to an image
+
+    Returns:
+        bool: True if the pipeline is run, False otherwise
+    """
+
+    # imported here because the pipeline module builds on this one
+    from pipeline import Pipeline # pylint: disable=import-outside-toplevel
+
+    filename = filedialog.askopenfilename(
+        initialdir = ".",
+        title = "Select pipeline",
+        filetypes = PIPELINE_FILES_ALLOWED)
+    if not filename:
+        return False
+
+    pipeline = Pipeline.load(filename)
+
+    image = open_image_dialog("img", "Select image")
+    display_image(image, "Original image")
+
+    run_job("Running pipeline", pipeline.run, image,
+        on_done = lambda result: display_image(result, "Pipeline result"))
+    return True
+
+def run_job(title, function, *args, on_done = None):
+    """Runs a function in a worker thread while showing its progress
+
+    OpenCV releases the GIL while it works, so the Tk main loop keeps
+    handling events, and several jobs can run at once. The result is handed
+    back to the main thread by polling the job with after().
+
+    Cancelling a job that has not started yet removes it from the queue; a
+    job that is already running cannot be interrupted, its result is
+    discarded instead.
+
+    Args:
+        title (str): description of the job shown in the progress window
+        function (callable): function to run
+        *args: arguments passed to the function
+        on_done (callable): called in the Tk main thread with the result of
+            the function
+
+    Returns:
+        concurrent.futures.Future: future of the result
+    """
+
+    future = job_executor.submit(function, *args)
+    start = time.perf_counter()
+
+    window = tk.Toplevel(bg = WINDOW_BACKGROUND_COLOR)
+    window.title(f"{title} - {PROGRAM_NAME} v{VERSION_NUMBER}")
+    window.resizable(False, False)
+
+    text_label = tk.Label(
+        window,
+        text = f"{title}...",
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    text_label.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+
+    progress_bar = ttk.Progressbar(
+        window,
+        mode = "indeterminate",
+        length = 200
+    )
+    progress_bar.pack(pady = PADY_LABELS, padx = PADX_LABELS)
+    progress_bar.start()
+
+    elapsed_label = tk.Label(
+        window,
+        text = "0.0 s",
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    elapsed_label.pack(pady = PADY_LABELS)
+
+    def cancel():
+        future.cancel()
+        window.destroy()
+
+    cancel_button = tk.Button(
+        window,
+        text = "Cancel",
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = cancel
+    )
+    cancel_button.pack(pady = PADY_LABELS)
+    window.protocol("WM_DELETE_WINDOW", cancel)
+
+    def poll():
+        if not window.winfo_exists():
+            return
+
+        if not future.done():
+            elapsed_label.configure(text = f"{time.perf_counter() - start:.1f} s")
+            window.after(JOB_POLL_INTERVAL_MS, poll)
+            return
+
+        window.destroy()
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror(
+                title = "Error",
+                message = f"{title} failed: {error}"
+            )
+        elif on_done is not None:
+            on_done(future.result())
+
+    window.after(JOB_POLL_INTERVAL_MS, poll)
+    return future
+
 def save_image(window, image, initial_dir, dialog_title):
     """Shows a dialog to save an image
 
+    The image is written in the background by the save queue, with the
+    encoder settings of its format (see encoding), and the window closes
+    without waiting for it.
+
     Args:
         window (tkinter.Toplevel): tkinter window containing the image
         image (numpy.ndarray): OpenCV-compatible image
@@ -648,7 +1081,9 @@ def save_image(window, image, initial_dir, dialog_title):
             title = dialog_title,
             filetypes = FILES_ALLOWED
         )
-        cv2.imwrite(filename, image)
+        if not filename:
+            return
+        watch_save(save_queue.submit(image, filename), filename)
         window.destroy()
     elif user_choice is None:
         window.protocol(
@@ -658,181 +1093,402 @@ def save_image(window, image, initial_dir, dialog_title):
     else:
         window.destroy()
 
-# MAIN
+def screen_preview_size(widget):
+    """Gets the largest size of the image previews
 
-root = tk.Tk()
-root.title(f"{PROGRAM_NAME} v{VERSION_NUMBER}")
-root.resizable(False, False)
-root.configure(bg = WINDOW_BACKGROUND_COLOR)
+    Args:
+        widget (tkinter.Misc): any widget of the screen
 
-## Welcome text
+    Returns:
+        tuple (int, int): maximum width and height of a preview
+    """
 
-intro_text = tk.Label(
-    root,
-    text = WELCOME_TEXT,
-    font = (FONT, 20),
-    bg = WINDOW_BACKGROUND_COLOR
-)
-intro_text.pack(pady = PADY_FRAMES, padx = PADX_LABELS)
+    return (int(widget.winfo_screenwidth() * PREVIEW_SCREEN_FRACTION),
+        int(widget.winfo_screenheight() * PREVIEW_SCREEN_FRACTION) - 2 * PADY_FRAMES)
 
-## Menu bar
+def select_region(window):
+    """Lets the user select a region of interest of an image window
 
-menu_bar = tk.Menu()
+    The region is dragged over the image with the left button, a click
+    clears it, and the menu of the right button runs the tools on it.
 
-file_menu = tk.Menu(
-    menu_bar,
-    tearoff = False
-)
+    Args:
+        window (tkinter.Toplevel): window created by display_image
+    """
 
-root.configure(menu = menu_bar)
+    start = None
 
-### File
+    def to_image(event):
+        # the preview is downscaled by window.scale
+        x = min(max(0, event.x), window.preview.shape[1])
+        y = min(max(0, event.y), window.preview.shape[0])
+        return (round(x / window.scale), round(y / window.scale))
 
-file_menu.add_command(
-    label = "Exit",
-    command = exit_app
-    )
+    def press(event):
+        nonlocal start
+        start = to_image(event)
 
-menu_bar.add_cascade(
-    menu = file_menu,
-    label = "File"
-)
+    def drag(event):
+        x, y = to_image(event)
+        roi = (min(start[0], x), min(start[1], y), abs(x - start[0]), abs(y - start[1]))
+        window.roi = clip_roi(roi, window.image.shape) if roi[2] and roi[3] else None
+        show_preview(window)
 
-### Tools
+    def clear():
+        window.roi = None
+        show_preview(window)
 
-tools_menu = tk.Menu(
-    menu_bar,
-    tearoff = False
-)
-tools_menu.add_command(
-    label = "Color to grayscale",
-    command = color_to_gray
-    )
-tools_menu.add_command(
-    label = "Rotate",
-    command = rotate_image
-    )
-tools_menu.add_command(
-    label = "Resize",
-    command = resize_image
-    )
-tools_menu.add_command(
-    label = "Compare two images",
-    command = compare_two_images
-    )
-tools_menu.add_command(
-    label = "Detect edges",
-    command = edge_detection
-    )
-tools_menu.add_command(
-    label = "Match with template",
-    command = match_template
+    region_menu = tk.Menu(
+        window,
+        tearoff = False
     )
+    region_menu.add_command(
+        label = "Detect edges in the region",
+        command = lambda: process_region(window, "edges")
+        )
+    region_menu.add_command(
+        label = "Region to grayscale",
+        command = lambda: process_region(window, "gray")
+        )
+    region_menu.add_command(
+        label = "Match template in the region",
+        command = lambda: process_region(window, "match")
+        )
+    region_menu.add_command(
+        label = "Compare the region with an image",
+        command = lambda: process_region(window, "compare")
+        )
+    region_menu.add_command(
+        label = "Show the region",
+        command = lambda: process_region(window, "show")
+        )
+    region_menu.add_separator()
+    region_menu.add_command(
+        label = "Clear the region",
+        command = clear
+        )
+
+    window.image_label.bind("<ButtonPress-1>", press)
+    window.image_label.bind("<B1-Motion>", drag)
+    window.image_label.bind("<ButtonRelease-1>", drag)
+    window.image_label.bind("<Button-3>",
+        lambda event: region_menu.tk_popup(event.x_root, event.y_root))
+
+def show_difference(difference):
+    """Shows the result of a comparison in a message box
+
+    Args:
+        difference (compare.ImageDifference): result of diff_images
+    """
+
+    height, width = difference.mask.shape
+    percentage_different_pixels = 100 * difference.changed_pixels / (height * width)
+
+    messagebox.showinfo(
+        title = "Result",
+        message = f"""There are differences between the two images!
+        Difference: {percentage_different_pixels:.2f}%
+        Largest change: {max(difference.max_delta)}
+        Changed region (x, y, width, height): {difference.bounding_box}"""
+        )
+
+def show_full_image(window, future, label, preview):
+    """Gives an image window its full-resolution image once it is decoded
+
+    Args:
+        window (tkinter.Toplevel): window created by display_image, showing
+            preview
+        future (concurrent.futures.Future): future of the full-resolution
+            image
+        label (str): Text label shown above the image
+        preview (numpy.ndarray): screen-sized preview of the image
+    """
+
+    if not window.winfo_exists():
+        return
+    if not future.done():
+        window.after(JOB_POLL_INTERVAL_MS,
+            lambda: show_full_image(window, future, label, preview))
+        return
+
+    if future.exception() is None and future.result() is not None:
+        update_image_window(window, future.result(), label, preview)
+
+def show_preview(window):
+    """Shows the preview of an image window, with its region of interest
+
+    Args:
+        window (tkinter.Toplevel): window created by display_image
+    """
+
+    preview = window.preview
+    if window.roi is not None:
+        x, y, width, height = (round(value * window.scale) for value in window.roi)
+        preview = preview.copy()
+        cv2.rectangle(preview, (x, y), (x + width, y + height), ROI_COLOR, 1)
+
+    image_tk = image_cv2_to_tk(preview)
+    window.image_label.configure(image = image_tk)
+    window.image_label.image = image_tk
+
+def update_image_window(window, image, label, preview = None):
+    """Shows an image in a window created by display_image
 
-menu_bar.add_cascade(
-    menu = tools_menu,
-    label = "Tools"
-)
+    Args:
+        window (tkinter.Toplevel): window created by display_image
+        image (numpy.ndarray): OpenCV-compatible image
+        label (str): Text label shown above the image
+        preview (numpy.ndarray): screen-sized preview of image, None to
+            downscale image
+
+    Returns:
+        tkinter.Toplevel: window
+    """
 
-## Buttons frame
+    if preview is None:
+        preview = make_preview(image, *screen_preview_size(window))
+    if preview.shape[1] < image.shape[1]:
+        label = f"{label} ({100 * preview.shape[1] / image.shape[1]:.0f}%)"
 
-main_buttons_frame = tk.Frame(
-    root,
-    bg = WINDOW_BACKGROUND_COLOR
-)
-main_buttons_frame.pack(pady = PADY_FRAMES)
+    window.text_label.configure(text = label)
 
-### Color2gray button
+    # kept to map the regions of interest selected on the preview
+    window.image = image
+    window.preview = preview
+    window.scale = preview.shape[1] / image.shape[1]
+    window.roi = None
+    show_preview(window)
 
-color2gray_button = tk.Button(
-    main_buttons_frame,
-    text = "Color to grayscale",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = color_to_gray
+    window.protocol("WM_DELETE_WINDOW", lambda: save_image(
+        window,
+        image,
+        "img",
+        "Select path to save image:")
     )
-color2gray_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 0, column = 0)
 
-### Rotate button
+    return window
+
+def watch_save(future, filename):
+    """Reports the failure of an image saved in the background
 
-rotateimage_button = tk.Button(
-    main_buttons_frame,
-    text = "Rotate",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = rotate_image
+    Args:
+        future (concurrent.futures.Future): job of the save queue
+        filename (str): path of the image
+    """
+
+    if not future.done():
+        root.after(JOB_POLL_INTERVAL_MS, lambda: watch_save(future, filename))
+        return
+
+    error = future.exception()
+    if error is not None:
+        messagebox.showerror(
+            title = "Error",
+            message = f"{filename} could not be saved: {error}"
+        )
+
+# MAIN
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+
+    import batch
+    sys.exit(batch.main(sys.argv[1:]))
+
+elif __name__ == "__main__":
+
+    job_executor = futures.ThreadPoolExecutor(max_workers = os.cpu_count(),
+        thread_name_prefix = "job")
+    save_queue = SaveQueue()
+
+    root = tk.Tk()
+    root.title(f"{PROGRAM_NAME} v{VERSION_NUMBER}")
+    root.resizable(False, False)
+    root.configure(bg = WINDOW_BACKGROUND_COLOR)
+
+    ## Welcome text
+
+    intro_text = tk.Label(
+        root,
+        text = WELCOME_TEXT,
+        font = (FONT, 20),
+        bg = WINDOW_BACKGROUND_COLOR
     )
-rotateimage_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 1, column = 0)
+    intro_text.pack(pady = PADY_FRAMES, padx = PADX_LABELS)
 
-### Resize button
+    ## Menu bar
 
-resizeimage_button = tk.Button(
-    main_buttons_frame,
-    text = "Resize",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = resize_image
+    menu_bar = tk.Menu()
+
+    file_menu = tk.Menu(
+        menu_bar,
+        tearoff = False
     )
-resizeimage_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 2, column = 0)
 
-### Compareimages button
+    root.configure(menu = menu_bar)
+
+    ### File
 
-compareimages_button = tk.Button(
-    main_buttons_frame,
-    text = "Compare two images",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = compare_two_images
+    file_menu.add_command(
+        label = "Exit",
+        command = exit_app
+        )
+
+    menu_bar.add_cascade(
+        menu = file_menu,
+        label = "File"
     )
-compareimages_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 0, column = 1)
 
-### Edges button
+    ### Tools
+
+    tools_menu = tk.Menu(
+        menu_bar,
+        tearoff = False
+    )
+    tools_menu.add_command(
+        label = "Color to grayscale",
+        command = color_to_gray
+        )
+    tools_menu.add_command(
+        label = "Rotate",
+        command = rotate_image
+        )
+    tools_menu.add_command(
+        label = "Resize",
+        command = resize_image
+        )
+    tools_menu.add_command(
+        label = "Compare two images",
+        command = compare_two_images
+        )
+    tools_menu.add_command(
+        label = "Detect edges",
+        command = edge_detection
+        )
+    tools_menu.add_command(
+        label = "Match with template",
+        command = match_template
+        )
+    tools_menu.add_command(
+        label = "Run pipeline",
+        command = run_pipeline
+        )
 
-edges_button = tk.Button(
-    main_buttons_frame,
-    text = "Detect edges",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = edge_detection
+    menu_bar.add_cascade(
+        menu = tools_menu,
+        label = "Tools"
     )
-edges_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 1, column = 1)
 
-### Match template button
+    ## Buttons frame
 
-matchtemplate_button = tk.Button(
-    main_buttons_frame,
-    text = "Match with template",
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR,
-    command = match_template
+    main_buttons_frame = tk.Frame(
+        root,
+        bg = WINDOW_BACKGROUND_COLOR
     )
-matchtemplate_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 2, column = 1)
+    main_buttons_frame.pack(pady = PADY_FRAMES)
+
+    ### Color2gray button
+
+    color2gray_button = tk.Button(
+        main_buttons_frame,
+        text = "Color to grayscale",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = color_to_gray
+        )
+    color2gray_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 0, column = 0)
+
+    ### Rotate button
 
-## Exit frame
+    rotateimage_button = tk.Button(
+        main_buttons_frame,
+        text = "Rotate",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = rotate_image
+        )
+    rotateimage_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 1, column = 0)
+
+    ### Resize button
+
+    resizeimage_button = tk.Button(
+        main_buttons_frame,
+        text = "Resize",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = resize_image
+        )
+    resizeimage_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 2, column = 0)
+
+    ### Compareimages button
 
-exit_frame = tk.Frame(
-    root,
-    bg = WINDOW_BACKGROUND_COLOR
-)
-exit_frame.pack(pady = PADY_FRAMES)
+    compareimages_button = tk.Button(
+        main_buttons_frame,
+        text = "Compare two images",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = compare_two_images
+        )
+    compareimages_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 0, column = 1)
 
-exit_label = tk.Label(
-    exit_frame,
-    text = EXIT_APP_LABEL,
-    font = (FONT, 15),
-    bg = WINDOW_BACKGROUND_COLOR
-)
-exit_label.pack(pady = PADY_LABELS)
+    ### Edges button
 
-exit_button = tk.Button(
-    exit_frame,
-    text = "Exit",
-    font = (FONT, 15),
-    command = exit_app
+    edges_button = tk.Button(
+        main_buttons_frame,
+        text = "Detect edges",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = edge_detection
+        )
+    edges_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 1, column = 1)
+
+    ### Match template button
+
+    matchtemplate_button = tk.Button(
+        main_buttons_frame,
+        text = "Match with template",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = match_template
+        )
+    matchtemplate_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 2, column = 1)
+
+    ### Pipeline button
+
+    pipeline_button = tk.Button(
+        main_buttons_frame,
+        text = "Run pipeline",
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR,
+        command = run_pipeline
+        )
+    pipeline_button.grid(pady = PADY_BUTTONS, padx = PADX_BUTTONS, row = 3, column = 0,
+        columnspan = 2)
+
+    ## Exit frame
+
+    exit_frame = tk.Frame(
+        root,
+        bg = WINDOW_BACKGROUND_COLOR
     )
-exit_button.pack(pady = PADY_LABELS)
+    exit_frame.pack(pady = PADY_FRAMES)
+
+    exit_label = tk.Label(
+        exit_frame,
+        text = EXIT_APP_LABEL,
+        font = (FONT, 15),
+        bg = WINDOW_BACKGROUND_COLOR
+    )
+    exit_label.pack(pady = PADY_LABELS)
+
+    exit_button = tk.Button(
+        exit_frame,
+        text = "Exit",
+        font = (FONT, 15),
+        command = exit_app
+        )
+    exit_button.pack(pady = PADY_LABELS)
 
-##
+    ##
 
-root.protocol("WM_DELETE_WINDOW", exit_app)
-root.mainloop()
+    root.protocol("WM_DELETE_WINDOW", exit_app)
+    root.mainloop()
@@ -0,0 +1,331 @@
+"""
+Program: Odin Digital
+Lazy pipelines of image operations
+
+A pipeline records operations and runs them only when it is applied to an
+image. Before running, adjacent operations are fused where the result does
+not change (or only by rounding): grayscale conversion is moved before
+resize and rotate so they work on a third of the data, repeated grayscale
+conversions are dropped and consecutive resizes and rotations are composed
+into a single transform, so the image is resampled once.
+Intermediate buffers are reused between runs of the same pipeline.
+
+Usage:
+    pipeline = Pipeline().resize(800, 600).gray().canny(100, 200)
+    edges = pipeline.run(image)
+    pipeline.save("edges.json")
+"""
+
+# IMPORTS
+
+import json
+
+from core import CANNY_THRESHOLD_1, CANNY_THRESHOLD_2, find_template, to_gray
+from geometry import (apply_transform, compose_transforms, crop_transform,
+    interpolation_flag, rotation_transform, scale_transform)
+from imagecache import read_image
+from instrument import instrumented
+from lazyimport import lazy_import
+from resizing import choose_interpolation, resize, target_size
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+OPERATIONS = ["gray", "rotate", "resize", "canny", "match"]
+# operations that work the same on a grayscale image, so that the grayscale
+# conversion can run before them
+GRAY_COMMUTING_OPERATIONS = ["rotate", "resize"]
+
+# CLASSES
+
+class Pipeline:
+    """Sequence of image operations, run on demand"""
+
+    def __init__(self, steps = None):
+        """Creates a pipeline
+
+        Args:
+            steps (list of dict): operations, with the name in "operation"
+                and its arguments in the other keys
+        """
+
+        self.steps = []
+        self.detections = []
+        self._buffers = {}
+
+        for step in steps or []:
+            if step["operation"] not in OPERATIONS:
+                raise ValueError(f"Unknown operation {step['operation']}")
+            self.steps.append(dict(step))
+
+    def canny(self, threshold1 = CANNY_THRESHOLD_1, threshold2 = CANNY_THRESHOLD_2):
+        """Adds a Canny edge detection
+
+        Args:
+            threshold1 (int): first threshold of the hysteresis
+            threshold2 (int): second threshold of the hysteresis
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        return self._add("canny", threshold1 = threshold1, threshold2 = threshold2)
+
+    def gray(self):
+        """Adds a conversion to grayscale
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        return self._add("gray")
+
+    def match(self, template_path):
+        """Adds a template matching, which draws the detection on the image
+
+        The corners of the detection are appended to the detections
+        attribute when the pipeline runs.
+
+        Args:
+            template_path (str): path of the template image
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        return self._add("match", template = template_path)
+
+    def resize(self, width = None, height = None, mode = "stretch", interpolation = "auto"):
+        """Adds a resize
+
+        Args:
+            width (int): new width, or None to keep the aspect ratio
+            height (int): new height, or None to keep the aspect ratio
+            mode (str): one of resizing.RESIZE_MODES
+            interpolation (str): one of geometry.INTERPOLATIONS, or "auto" to
+                choose it from the direction of the resize
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        return self._add("resize", width = width, height = height, mode = mode,
+            interpolation = interpolation)
+
+    def rotate(self, angle, interpolation = "linear"):
+        """Adds a rotation without cropping
+
+        Args:
+            angle (float): rotation angle in degrees, counterclockwise
+            interpolation (str): one of geometry.INTERPOLATIONS
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        return self._add("rotate", angle = angle, interpolation = interpolation)
+
+    def optimized_steps(self):
+        """Fuses the operations of the pipeline
+
+        Returns:
+            list of dict: operations that are run; consecutive resizes and
+                rotations are grouped in "transform" operations
+        """
+
+        steps = [dict(step) for step in self.steps]
+
+        # grayscale conversions bubble up before resize and rotate
+        moved = True
+        while moved:
+            moved = False
+            for i in range(1, len(steps)):
+                if (steps[i]["operation"] == "gray"
+                    and steps[i - 1]["operation"] in GRAY_COMMUTING_OPERATIONS):
+                    steps[i - 1], steps[i] = steps[i], steps[i - 1]
+                    moved = True
+
+        fused = []
+        for step in steps:
+            previous = fused[-1]["operation"] if fused else None
+            if step["operation"] == "gray" and previous in ("gray", "canny"):
+                continue
+            if step["operation"] in GRAY_COMMUTING_OPERATIONS:
+                if previous != "transform":
+                    fused.append({"operation": "transform", "steps": []})
+                fused[-1]["steps"].append(step)
+                continue
+            fused.append(step)
+
+        return fused
+
+    @instrumented("pipeline")
+    def run(self, image):
+        """Applies the pipeline to an image
+
+        Args:
+            image (numpy.ndarray): OpenCV-compatible image, it is not modified
+
+        Returns:
+            numpy.ndarray: resulting OpenCV-compatible image
+        """
+
+        self.detections = []
+        steps = self.optimized_steps()
+
+        for position, step in enumerate(steps):
+            # the last result belongs to the caller, it cannot be reused
+            last = position == len(steps) - 1
+            operation = step["operation"]
+
+            if operation == "gray":
+                if image.ndim == 3:
+                    image = to_gray(image,
+                        self._buffer(position, image.shape[:2], image.dtype, last))
+            elif operation == "transform":
+                image = self._transform(image, step["steps"])
+            elif operation == "canny":
+                image = cv2.Canny(image, step["threshold1"], step["threshold2"],
+                    edges = self._buffer(position, image.shape[:2], image.dtype, last))
+            else:
+                template = read_image(step["template"])
+                if template is None:
+                    raise ValueError(f"{step['template']} cannot be read as an image")
+                # the detection is drawn in color
+                if image.ndim == 2:
+                    image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+                else:
+                    image = image.copy()
+                top_left, bottom_right = find_template(image, template)
+                cv2.rectangle(image, top_left, bottom_right, (0, 255, 0), 3)
+                self.detections.append((top_left, bottom_right))
+
+        return image
+
+    def save(self, path):
+        """Saves the pipeline to a JSON file
+
+        Args:
+            path (str): path of the JSON file
+        """
+
+        with open(path, "w", encoding = "utf-8") as file:
+            file.write(self.to_json())
+
+    def to_json(self):
+        """Serializes the pipeline
+
+        Returns:
+            str: JSON document with the list of operations
+        """
+
+        return json.dumps({"steps": self.steps}, indent = 4)
+
+    @classmethod
+    def from_json(cls, text):
+        """Creates a pipeline from its JSON serialization
+
+        Args:
+            text (str): JSON document returned by to_json
+
+        Returns:
+            Pipeline: pipeline with the serialized operations
+        """
+
+        return cls(json.loads(text)["steps"])
+
+    @classmethod
+    def load(cls, path):
+        """Loads a pipeline from a JSON file
+
+        Args:
+            path (str): path of the JSON file
+
+        Returns:
+            Pipeline: pipeline with the saved operations
+        """
+
+        with open(path, encoding = "utf-8") as file:
+            return cls.from_json(file.read())
+
+    def _add(self, operation, **arguments):
+        """Records an operation
+
+        Args:
+            operation (str): one of OPERATIONS
+            **arguments: arguments of the operation
+
+        Returns:
+            Pipeline: this pipeline
+        """
+
+        self.steps.append(dict(operation = operation, **arguments))
+        return self
+
+    def _transform(self, image, steps):
+        """Applies consecutive resizes and rotations with a single resampling
+
+        Args:
+            image (numpy.ndarray): OpenCV-compatible image
+            steps (list of dict): resize and rotate operations
+
+        Returns:
+            numpy.ndarray: transformed image
+        """
+
+        interpolation = steps[-1].get("interpolation", "linear")
+        interpolation = interpolation_flag(interpolation)
+
+        # a single resize keeps the cv2.resize semantics, such as INTER_AREA
+        if len(steps) == 1 and steps[0]["operation"] == "resize":
+            return resize(image, steps[0]["width"], steps[0]["height"],
+                steps[0].get("mode", "stretch"), interpolation)
+
+        size = (image.shape[1], image.shape[0])
+        transforms = []
+
+        for step in steps:
+            if step["operation"] == "resize":
+                new_size, crop = target_size(size, step["width"], step["height"],
+                    step.get("mode", "stretch"))
+                if crop is not None:
+                    transforms.append(crop_transform(*crop))
+                    size = crop[2:]
+                transforms.append(scale_transform(size, new_size))
+            else:
+                transforms.append(rotation_transform(size, step["angle"]))
+            size = transforms[-1][1]
+
+        if interpolation is None:
+            interpolation = choose_interpolation((image.shape[1], image.shape[0]), size)
+            # warpAffine cannot average, apply_transform prefilters the downscales
+            if interpolation == cv2.INTER_AREA:
+                interpolation = cv2.INTER_LINEAR
+
+        return apply_transform(image, compose_transforms(*transforms), interpolation)
+
+    def _buffer(self, position, shape, dtype, last):
+        """Gets the reusable output buffer of an operation
+
+        Args:
+            position (int): position of the operation in the pipeline
+            shape (tuple): shape of the output
+            dtype (numpy.dtype): type of the output
+            last (bool): True for the last operation, whose output is never
+                reused
+
+        Returns:
+            numpy.ndarray: buffer, or None to let OpenCV allocate the output
+        """
+
+        if last:
+            return None
+
+        buffer = self._buffers.get(position)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype)
+            self._buffers[position] = buffer
+
+        return buffer
@@ -0,0 +1,340 @@
+"""
+Program: Odin Digital
+Memory-mapped cache of decoded images
+
+An image is decoded once and its pixels are written to a raw file of the
+cache directory, after a header with the shape, the type and the version
+(modification time and size) of the source file. Later reads map the raw
+file with numpy.memmap instead of decoding: nothing is read until it is
+used, and a crop, a template search or a diff only read the pages they
+touch. A raw file is ignored, and rebuilt, when its source changes.
+
+The cache is used by imagecache.read_image when a directory is set with
+imagecache.set_raw_cache or the ODIN_DIGITAL_RAW_CACHE environment variable.
+
+Usage:
+    python src/rawcache.py build img/ --cache-dir cache/
+    python src/rawcache.py prune --cache-dir cache/ --max-mb 2048
+    build_raw("img/baboon.png", "cache/")
+    image = open_raw("img/baboon.png", "cache/")
+"""
+
+# IMPORTS
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+
+from instrument import stage
+from lazyimport import lazy_import
+
+futures = lazy_import("concurrent.futures")
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+RAW_CACHE_ENVIRONMENT_VARIABLE = "ODIN_DIGITAL_RAW_CACHE"
+DEFAULT_RAW_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "odindigital", "raw")
+RAW_EXTENSION = ".odraw"
+RAW_MAGIC = b"ODRAW\0\0\0"
+RAW_FORMAT_VERSION = 1
+# magic, format version, source modification time (ns) and size, imread
+# flags, height, width, channels (0 for single-channel images), NumPy type
+# and length of the source path, which follows
+RAW_HEADER = struct.Struct("<8sIqqiIII8sH")
+# the pixels start at the next page, so that they are mapped aligned
+RAW_HEADER_SIZE = 4096
+
+# FUNCTIONS
+
+def build_raw(path, cache_dir, flags = None, image = None):
+    """Writes the raw file of an image
+
+    Args:
+        path (str): path of the source image
+        cache_dir (str): directory of the cache, created if needed
+        flags (int): cv2.imread flags, None for cv2.IMREAD_COLOR
+        image (numpy.ndarray): the image already decoded with flags, None to
+            decode it
+
+    Returns:
+        str: path of the raw file, or None if the source cannot be read as
+            an image
+
+    Raises:
+        OSError: if the raw file cannot be written
+    """
+
+    if flags is None:
+        flags = cv2.IMREAD_COLOR
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    if image is None:
+        with stage("decode", path = path):
+            image = cv2.imread(path, flags)
+        if image is None:
+            return None
+
+    source = os.path.abspath(path).encode("utf-8")
+    if RAW_HEADER.size + len(source) > RAW_HEADER_SIZE:
+        raise OSError(f"{path} is too long a path for the raw cache")
+
+    channels = image.shape[2] if image.ndim == 3 else 0
+    header = RAW_HEADER.pack(RAW_MAGIC, RAW_FORMAT_VERSION, stat.st_mtime_ns, stat.st_size,
+        flags, image.shape[0], image.shape[1], channels, image.dtype.str.encode("ascii"),
+        len(source)) + source
+
+    os.makedirs(cache_dir, exist_ok = True)
+    target = raw_path(path, cache_dir, flags)
+
+    # written to a temporary file and renamed, so that a reader never maps
+    # a partial file
+    descriptor, temporary = tempfile.mkstemp(suffix = ".tmp", dir = cache_dir)
+    try:
+        with stage("encode_raw", path = target), os.fdopen(descriptor, "wb") as file:
+            file.write(header.ljust(RAW_HEADER_SIZE, b"\0"))
+            file.write(memoryview(np.ascontiguousarray(image)).cast("B"))
+        os.replace(temporary, target)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+    return target
+
+def open_raw(path, cache_dir, flags = None):
+    """Maps the raw file of an image, if it is up to date
+
+    Args:
+        path (str): path of the source image
+        cache_dir (str): directory of the cache
+        flags (int): cv2.imread flags, None for cv2.IMREAD_COLOR
+
+    Returns:
+        numpy.ndarray: read-only image backed by the raw file, or None if
+            there is no raw file for the current version of the source
+    """
+
+    if flags is None:
+        flags = cv2.IMREAD_COLOR
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    target = raw_path(path, cache_dir, flags)
+    header = read_raw_header(target)
+
+    if (header is None or header["source"] != os.path.abspath(path)
+        or header["version"] != (stat.st_mtime_ns, stat.st_size)
+        or header["flags"] != flags):
+        return None
+
+    with stage("map_raw", path = target):
+        try:
+            image = np.memmap(target, header["dtype"], "r", RAW_HEADER_SIZE, header["shape"])
+        except (OSError, ValueError):
+            # truncated file
+            return None
+
+    # a plain array view of the mapping, which keeps it open
+    return np.asarray(image)
+
+def prune_raw(cache_dir, max_bytes = None):
+    """Removes the stale raw files of a cache, then the oldest ones beyond a
+    total size
+
+    A raw file is stale when its source was removed or changed, or when it
+    is not a valid raw file.
+
+    Args:
+        cache_dir (str): directory of the cache
+        max_bytes (int): maximum total size of the raw files, None for no
+            limit
+
+    Returns:
+        tuple (int, int): number of removed files and bytes freed
+    """
+
+    removed = freed = 0
+    kept = []
+
+    if not os.path.isdir(cache_dir):
+        return (removed, freed)
+
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or not entry.name.endswith(RAW_EXTENSION):
+            continue
+
+        stat = entry.stat()
+        header = read_raw_header(entry.path)
+        stale = header is None
+        if header is not None:
+            try:
+                source = os.stat(header["source"])
+                stale = (header["version"] != (source.st_mtime_ns, source.st_size)
+                    or stat.st_size != RAW_HEADER_SIZE + header["nbytes"])
+            except OSError:
+                stale = True
+
+        if stale:
+            removed, freed = _remove(entry.path, stat.st_size, removed, freed)
+        else:
+            kept.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    if max_bytes is not None:
+        total = sum(size for _, size, _ in kept)
+        for _, size, raw in sorted(kept):
+            if total <= max_bytes:
+                break
+            removed, freed = _remove(raw, size, removed, freed)
+            total -= size
+
+    return (removed, freed)
+
+def raw_path(path, cache_dir, flags):
+    """Gets the path of the raw file of an image
+
+    Args:
+        path (str): path of the source image
+        cache_dir (str): directory of the cache
+        flags (int): cv2.imread flags
+
+    Returns:
+        str: path of the raw file, named after the source and a hash of its
+            absolute path
+    """
+
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}.{flags}{RAW_EXTENSION}")
+
+def read_raw_header(raw):
+    """Reads the header of a raw file
+
+    Args:
+        raw (str): path of the raw file
+
+    Returns:
+        dict: "source" path, source "version" (modification time in ns,
+            size), imread "flags", "shape", "dtype" and "nbytes" of the
+            pixels, or None if the file is not a valid raw file
+    """
+
+    try:
+        with open(raw, "rb") as file:
+            data = file.read(RAW_HEADER_SIZE)
+    except OSError:
+        return None
+
+    if len(data) < RAW_HEADER_SIZE:
+        return None
+
+    (magic, format_version, mtime, size, flags, height, width, channels, dtype,
+        source_length) = RAW_HEADER.unpack_from(data)
+    if magic != RAW_MAGIC or format_version != RAW_FORMAT_VERSION:
+        return None
+
+    shape = (height, width, channels) if channels else (height, width)
+    dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+
+    return {
+        "source": data[RAW_HEADER.size:RAW_HEADER.size + source_length].decode("utf-8"),
+        "version": (mtime, size),
+        "flags": flags,
+        "shape": shape,
+        "dtype": dtype,
+        "nbytes": height * width * max(channels, 1) * dtype.itemsize
+    }
+
+def main(argv):
+    """Builds or prunes the raw cache from the command line
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        int: exit status, 0 if every image was cached
+    """
+
+    # imported here, batch imports the modules that read through the cache
+    from batch import collect_images # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description = "Memory-mapped cache of decoded images")
+    parser.add_argument("--cache-dir",
+        default = os.environ.get(RAW_CACHE_ENVIRONMENT_VARIABLE) or DEFAULT_RAW_CACHE_DIR,
+        help = f"directory of the cache (default: ${RAW_CACHE_ENVIRONMENT_VARIABLE} "
+        f"or {DEFAULT_RAW_CACHE_DIR})")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+
+    build_parser = subparsers.add_parser("build", help = "decode images into the cache")
+    build_parser.add_argument("inputs", nargs = "+",
+        help = "image files, directories or glob patterns")
+    build_parser.add_argument("--grayscale", action = "store_true",
+        help = "cache the images decoded as grayscale instead of color")
+    build_parser.add_argument("-w", "--workers", type = int, default = os.cpu_count(),
+        help = "number of decoding threads")
+
+    prune_parser = subparsers.add_parser("prune",
+        help = "remove the files of changed or removed images")
+    prune_parser.add_argument("--max-mb", type = float,
+        help = "then remove the oldest files until the cache fits this size")
+
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "prune":
+        max_bytes = None if arguments.max_mb is None else int(arguments.max_mb * 2**20)
+        removed, freed = prune_raw(arguments.cache_dir, max_bytes)
+        print(f"{removed} files removed, {freed / 2**20:.1f} MiB freed")
+        return 0
+
+    flags = cv2.IMREAD_GRAYSCALE if arguments.grayscale else cv2.IMREAD_COLOR
+    paths = collect_images(arguments.inputs)
+    failures = 0
+
+    # decoding and writing release the GIL
+    with futures.ThreadPoolExecutor(max_workers = arguments.workers) as executor:
+        jobs = [executor.submit(build_raw, path, arguments.cache_dir, flags) for path in paths]
+        for path, job in zip(paths, jobs):
+            try:
+                if job.result() is None:
+                    raise OSError("cannot be read as an image")
+                print(f"{path}: cached")
+            except OSError as error:
+                failures += 1
+                print(f"Error: {path}: {error}")
+
+    print(f"{len(paths) - failures} images cached in {arguments.cache_dir}, {failures} errors")
+    return 0 if failures == 0 else 1
+
+def _remove(raw, size, removed, freed):
+    """Removes a file of the cache, see prune_raw
+
+    Args:
+        raw (str): path of the file
+        size (int): size of the file in bytes
+        removed (int): number of files removed so far
+        freed (int): number of bytes freed so far
+
+    Returns:
+        tuple (int, int): updated number of removed files and bytes freed
+    """
+
+    try:
+        os.remove(raw)
+    except OSError:
+        return (removed, freed)
+
+    return (removed + 1, freed + size)
+
+# MAIN
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
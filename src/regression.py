@@ -0,0 +1,347 @@
+"""
+Program: Odin Digital
+Visual regression of a directory of images against a baseline
+
+The images of a baseline and a candidate directory are paired by their
+relative path and compared in parallel worker processes. Files with the
+same bytes pass without being decoded, and images with the same pixels
+without being diffed. The results are written as they arrive to a JSON
+report and an HTML report with a thumbnail of the difference mask of every
+changed pair, so that memory stays bounded by the number of pairs in
+flight whatever the number of pairs.
+
+Usage:
+    python src/regression.py baseline/ candidate/ -o report/
+    python src/regression.py baseline/ candidate/ -o report/ --tolerance 8 --max-changed 0.1
+"""
+
+# IMPORTS
+
+import argparse
+import html
+import json
+import os
+import sys
+import time
+
+from compare import diff_images, files_identical, images_equal
+from core import FILES_ALLOWED, make_preview
+from imagecache import read_image, set_cache_limit
+from lazyimport import lazy_import
+
+futures = lazy_import("concurrent.futures")
+cv2 = lazy_import("cv2")
+
+# CONSTANTS
+
+IMAGE_EXTENSIONS = tuple(FILES_ALLOWED[0][1])
+# the pair passes if it is identical or within the tolerance, otherwise it
+# fails; size_changed, missing and error pairs fail too, added ones do not
+STATUSES = ["identical", "passed", "failed", "size_changed", "missing", "added", "error"]
+FAILING_STATUSES = ["failed", "size_changed", "missing", "error"]
+THUMBNAIL_SIZE = 160
+THUMBNAIL_DIR = "thumbnails"
+# pairs submitted to the workers ahead of the results, per worker
+PAIRS_IN_FLIGHT_PER_WORKER = 4
+PROGRESS_INTERVAL = 2.0
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Visual regression: {title}</title>
+<style>
+body {{ font-family: Verdana, sans-serif; font-size: 13px; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}
+img {{ background: black; }}
+.failed, .size_changed, .missing, .error {{ color: #b00; }}
+</style>
+</head>
+<body>
+<h1>Visual regression</h1>
+<p>Baseline: {baseline}<br>Candidate: {candidate}</p>
+<p>Identical pairs are only counted in the summary.</p>
+<table>
+<tr><th>Image</th><th>Status</th><th>Changed pixels</th><th>Largest change</th>
+<th>Changed region</th><th>Difference mask</th></tr>
+"""
+
+# FUNCTIONS
+
+def compare_pair(baseline_path, candidate_path, thumbnail_path, tolerance, max_changed):
+    """Compares a candidate image with its baseline, in a worker process
+
+    Args:
+        baseline_path (str): path of the baseline image
+        candidate_path (str): path of the candidate image
+        thumbnail_path (str): path where the thumbnail of the difference
+            mask is written if the images differ
+        tolerance (int): largest difference of a channel that is not counted
+            as a change
+        max_changed (float): largest percentage of changed pixels of a
+            passing pair
+
+    Returns:
+        dict: "status" (one of STATUSES) and, for diffed images,
+            "changed_pixels", "changed_percent", "max_delta", "bounding_box"
+            and "thumbnail" (None if none was written)
+    """
+
+    if files_identical(baseline_path, candidate_path):
+        return {"status": "identical"}
+
+    baseline = read_image(baseline_path)
+    candidate = read_image(candidate_path)
+    if baseline is None or candidate is None:
+        return {"status": "error", "error": "cannot be read as an image"}
+    if baseline.shape != candidate.shape:
+        return {"status": "size_changed",
+            "error": f"{baseline.shape[1]}x{baseline.shape[0]} -> "
+            f"{candidate.shape[1]}x{candidate.shape[0]}"}
+    if images_equal(baseline, candidate):
+        return {"status": "identical"}
+
+    difference = diff_images(baseline, candidate, tolerance)
+    changed_percent = 100 * difference.changed_pixels / difference.mask.size
+    thumbnail = None
+
+    if difference.changed_pixels:
+        # every thumbnail pixel covering a change is white, so that small
+        # changes stay visible
+        preview = make_preview(difference.mask, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        cv2.threshold(preview, 0, 255, cv2.THRESH_BINARY, preview)
+        if cv2.imwrite(thumbnail_path, preview):
+            thumbnail = thumbnail_path
+
+    return {
+        "status": "passed" if changed_percent <= max_changed else "failed",
+        "changed_pixels": difference.changed_pixels,
+        "changed_percent": changed_percent,
+        "max_delta": difference.max_delta,
+        "bounding_box": difference.bounding_box,
+        "thumbnail": thumbnail
+    }
+
+def init_worker():
+    """Prepares a worker process: every image is read once, so that caching
+    the decoded images would only grow the memory
+    """
+
+    set_cache_limit(0)
+
+def list_images(directory):
+    """Lists the images of a directory and its subdirectories
+
+    Args:
+        directory (str): directory to list
+
+    Returns:
+        list of str: sorted paths of the images, relative to directory
+    """
+
+    names = []
+
+    for root, subdirectories, files in os.walk(directory):
+        subdirectories.sort()
+        relative_root = os.path.relpath(root, directory)
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                names.append(os.path.normpath(os.path.join(relative_root, name)))
+
+    return sorted(names)
+
+def run_regression(baseline_dir, candidate_dir, report_dir, tolerance = 0, max_changed = 0.0,
+    workers = None):
+    """Compares every image of a candidate directory with its baseline and
+    writes the reports
+
+    Args:
+        baseline_dir (str): directory of the baseline images
+        candidate_dir (str): directory of the candidate images
+        report_dir (str): directory where report.json, report.html and the
+            thumbnails are written
+        tolerance (int): largest difference of a channel that is not counted
+            as a change
+        max_changed (float): largest percentage of changed pixels of a
+            passing pair
+        workers (int): number of worker processes, None for the CPU count
+
+    Returns:
+        dict: number of pairs of every status, "pairs", "elapsed_s" and
+            "pairs_per_s"
+    """
+
+    workers = workers or os.cpu_count()
+    thumbnail_dir = os.path.join(report_dir, THUMBNAIL_DIR)
+    os.makedirs(thumbnail_dir, exist_ok = True)
+
+    baseline_names = list_images(baseline_dir)
+    candidate_names = set(list_images(candidate_dir))
+    added = sorted(candidate_names.difference(baseline_names))
+    del candidate_names
+
+    summary = dict.fromkeys(STATUSES, 0)
+    start = last_progress = time.perf_counter()
+    total = len(baseline_names) + len(added)
+
+    with open(os.path.join(report_dir, "report.json"), "w", encoding = "utf-8") as json_file, \
+        open(os.path.join(report_dir, "report.html"), "w", encoding = "utf-8") as html_file, \
+        futures.ProcessPoolExecutor(max_workers = workers, initializer = init_worker) as executor:
+
+        # the results are written one by one between the header and the summary
+        json_file.write(f'{{"baseline": {json.dumps(os.path.abspath(baseline_dir))}, '
+            f'"candidate": {json.dumps(os.path.abspath(candidate_dir))}, "results": [\n')
+        html_file.write(HTML_HEADER.format(title = html.escape(candidate_dir),
+            baseline = html.escape(os.path.abspath(baseline_dir)),
+            candidate = html.escape(os.path.abspath(candidate_dir))))
+
+        def write_result(name, result):
+            nonlocal last_progress
+
+            summary[result["status"]] += 1
+            done = sum(summary.values())
+            if result.get("thumbnail"):
+                result["thumbnail"] = os.path.relpath(result["thumbnail"],
+                    report_dir).replace(os.sep, "/")
+            json_file.write(("" if done == 1 else ",\n") + json.dumps(dict(name = name, **result)))
+            if result["status"] != "identical":
+                html_file.write(_html_row(name, result))
+
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                print(f"{done}/{total} pairs, {done / (now - start):.1f} pairs/sec")
+
+        pending = {}
+        for index, name in enumerate(baseline_names):
+            candidate_path = os.path.join(candidate_dir, name)
+            if not os.path.isfile(candidate_path):
+                write_result(name, {"status": "missing"})
+                continue
+
+            # at most a few pairs per worker are queued, the results are
+            # written as soon as they arrive
+            while len(pending) >= workers * PAIRS_IN_FLIGHT_PER_WORKER:
+                _write_done(pending, write_result)
+
+            try:
+                job = executor.submit(compare_pair, os.path.join(baseline_dir, name),
+                    candidate_path, os.path.join(thumbnail_dir, f"{index:06d}.png"),
+                    tolerance, max_changed)
+            except futures.BrokenExecutor as error:
+                # a worker died: the remaining pairs fail, the reports are
+                # still completed
+                write_result(name, {"status": "error", "error": str(error)})
+                continue
+            pending[job] = name
+
+        while pending:
+            _write_done(pending, write_result)
+
+        for name in added:
+            write_result(name, {"status": "added"})
+
+        elapsed = time.perf_counter() - start
+        summary.update(pairs = total, elapsed_s = elapsed,
+            pairs_per_s = total / elapsed if elapsed else 0.0)
+
+        json_file.write('\n], "summary": ' + json.dumps(summary) + "}\n")
+        html_file.write("</table>\n<p>" + ", ".join(f"{summary[status]} {status}"
+            for status in STATUSES) + f"; {total} pairs in {elapsed:.1f} s "
+            f"({summary['pairs_per_s']:.1f} pairs/sec)</p>\n</body>\n</html>\n")
+
+    return summary
+
+def main(argv):
+    """Runs a visual regression from the command line
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        int: exit status, 1 if a pair failed
+    """
+
+    parser = argparse.ArgumentParser(
+        description = "Visual regression of a directory of images against a baseline")
+    parser.add_argument("baseline", help = "directory of the baseline images")
+    parser.add_argument("candidate", help = "directory of the images to check, "
+        "paired with the baseline by relative path")
+    parser.add_argument("-o", "--output", required = True,
+        help = "directory where report.json, report.html and the thumbnails are written")
+    parser.add_argument("-w", "--workers", type = int, default = os.cpu_count(),
+        help = "number of worker processes")
+    parser.add_argument("--tolerance", type = int, default = 0,
+        help = "largest difference of a channel that is not counted as a change")
+    parser.add_argument("--max-changed", type = float, default = 0.0,
+        help = "largest percentage of changed pixels of a passing pair (default: 0)")
+    arguments = parser.parse_args(argv)
+
+    for directory in (arguments.baseline, arguments.candidate):
+        if not os.path.isdir(directory):
+            parser.error(f"{directory} is not a directory")
+
+    summary = run_regression(arguments.baseline, arguments.candidate, arguments.output,
+        arguments.tolerance, arguments.max_changed, arguments.workers)
+
+    print(", ".join(f"{summary[status]} {status}" for status in STATUSES))
+    print(f"{summary['pairs']} pairs in {summary['elapsed_s']:.2f} s "
+        f"({summary['pairs_per_s']:.1f} pairs/sec), report in "
+        f"{os.path.join(arguments.output, 'report.html')}")
+
+    return 1 if any(summary[status] for status in FAILING_STATUSES) else 0
+
+def _html_row(name, result):
+    """Formats a result as a row of the HTML report
+
+    Args:
+        name (str): relative path of the image
+        result (dict): result returned by compare_pair
+
+    Returns:
+        str: HTML table row
+    """
+
+    changed = largest = region = thumbnail = ""
+    if "changed_pixels" in result:
+        changed = f"{result['changed_pixels']} ({result['changed_percent']:.3f}%)"
+        largest = str(max(result["max_delta"]))
+        region = str(result["bounding_box"] or "")
+    if result.get("thumbnail"):
+        thumbnail = f'<img src="{html.escape(result["thumbnail"])}" alt="mask">'
+
+    status = result["status"]
+    if result.get("error"):
+        status += f": {result['error']}"
+
+    return (f'<tr class="{result["status"]}"><td>{html.escape(name)}</td>'
+        f"<td>{html.escape(status)}</td><td>{changed}</td><td>{largest}</td>"
+        f"<td>{region}</td><td>{thumbnail}</td></tr>\n")
+
+def _write_done(pending, write_result):
+    """Waits for at least one comparison and writes the finished ones
+
+    Args:
+        pending (dict): names of the pairs by job, the finished ones are
+            removed
+        write_result (callable): called with the name and the result of
+            every finished pair
+    """
+
+    done, _ = futures.wait(pending, return_when = futures.FIRST_COMPLETED)
+
+    for job in done:
+        name = pending.pop(job)
+        # an error of one pair, including a worker that died, is recorded
+        # and does not stop the run, so that the reports stay valid
+        try:
+            result = job.result()
+        except Exception as error: # pylint: disable=broad-except
+            result = {"status": "error", "error": str(error) or type(error).__name__}
+        write_result(name, result)
+
+# MAIN
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
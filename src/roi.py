@@ -0,0 +1,118 @@
+"""
+Program: Odin Digital
+Regions of interest
+
+A region of interest is an (x, y, width, height) rectangle of an image.
+Operations work on a NumPy view of the region, which is never copied, so
+that their cost scales with the area of the region and not with that of
+the image; the locations they find are mapped back to the coordinates of
+the whole image.
+
+Usage:
+    roi = clip_roi((100, 50, 640, 480), image.shape)
+    edges = find_edges(crop(image, roi))
+    x, y, width, height = to_image_box(box_in_region, roi)
+"""
+
+# IMPORTS
+
+import argparse
+
+# FUNCTIONS
+
+def clip_roi(roi, shape):
+    """Clips a region of interest to an image
+
+    Args:
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+        shape (tuple): shape of the image
+
+    Returns:
+        tuple (int, int, int, int): (x, y, width, height) of the part of the
+            region within the image
+
+    Raises:
+        ValueError: if the region does not overlap the image
+    """
+
+    x, y, width, height = (int(value) for value in roi)
+    x_1, y_1 = max(0, x), max(0, y)
+    x_2, y_2 = min(shape[1], x + width), min(shape[0], y + height)
+
+    if x_2 <= x_1 or y_2 <= y_1:
+        raise ValueError(f"The region {tuple(roi)} is outside the image")
+
+    return (x_1, y_1, x_2 - x_1, y_2 - y_1)
+
+def crop(image, roi):
+    """Gets a region of an image, without copying it
+
+    Args:
+        image (numpy.ndarray): OpenCV-compatible image
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region,
+            None for the whole image
+
+    Returns:
+        numpy.ndarray: view of the region, which shares the pixels of image
+    """
+
+    if roi is None:
+        return image
+
+    x, y, width, height = clip_roi(roi, image.shape)
+    return image[y:y + height, x:x + width]
+
+def parse_roi(text):
+    """Parses a region of interest of the command line
+
+    Args:
+        text (str): region as X,Y,WIDTH,HEIGHT
+
+    Returns:
+        tuple (int, int, int, int): (x, y, width, height) of the region
+    """
+
+    try:
+        x, y, width, height = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected X,Y,WIDTH,HEIGHT") from None
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("the width and height must be positive")
+
+    return (x, y, width, height)
+
+def to_image_box(box, roi):
+    """Maps a rectangle of a region to the coordinates of the image
+
+    Args:
+        box (tuple (int, int, int, int)): (x, y, width, height) within the
+            region, or None
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+            in the image, None for the whole image
+
+    Returns:
+        tuple (int, int, int, int): (x, y, width, height) within the image,
+            None if box is None
+    """
+
+    if box is None or roi is None:
+        return box
+
+    return (box[0] + roi[0], box[1] + roi[1], box[2], box[3])
+
+def to_image_point(point, roi):
+    """Maps a point of a region to the coordinates of the image
+
+    Args:
+        point (tuple (int, int)): (x, y) within the region
+        roi (tuple (int, int, int, int)): (x, y, width, height) of the region
+            in the image, None for the whole image
+
+    Returns:
+        tuple (int, int): (x, y) within the image
+    """
+
+    if roi is None:
+        return point
+
+    return (point[0] + roi[0], point[1] + roi[1])
@@ -0,0 +1,420 @@
+"""
+Program: Odin Digital
+Edge detection and template tracking on videos and camera streams
+
+Frames are decoded in a thread of their own and handed to the processing
+thread through a bounded queue. When the processing falls behind a live
+source (a camera, or a file played at its frame rate with realtime), the
+oldest queued frames are dropped, so that the latency stays bounded; files
+are otherwise processed frame by frame. Template tracking searches a window
+around the position predicted from the last two matches, and the whole
+frame only when the template is lost.
+
+Usage:
+    python src/stream.py edges video.mp4 -o edges.avi
+    python src/stream.py track 0 --template face.png --realtime
+    with FrameStream("frames/") as frames:
+        report = run_stream(frames, lambda frame: find_edges(frame.image))
+"""
+
+# IMPORTS
+
+from collections import namedtuple
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+from core import find_template
+from edges import find_edges
+from instrument import instrumented
+from lazyimport import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+STREAM_QUEUE_SIZE = 8
+# frame rate of the outputs when the source does not have one
+DEFAULT_FPS = 30
+OUTPUT_FOURCC = "MJPG"
+# margin of the tracking window around the predicted position, at least
+# TRACK_MIN_MARGIN pixels and TRACK_MARGIN_FACTOR times the template size
+TRACK_MIN_MARGIN = 16
+TRACK_MARGIN_FACTOR = 0.5
+# TM_SQDIFF_NORMED difference above which the template is lost
+TRACK_LOST_DIFFERENCE = 0.1
+
+Frame = namedtuple("Frame", ["index", "image", "decoded"])
+
+# FUNCTIONS
+
+def parse_source(text):
+    """Parses the source of a stream
+
+    Args:
+        text (str): path of a video file or of a directory of images, or
+            number of a camera
+
+    Returns:
+        str or int: path, or camera number
+    """
+
+    return int(text) if text.isdigit() and not os.path.exists(text) else text
+
+def run_stream(frames, process):
+    """Processes every frame of a stream and measures the throughput
+
+    Args:
+        frames (FrameStream): started stream
+        process (callable): function called with every Frame
+
+    Returns:
+        dict: number of "frames" processed and "dropped", "elapsed_s",
+            sustained "fps", and "latency_median_ms" and "latency_p95_ms",
+            from the end of the decoding of a frame to the end of its
+            processing
+    """
+
+    latencies = []
+    start = time.perf_counter()
+
+    for frame in frames:
+        process(frame)
+        latencies.append(time.perf_counter() - frame.decoded)
+
+    elapsed = time.perf_counter() - start
+    milliseconds = np.array(latencies or [0.0]) * 1e3
+
+    return {
+        "frames": len(latencies),
+        "dropped": frames.dropped,
+        "elapsed_s": elapsed,
+        "fps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_median_ms": float(np.median(milliseconds)),
+        "latency_p95_ms": float(np.percentile(milliseconds, 95))
+    }
+
+def main(argv):
+    """Runs edge detection or template tracking on a stream
+
+    Args:
+        argv (list of str): command-line arguments, without the program name
+
+    Returns:
+        int: exit status
+    """
+
+    # imported here, batch imports every tool
+    from batch import parse_thresholds # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(
+        description = "Edge detection and template tracking on videos and cameras")
+    subparsers = parser.add_subparsers(dest = "operation", required = True)
+    operation_parsers = {}
+    for operation in ("edges", "track"):
+        operation_parsers[operation] = subparsers.add_parser(operation)
+        operation_parsers[operation].add_argument("source", type = parse_source,
+            help = "video file, directory of images or camera number")
+        operation_parsers[operation].add_argument("-o", "--output",
+            help = "video file where the results are saved")
+        operation_parsers[operation].add_argument("--realtime", action = "store_true",
+            help = "play files at their frame rate, dropping frames when the "
+            "processing falls behind (always on for cameras)")
+        operation_parsers[operation].add_argument("--queue-size", type = int,
+            default = STREAM_QUEUE_SIZE, help = "frames decoded ahead of the processing")
+    operation_parsers["edges"].add_argument("--thresholds", type = parse_thresholds,
+        default = "median", help = "median, otsu or LOW,HIGH (default: median)")
+    operation_parsers["track"].add_argument("--template", required = True,
+        help = "image to track")
+    arguments = parser.parse_args(argv)
+
+    if arguments.operation == "track":
+        template = cv2.imread(arguments.template)
+        if template is None:
+            parser.error(f"{arguments.template} cannot be read as an image")
+        tracker = TemplateTracker(template)
+
+    writer = None
+
+    def process(frame):
+        nonlocal writer
+
+        if arguments.operation == "edges":
+            result = find_edges(frame.image, arguments.thresholds)
+        else:
+            corners = tracker.update(frame.image)
+            result = frame.image
+            if arguments.output and corners is not None:
+                result = frame.image.copy()
+                cv2.rectangle(result, *corners, (0, 255, 0), 3)
+
+        if arguments.output:
+            if writer is None:
+                writer = cv2.VideoWriter(arguments.output,
+                    cv2.VideoWriter_fourcc(*OUTPUT_FOURCC), frames.fps or DEFAULT_FPS,
+                    (result.shape[1], result.shape[0]), result.ndim == 3)
+            writer.write(result)
+
+    try:
+        with FrameStream(arguments.source, arguments.queue_size,
+            arguments.realtime or None) as frames:
+            report = run_stream(frames, process)
+    except ValueError as error:
+        print(f"Error: {error}")
+        return 1
+    finally:
+        if writer is not None:
+            writer.release()
+
+    print(f"{report['frames']} frames in {report['elapsed_s']:.2f} s: "
+        f"{report['fps']:.1f} FPS, {report['dropped']} dropped, latency median "
+        f"{report['latency_median_ms']:.1f} ms, p95 {report['latency_p95_ms']:.1f} ms")
+    if arguments.operation == "track":
+        print(f"{tracker.full_searches} searches of the whole frame, at the start and "
+            "when the template was lost")
+
+    return 0
+
+# CLASSES
+
+class FrameStream:
+    """Frames of a video file, a directory of images or a camera, decoded in
+    a background thread
+
+    Iterating over a started stream gives Frame tuples (index in the source,
+    image and perf_counter time of the end of its decoding) until the source
+    ends or the stream is closed.
+    """
+
+    def __init__(self, source, queue_size = STREAM_QUEUE_SIZE, realtime = None):
+        """Opens a source
+
+        Args:
+            source (str or int): path of a video file or of a directory of
+                images, or camera number
+            queue_size (int): maximum number of decoded frames waiting to be
+                processed
+            realtime (bool): True to play files at their frame rate and drop
+                the oldest frames when the queue is full, None for only
+                cameras
+
+        Raises:
+            ValueError: if the source cannot be opened
+        """
+
+        self.camera = isinstance(source, int)
+        self.realtime = self.camera if realtime is None else realtime
+        self.decoded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize = queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None
+        self._capture = None
+        self._paths = None
+
+        if isinstance(source, str) and os.path.isdir(source):
+            self._paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                if cv2.haveImageReader(os.path.join(source, name)))
+            if not self._paths:
+                raise ValueError(f"{source} has no images")
+            self.fps = None
+        else:
+            self._capture = cv2.VideoCapture(source)
+            if not self._capture.isOpened():
+                raise ValueError(f"{source} cannot be opened as a video")
+            self.fps = self._capture.get(cv2.CAP_PROP_FPS) or None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            yield frame
+
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Stops the decoding and releases the source"""
+
+        self._stop.set()
+        if self._thread is not None:
+            # unblocks a decoding thread waiting for room in the queue
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout = 0.01)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+        if self._capture is not None:
+            self._capture.release()
+
+    def start(self):
+        """Starts decoding frames in a background thread"""
+
+        self._thread = threading.Thread(target = self._decode, name = "decode", daemon = True)
+        self._thread.start()
+
+    def _decode(self):
+        """Decodes the frames into the queue, run by the decoding thread"""
+
+        start = time.perf_counter()
+        index = 0
+
+        try:
+            while not self._stop.is_set():
+                if self._paths is not None:
+                    if index == len(self._paths):
+                        break
+                    image = cv2.imread(self._paths[index])
+                    if image is None:
+                        index += 1
+                        continue
+                else:
+                    grabbed, image = self._capture.read()
+                    if not grabbed:
+                        break
+
+                # files played in real time wait for the time of their frame
+                if self.realtime and not self.camera and self.fps:
+                    delay = start + index / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                self.decoded += 1
+                self._put(Frame(index, image, time.perf_counter()))
+                index += 1
+        except Exception as error: # pylint: disable=broad-except
+            self._error = error
+        finally:
+            self._put(None, drop = False)
+
+    def _put(self, frame, drop = None):
+        """Queues a frame, dropping the oldest one if the queue is full and
+        the stream is played in real time
+
+        Args:
+            frame (Frame): frame, or None at the end of the stream
+            drop (bool): True to drop frames, None for realtime
+        """
+
+        if self.realtime if drop is None else drop:
+            while True:
+                try:
+                    self._queue.put_nowait(frame)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+        while not self._stop.is_set():
+            try:
+                self._queue.put(frame, timeout = 0.1)
+                return
+            except queue.Full:
+                pass
+
+class TemplateTracker:
+    """Follows a template from frame to frame
+
+    The template is searched in a window around the position predicted from
+    its last two positions, and in the whole frame at first and whenever it
+    is lost.
+    """
+
+    def __init__(self, template, levels = None):
+        """Creates a tracker
+
+        Args:
+            template (numpy.ndarray): BGR image to track
+            levels (int): pyramid levels of the searches, see find_template
+        """
+
+        self.template = template
+        self.levels = levels
+        self.template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        self.location = None
+        self.velocity = (0, 0)
+        self.full_searches = 0
+        height, width = template.shape[:2]
+        self.margin = max(TRACK_MIN_MARGIN, int(TRACK_MARGIN_FACTOR * max(width, height)))
+
+    @instrumented("track")
+    def update(self, image):
+        """Finds the template in the next frame
+
+        Args:
+            image (numpy.ndarray): BGR frame, larger than the template
+
+        Returns:
+            tuple (tuple, tuple): top-left and bottom-right (x, y) corners of
+                the template, or None if it is lost
+        """
+
+        height, width = self.template.shape[:2]
+        location = None
+
+        if self.location is not None:
+            # window around the predicted position, within the frame
+            x = min(max(0, self.location[0] + self.velocity[0] - self.margin),
+                image.shape[1] - width)
+            y = min(max(0, self.location[1] + self.velocity[1] - self.margin),
+                image.shape[0] - height)
+            window = image[y:min(image.shape[0], y + height + 2 * self.margin),
+                x:min(image.shape[1], x + width + 2 * self.margin)]
+            (x_match, y_match), _ = find_template(window, self.template, self.levels)
+            location = self._confirm(image, (x + x_match, y + y_match))
+
+        if location is None:
+            self.full_searches += 1
+            location = self._confirm(image,
+                find_template(image, self.template, self.levels)[0])
+
+        if location is None:
+            self.location = None
+            self.velocity = (0, 0)
+            return None
+
+        if self.location is not None:
+            self.velocity = (location[0] - self.location[0], location[1] - self.location[1])
+        self.location = location
+
+        return (location, (location[0] + width, location[1] + height))
+
+    def _confirm(self, image, location):
+        """Checks that the template is at a location of a frame
+
+        Args:
+            image (numpy.ndarray): BGR frame
+            location (tuple (int, int)): (x, y) top-left corner of the match
+
+        Returns:
+            tuple (int, int): location, or None if the template is not there
+        """
+
+        height, width = self.template_gray.shape
+        patch = cv2.cvtColor(image[location[1]:location[1] + height,
+            location[0]:location[0] + width], cv2.COLOR_BGR2GRAY)
+        difference = cv2.matchTemplate(patch, self.template_gray, cv2.TM_SQDIFF_NORMED)[0, 0]
+
+        return location if difference <= TRACK_LOST_DIFFERENCE else None
+
+# MAIN
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,355 @@
+"""
+Program: Odin Digital
+Tiled processing of images larger than the available memory
+
+Images are processed in horizontal strips. Binary PGM/PPM files are memory
+mapped, so only the rows of the strip being processed are read from disk,
+and PGM/PPM outputs are written strip by strip as well. Other formats have
+to be decoded or encoded at once by OpenCV, so only the processing itself
+is bounded for them.
+
+Tiled resizes interpolate as resizing.resize does, averaging the input
+pixels when shrinking. Tiled edges are those of the whole image: every
+strip writes its Canny candidates and seeds, and the hysteresis then
+follows the edges from strip to strip (see link_edges).
+"""
+
+# IMPORTS
+
+import math
+import tempfile
+
+from edges import (THRESHOLD_SAMPLE_SIZE, auto_thresholds, compute_gradients,
+    edges_from_gradients)
+from imagecache import read_image
+from lazyimport import lazy_import
+from resizing import choose_interpolation
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# CONSTANTS
+
+STRIP_ROWS = 512
+# Rows read above and below every strip for Canny: the blur, Sobel and
+# non-maximum suppression of a row need 4 rows around it
+EDGES_HALO_ROWS = 4
+# Rows read above and below the input rows of an enlarged strip: the Lanczos
+# interpolation reads 4 rows on either side of a point
+RESIZE_HALO_ROWS = 4
+# pixels of the tiled edges before the hysteresis: candidates above the low
+# threshold, and the seeds above the high one are already edges
+EDGE_CANDIDATE = 1
+EDGE = 255
+NETPBM_EXTENSIONS = (".pgm", ".ppm")
+TILED_OPERATIONS = ["gray", "resize", "edges"]
+
+# FUNCTIONS
+
+def create_netpbm(path, height, width, channels):
+    """Creates a binary PGM/PPM file and maps its pixels for writing
+
+    Args:
+        path (str): path of the new file
+        height (int): height of the image
+        width (int): width of the image
+        channels (int): 1 for PGM, 3 for PPM
+
+    Returns:
+        numpy.memmap: writable pixels, with shape (height, width[, 3])
+    """
+
+    magic = b"P5" if channels == 1 else b"P6"
+    header = magic + f"\n{width} {height}\n255\n".encode("ascii")
+    shape = (height, width) if channels == 1 else (height, width, 3)
+
+    with open(path, "wb") as file:
+        file.write(header)
+        file.truncate(len(header) + math.prod(shape))
+
+    return np.memmap(path, dtype = np.uint8, mode = "r+", offset = len(header), shape = shape)
+
+def link_edges(state, strip_rows = STRIP_ROWS):
+    """Runs the hysteresis of Canny over an image strip by strip
+
+    Every candidate connected to an edge becomes an edge, and the other
+    candidates are cleared. Each pass links the connected pixels of every
+    strip and the rows around it, down and then up the image, until a pass
+    changes nothing; edges that wind across several strips only take a few
+    more passes.
+
+    Args:
+        state (numpy.ndarray): EDGE_CANDIDATE, EDGE or 0 for every pixel,
+            updated in place (it can be memory mapped)
+        strip_rows (int): number of rows linked at once
+
+    Returns:
+        int: number of passes
+    """
+
+    height = state.shape[0]
+    strips = list(range(0, height, strip_rows))
+    passes = 0
+    changed = True
+
+    while changed:
+        changed = False
+        passes += 1
+        for first in strips + strips[::-1]:
+            block = state[max(0, first - 1):min(height, first + strip_rows + 1)]
+            count, labels = cv2.connectedComponents((block > 0).view(np.uint8),
+                connectivity = 8)
+            linked = np.zeros(count, bool)
+            linked[labels[block == EDGE]] = True
+            linked[0] = False
+            grown = linked[labels] & (block == EDGE_CANDIDATE)
+            if grown.any():
+                block[grown] = EDGE
+                changed = True
+
+    for first in strips:
+        block = state[first:first + strip_rows]
+        block[block == EDGE_CANDIDATE] = 0
+
+    return passes
+
+def open_image_rows(path):
+    """Opens an image so that its rows can be read strip by strip
+
+    Args:
+        path (str): path of the image
+
+    Returns:
+        tuple (numpy.ndarray, bool): pixels of the image, memory mapped for
+            8-bit binary PGM/PPM files, and True if the channels are stored
+            in RGB order instead of the BGR order of OpenCV
+    """
+
+    if path.lower().endswith(NETPBM_EXTENSIONS):
+        header = read_netpbm_header(path)
+        if header is not None:
+            magic, width, height, offset = header
+            shape = (height, width) if magic == b"P5" else (height, width, 3)
+            return (np.memmap(path, dtype = np.uint8, mode = "r", offset = offset,
+                shape = shape), magic == b"P6")
+
+    image = read_image(path)
+    if image is None:
+        raise ValueError(f"{path} cannot be read as an image")
+
+    return (image, False)
+
+def process_tiled(input_path, output_path, operation, width = None, height = None,
+    thresholds = "median", strip_rows = STRIP_ROWS):
+    """Applies an operation to an image strip by strip
+
+    Args:
+        input_path (str): path of the image to process
+        output_path (str): path of the result
+        operation (str): one of TILED_OPERATIONS
+        width (int): width of the result, only for "resize"
+        height (int): height of the result, only for "resize"
+        thresholds (str or tuple (int, int)): thresholds of "edges", as in
+            edges.find_edges; automatic thresholds are computed from a
+            sample of every few rows and columns
+        strip_rows (int): number of output rows processed at once
+
+    Returns:
+        tuple (int, int): (height, width) of the result
+    """
+
+    rows, rgb = open_image_rows(input_path)
+    input_height, input_width = rows.shape[:2]
+
+    if operation == "resize":
+        output_height, output_width = height, width
+    else:
+        output_height, output_width = input_height, input_width
+
+    output_channels = 3 if operation == "resize" and rows.ndim == 3 else 1
+
+    if operation == "edges" and isinstance(thresholds, str):
+        step = max(1, math.ceil(max(input_height, input_width) / THRESHOLD_SAMPLE_SIZE))
+        sample = rows[::step, ::step]
+        if rgb:
+            sample = sample[..., ::-1]
+        sample = compute_gradients(np.ascontiguousarray(sample), workers = 1).gray
+        thresholds = auto_thresholds(sample, thresholds)
+    if operation == "edges":
+        low, high = min(thresholds), max(thresholds)
+
+    streamed = output_path.lower().endswith(NETPBM_EXTENSIONS)
+    if streamed:
+        output = create_netpbm(output_path, output_height, output_width, output_channels)
+    else:
+        # OpenCV encoders need the whole image, it is assembled in a
+        # temporary file so that it can be paged out
+        scratch = tempfile.TemporaryFile()
+        if output_channels == 1:
+            shape = (output_height, output_width)
+        else:
+            shape = (output_height, output_width, 3)
+        output = np.memmap(scratch, dtype = np.uint8, mode = "w+", shape = shape)
+
+    for out_first in range(0, output_height, strip_rows):
+        out_last = min(output_height, out_first + strip_rows)
+
+        if operation == "resize":
+            strip = resize_strip(rows, rgb, (input_height, input_width),
+                (output_height, output_width), out_first, out_last)
+        else:
+            halo = EDGES_HALO_ROWS if operation == "edges" else 0
+            first = max(0, out_first - halo)
+            last = min(input_height, out_last + halo)
+            strip = read_strip(rows, rgb, first, last)
+
+            if operation == "edges":
+                # with equal thresholds cv2.Canny keeps every candidate above
+                # them, the hysteresis runs on the whole image afterwards
+                gradients = compute_gradients(strip, workers = 1)
+                seeds = edges_from_gradients(gradients, high, high)
+                strip = edges_from_gradients(gradients, low, low)
+                strip //= EDGE // EDGE_CANDIDATE
+                strip[seeds > 0] = EDGE
+            elif strip.ndim == 3:
+                strip = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+
+            strip = strip[out_first - first:out_last - first]
+
+        if streamed and output_channels == 3:
+            strip = strip[..., ::-1]
+        output[out_first:out_last] = strip
+
+    if operation == "edges":
+        link_edges(output, strip_rows)
+
+    if streamed:
+        output.flush()
+    else:
+        written = cv2.imwrite(output_path, output)
+        scratch.close()
+        if not written:
+            raise ValueError(f"{output_path} cannot be written")
+
+    del output
+    return (output_height, output_width)
+
+def read_netpbm_header(path):
+    """Reads the header of an 8-bit binary PGM/PPM file
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        tuple (bytes, int, int, int): magic number, width, height and offset
+            of the pixels, or None if the file is not an 8-bit binary PGM/PPM
+    """
+
+    with open(path, "rb") as file:
+        data = file.read(1024)
+
+    fields = []
+    position = 0
+    while len(fields) < 4:
+        while position < len(data) and data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b"#":
+            position = data.index(b"\n", position)
+            continue
+        start = position
+        while position < len(data) and not data[position:position + 1].isspace():
+            position += 1
+        if start == position:
+            return None
+        fields.append(data[start:position])
+
+    magic, width, height, maxval = fields
+    if magic not in (b"P5", b"P6") or int(maxval) > 255:
+        return None
+
+    # a single whitespace separates the header from the pixels
+    return (magic, int(width), int(height), position + 1)
+
+def read_strip(rows, rgb, first, last):
+    """Reads a strip of rows as an OpenCV-compatible image
+
+    Args:
+        rows (numpy.ndarray): pixels returned by open_image_rows
+        rgb (bool): True if the channels are stored in RGB order
+        first (int): first row of the strip
+        last (int): row after the last row of the strip
+
+    Returns:
+        numpy.ndarray: OpenCV-compatible image with the rows of the strip
+    """
+
+    strip = rows[first:last]
+    if rgb:
+        strip = strip[..., ::-1]
+
+    return np.ascontiguousarray(strip)
+
+def resize_strip(rows, rgb, input_size, output_size, out_first, out_last):
+    """Computes a strip of the resize of an image
+
+    The interpolation is the one resizing.resize chooses. Downscales average
+    the input pixels that every output pixel covers, as INTER_AREA does:
+    the input rows of the strip are read in chunks of the height of the
+    strip, shrunk horizontally by cv2.resize and summed with the share of
+    every row in the output rows. Other resizes are interpolated from the
+    input rows around the strip with the pixel-center mapping of
+    cv2.resize. Either way, consecutive strips join without seams.
+
+    Args:
+        rows (numpy.ndarray): pixels returned by open_image_rows
+        rgb (bool): True if the channels are stored in RGB order
+        input_size (tuple (int, int)): (height, width) of the input image
+        output_size (tuple (int, int)): (height, width) of the resized image
+        out_first (int): first output row of the strip
+        out_last (int): output row after the last row of the strip
+
+    Returns:
+        numpy.ndarray: rows out_first to out_last of the resized image
+    """
+
+    input_height, input_width = input_size
+    output_height, output_width = output_size
+    scale_x = input_width / output_width
+    scale_y = input_height / output_height
+    interpolation = choose_interpolation((input_width, input_height),
+        (output_width, output_height))
+
+    if interpolation == cv2.INTER_AREA:
+        strip_rows = out_last - out_first
+        starts = np.arange(out_first, out_last)[:, None] * scale_y
+        in_first = math.floor(out_first * scale_y)
+        in_last = min(input_height, math.ceil(out_last * scale_y))
+        total = np.zeros((strip_rows, output_width) + rows.shape[2:], np.float32)
+
+        for first in range(in_first, in_last, strip_rows):
+            last = min(in_last, first + strip_rows)
+            # in floating point, so that the result is rounded once
+            chunk = cv2.resize(read_strip(rows, rgb, first, last).astype(np.float32),
+                (output_width, last - first), interpolation = cv2.INTER_AREA)
+            covered = np.arange(first, last)
+            shares = np.clip(np.minimum(starts + scale_y, covered + 1)
+                - np.maximum(starts, covered), 0, None) / scale_y
+            total += (shares.astype(np.float32)
+                @ chunk.reshape(last - first, -1)).reshape(total.shape)
+
+        return np.clip(np.rint(total), 0, 255).astype(np.uint8)
+
+    center = math.floor((out_first + 0.5) * scale_y - 0.5)
+    first = max(0, center - RESIZE_HALO_ROWS)
+    last = min(input_height,
+        math.floor((out_last - 0.5) * scale_y - 0.5) + 1 + RESIZE_HALO_ROWS)
+    strip = read_strip(rows, rgb, first, last)
+
+    # maps every output pixel to the input strip
+    matrix = np.array([
+        [scale_x, 0, 0.5 * scale_x - 0.5],
+        [0, scale_y, (out_first + 0.5) * scale_y - 0.5 - first]])
+
+    return cv2.warpAffine(strip, matrix, (output_width, out_last - out_first),
+        flags = interpolation | cv2.WARP_INVERSE_MAP,
+        borderMode = cv2.BORDER_REPLICATE)
@@ -0,0 +1,12 @@
+"""
+Program: Odin Digital
+Test configuration: the modules of src are imported by their plain names
+"""
+
+# IMPORTS
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src"))
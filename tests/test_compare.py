@@ -0,0 +1,159 @@
+"""
+Program: Odin Digital
+Tests of the comparison of images
+"""
+
+# IMPORTS
+
+import glob
+import os
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from compare import (DIFF_STRIP_ROWS, HASH_FUNCTIONS, IDENTICAL_IMAGES, build_hash_index,
+    compare_files, diff_images, find_near_matches, hamming_distance, image_hash,
+    load_hash_index, query_hash_index, save_hash_index)
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def expected_difference(image_a, image_b, tolerance):
+    """Computes the differences of two images directly with NumPy
+
+    Args:
+        image_a (numpy.ndarray): OpenCV-compatible image
+        image_b (numpy.ndarray): OpenCV-compatible image
+        tolerance (int): largest difference of a channel that is not a change
+
+    Returns:
+        tuple (int, tuple, tuple, numpy.ndarray): changed pixels, maximum
+            difference of every channel, bounding box and mask
+    """
+
+    difference = np.abs(image_a.astype(np.int64) - image_b.astype(np.int64))
+    if difference.ndim == 2:
+        difference = difference[..., None]
+    changed = (difference > tolerance).any(axis = 2)
+    rows, columns = np.nonzero(changed)
+    box = None
+    if rows.size:
+        box = (int(columns.min()), int(rows.min()), int(columns.max() - columns.min() + 1),
+            int(rows.max() - rows.min() + 1))
+
+    return (int(changed.sum()), tuple(int(delta) for delta in difference.max(axis = (0, 1))),
+        box, changed.astype(np.uint8) * 255)
+
+def test_diff_images_matches_numpy():
+    """The strip-wise differences are those of the whole images, for every
+    channel count and tolerance, across several strips
+    """
+
+    rng = np.random.default_rng(1)
+    height = 2 * DIFF_STRIP_ROWS + 37
+
+    for channels in (1, 3, 4):
+        shape = (height, 90) if channels == 1 else (height, 90, channels)
+        image_a = rng.integers(0, 256, shape, dtype = np.uint8)
+        # small noise everywhere, and larger changes in two distant spots
+        image_b = cv2.add(image_a, rng.integers(0, 3, shape, dtype = np.uint8))
+        image_b[40:50, 10:20] = 255 - image_b[40:50, 10:20]
+        image_b[height - 5, 80] = 255 - image_b[height - 5, 80]
+
+        for tolerance in (0, 2, 100):
+            difference = diff_images(image_a, image_b, tolerance)
+            changed, max_delta, box, mask = expected_difference(image_a, image_b, tolerance)
+            assert difference.changed_pixels == changed
+            assert difference.max_delta == max_delta
+            assert difference.bounding_box == box
+            assert np.array_equal(difference.mask, mask)
+
+def test_diff_images_roi():
+    """The changes of a region are reported in the coordinates of the whole
+    images, and images of different sizes are rejected
+    """
+
+    image_a = np.zeros((300, 400, 3), np.uint8)
+    image_b = image_a.copy()
+    image_b[120:130, 210:220] = 50
+    image_b[10, 10] = 50
+
+    difference = diff_images(image_a, image_b, 0, (200, 100, 100, 100))
+
+    assert difference.changed_pixels == 100
+    assert difference.bounding_box == (210, 120, 10, 10)
+    assert difference.mask.shape == (100, 100)
+    assert diff_images(image_a, image_a).changed_pixels == 0
+    with pytest.raises(ValueError):
+        diff_images(image_a, image_a[1:])
+
+def test_compare_files_identity_fast_paths(tmp_path):
+    """Files with the same bytes are identical without being decoded, images
+    with the same pixels are identical whatever their encoding
+    """
+
+    # not images: identical bytes are not decoded
+    for name in ("a.bin", "b.bin"):
+        (tmp_path / name).write_bytes(b"not an image" * 1000)
+    assert compare_files(str(tmp_path / "a.bin"), str(tmp_path / "b.bin")) is IDENTICAL_IMAGES
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    fast, small = str(tmp_path / "fast.png"), str(tmp_path / "small.png")
+    cv2.imwrite(fast, image, [cv2.IMWRITE_PNG_COMPRESSION, 0])
+    cv2.imwrite(small, image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    assert compare_files(fast, small) is IDENTICAL_IMAGES
+
+    image[5, 7] = 255 - image[5, 7]
+    cv2.imwrite(str(tmp_path / "changed.png"), image)
+    difference = compare_files(fast, str(tmp_path / "changed.png"))
+    assert difference.changed_pixels == 1 and difference.bounding_box == (7, 5, 1, 1)
+    with pytest.raises(ValueError):
+        compare_files(str(tmp_path / "a.bin"), fast)
+
+def test_hash_index_finds_near_duplicates(tmp_path):
+    """A resized and recompressed copy of a reference is closest to it with
+    every hash function, and the index survives a save and a load
+    """
+
+    paths = sorted(glob.glob(os.path.join(IMAGE_DIR, "*")))
+    baboon = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    _, encoded = cv2.imencode(".jpg", cv2.resize(baboon, (300, 300),
+        interpolation = cv2.INTER_AREA), [cv2.IMWRITE_JPEG_QUALITY, 70])
+    copy = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+    for hash_function in HASH_FUNCTIONS:
+        index = build_hash_index(paths + [str(tmp_path / "missing.png")], hash_function)
+        assert index["paths"] == paths
+        copy_hash = image_hash(copy, hash_function)
+
+        matches = query_hash_index(index, copy_hash, 64)
+        assert matches[0] == (os.path.join(IMAGE_DIR, "baboon.png"), 0)
+        assert [distance for _, distance in matches] == sorted(
+            hamming_distance(copy_hash, int(value)) for value in index["hashes"])
+        assert len(query_hash_index(index, copy_hash, 10)) == 1
+
+        save_hash_index(index, str(tmp_path / "index.npz"))
+        loaded = load_hash_index(str(tmp_path / "index.npz"))
+        assert loaded["paths"] == index["paths"]
+        assert loaded["hash_function"] == hash_function
+        assert np.array_equal(loaded["hashes"], index["hashes"])
+
+def test_find_near_matches_compares_pixels(tmp_path):
+    """The near matches of the same size are compared pixel by pixel"""
+
+    reference = str(tmp_path / "reference.png")
+    shutil.copy(os.path.join(IMAGE_DIR, "baboon.png"), reference)
+    index = build_hash_index([reference, os.path.join(IMAGE_DIR, "lena.bmp")])
+    image = cv2.imread(reference)
+    image[100:110, 100:110] = 0
+
+    matches = find_near_matches(image, index)
+
+    assert [(path, distance) for path, distance, _ in matches] == [(reference, 0)]
+    assert matches[0][2].changed_pixels == np.count_nonzero(
+        cv2.imread(reference)[100:110, 100:110].any(axis = 2))
@@ -0,0 +1,80 @@
+"""
+Program: Odin Digital
+Tests of the core image functions
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from core import find_template, load_preview
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_find_template_gray_and_bgra():
+    """Single-channel and BGRA images and templates are matched within a
+    region, as color images are
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    roi = (100, 120, 300, 200)
+    expected = ((180, 200), (244, 264))
+    template = image[200:264, 180:244]
+
+    for convert in (cv2.COLOR_BGR2GRAY, cv2.COLOR_BGR2BGRA):
+        assert find_template(cv2.cvtColor(image, convert),
+            cv2.cvtColor(template, convert), None, roi) == expected
+    assert find_template(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), template, None,
+        roi) == expected
+
+def write_jpeg(path, width, height):
+    """Writes a gradient JPEG file
+
+    Args:
+        path (str): path of the file
+        width (int): width of the image
+        height (int): height of the image
+    """
+
+    image = np.zeros((height, width, 3), np.uint8)
+    image[..., 0] = np.linspace(0, 255, width, dtype = np.uint8)
+    image[..., 1] = np.linspace(0, 255, height, dtype = np.uint8)[:, None]
+    cv2.imwrite(path, image)
+
+def test_load_preview_fits_size(tmp_path):
+    """JPEG files are decoded at reduced resolution and fit the size"""
+
+    path = str(tmp_path / "large.jpg")
+    write_jpeg(path, 4000, 3000)
+
+    preview = load_preview(path, 400, 400)
+
+    assert preview.shape == (300, 400, 3)
+
+def test_load_preview_decompression_bomb(tmp_path, monkeypatch):
+    """Images too large for PIL are decoded by OpenCV and still downscaled"""
+
+    path = str(tmp_path / "bomb.jpg")
+    write_jpeg(path, 1000, 800)
+    # PIL raises DecompressionBombError above twice the limit
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+    preview = load_preview(path, 100, 100)
+
+    assert preview.shape == (80, 100, 3)
+
+def test_load_preview_unreadable(tmp_path):
+    """Files that are not images give None"""
+
+    path = tmp_path / "text.jpg"
+    path.write_text("not an image")
+
+    assert load_preview(str(path), 100, 100) is None
@@ -0,0 +1,113 @@
+"""
+Program: Odin Digital
+Tests of the encoding of images
+"""
+
+# IMPORTS
+
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import encoding
+from encoding import Output, SaveQueue, encoder_params, write_image, write_outputs
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_write_image_formats(tmp_path):
+    """Every format is written with its settings and reads back, losslessly
+    for the lossless ones
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+
+    for name, settings in (("out.png", {"png_compression": 9}), ("out.tif", None),
+        ("out.webp", {"webp_lossless": True}), ("out.jpg", {"jpeg_quality": 80})):
+        path = str(tmp_path / name)
+        assert write_image(path, image, settings) == os.path.getsize(path)
+        read = cv2.imread(path)
+        if name == "out.jpg":
+            assert cv2.absdiff(read, image).mean() < 10
+        else:
+            assert np.array_equal(read, image)
+
+    assert os.path.getsize(tmp_path / "out.jpg") < write_image(str(tmp_path / "best.jpg"),
+        image, {"jpeg_quality": 100})
+    with pytest.raises(ValueError):
+        encoder_params(".png", {"png_compression": 10})
+    with pytest.raises(ValueError):
+        encoder_params(".png", {"gif_colors": 16})
+
+def test_write_image_is_atomic(tmp_path, monkeypatch):
+    """A failed write leaves the previous file as it was and no temporary
+    file
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    path = str(tmp_path / "out.png")
+    write_image(path, image)
+    previous = (tmp_path / "out.png").read_bytes()
+
+    def failing_replace(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        write_image(path, np.zeros_like(image))
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError):
+        write_image(str(tmp_path / "out.unknown"), image)
+
+    assert (tmp_path / "out.png").read_bytes() == previous
+    assert sorted(os.listdir(tmp_path)) == ["out.png"]
+
+def test_write_outputs_sizes(tmp_path):
+    """Every output is written in its format and size, in parallel"""
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    outputs = [Output(str(tmp_path / "full.png")),
+        Output(str(tmp_path / "half.webp"), {"webp_quality": 80}, (256, 256)),
+        Output(str(tmp_path / "thumb.jpg"), size = (64, 32))]
+
+    sizes = write_outputs(image, outputs, workers = 3)
+
+    assert sizes == [os.path.getsize(output.path) for output in outputs]
+    assert np.array_equal(cv2.imread(outputs[0].path), image)
+    assert cv2.imread(outputs[1].path).shape == (256, 256, 3)
+    assert cv2.imread(outputs[2].path).shape == (32, 32, 3)
+
+def test_save_queue(tmp_path, monkeypatch):
+    """The queue writes in the background, counts the pending images and
+    reports the errors in the futures
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    release = threading.Event()
+    write = encoding.write_image
+
+    def blocked_write(path, image, settings = None):
+        release.wait()
+        return write(path, image, settings)
+
+    monkeypatch.setattr(encoding, "write_image", blocked_write)
+
+    with SaveQueue(workers = 2) as saves:
+        jobs = [saves.submit(image, str(tmp_path / f"{index}.png")) for index in range(4)]
+        failed = saves.submit(image, str(tmp_path / "missing" / "out.png"))
+        assert saves.pending == 5 and not saves.wait(0.05)
+        release.set()
+        assert saves.wait(10)
+        assert saves.pending == 0
+
+    assert [job.result() for job in jobs] == [os.path.getsize(tmp_path / f"{index}.png")
+        for index in range(4)]
+    assert isinstance(failed.exception(), OSError)
+    assert not os.path.exists(tmp_path / "missing")
@@ -0,0 +1,91 @@
+"""
+Program: Odin Digital
+Tests of the geometric transforms
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+
+from core import rotate_without_cropping
+from geometry import (apply_transform, compose_transforms, crop_transform, rotation_transform,
+    scale_transform)
+from pipeline import Pipeline
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_anisotropic_downscale_prefilters_shrunk_axis():
+    """A downscale along one axis averages along that axis only, as
+    cv2.resize with INTER_AREA does
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+
+    for size in [(48, 512), (512, 40)]:
+        transformed = apply_transform(image, scale_transform((512, 512), size))
+        expected = cv2.resize(image, size, interpolation = cv2.INTER_AREA)
+        difference = cv2.absdiff(transformed, expected)
+        assert transformed.shape == expected.shape
+        assert difference.mean() < 5 and difference.max() < 64
+
+def test_fused_resize_keeps_unscaled_axis():
+    """Lines along the axis that is not scaled stay sharp when a resize and
+    a rotation are fused
+    """
+
+    stripes = np.zeros((1000, 1000), np.uint8)
+    stripes[::2] = 255
+
+    transformed = Pipeline().resize(100, 1000).rotate(90).run(stripes)
+
+    expected = cv2.rotate(cv2.resize(stripes, (100, 1000), interpolation = cv2.INTER_AREA),
+        cv2.ROTATE_90_COUNTERCLOCKWISE)
+    assert np.array_equal(transformed, expected)
+
+def test_right_angle_rotations_are_exact():
+    """Rotations by right angles, alone or composed, move the pixels without
+    resampling them
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))[:300, :451]
+    size = (451, 300)
+
+    for angle, code in ((90, cv2.ROTATE_90_COUNTERCLOCKWISE), (180, cv2.ROTATE_180),
+        (270, cv2.ROTATE_90_CLOCKWISE), (-90, cv2.ROTATE_90_CLOCKWISE),
+        (450, cv2.ROTATE_90_COUNTERCLOCKWISE)):
+        assert np.array_equal(rotate_without_cropping(image, angle), cv2.rotate(image, code))
+
+    half_turn = compose_transforms(rotation_transform(size, 90),
+        rotation_transform((300, 451), 90))
+    assert np.array_equal(apply_transform(image, half_turn), cv2.rotate(image, cv2.ROTATE_180))
+    full_turn = compose_transforms(rotation_transform(size, 90),
+        rotation_transform((300, 451), 270))
+    assert np.array_equal(apply_transform(image, full_turn), image)
+
+def test_composed_transforms_match_steps():
+    """A composed crop and resize, and a composed resize and rotation, give
+    the images of the transforms applied one after the other
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))[:300, :451]
+
+    cropped = apply_transform(image, compose_transforms(crop_transform(10, 20, 100, 50),
+        scale_transform((100, 50), (300, 150))), cv2.INTER_LINEAR)
+    expected = cv2.resize(image[20:70, 10:110], (300, 150), interpolation = cv2.INTER_LINEAR)
+    # the border pixels interpolate with the pixels around the crop
+    assert cropped.shape == expected.shape
+    assert cv2.absdiff(cropped, expected)[2:-2, 2:-2].max() <= 1
+
+    rotated = apply_transform(image, compose_transforms(scale_transform((451, 300), (902, 600)),
+        rotation_transform((902, 600), 30)))
+    expected = rotate_without_cropping(cv2.resize(image, (902, 600),
+        interpolation = cv2.INTER_LINEAR), 30)
+    assert rotated.shape == expected.shape
+    assert cv2.absdiff(rotated, expected).mean() < 2
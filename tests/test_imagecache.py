@@ -0,0 +1,109 @@
+"""
+Program: Odin Digital
+Tests of the cache of decoded images
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import imagecache
+from imagecache import cache_info, clear_cache, read_image, set_cache_limit
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+@pytest.fixture(autouse = True)
+def empty_cache():
+    """Runs every test with an empty cache of the default size and without
+    a raw cache
+    """
+
+    raw_cache = cache_info()["raw_cache"]
+    imagecache.set_raw_cache(None)
+    clear_cache()
+    yield
+    set_cache_limit(imagecache.DEFAULT_MAX_BYTES)
+    imagecache.set_raw_cache(raw_cache)
+    clear_cache()
+
+def write_image(path, value, size = 32):
+    """Writes a PNG file of a single gray level
+
+    Args:
+        path (str): path of the file
+        value (int): gray level of every pixel
+        size (int): width and height of the image
+    """
+
+    cv2.imwrite(path, np.full((size, size, 3), value, np.uint8))
+
+def test_read_image_hits():
+    """A second read returns the cached read-only image"""
+
+    path = os.path.join(IMAGE_DIR, "baboon.png")
+
+    image = read_image(path)
+
+    assert read_image(path) is image
+    assert not image.flags.writeable
+    assert read_image(path, cv2.IMREAD_GRAYSCALE).ndim == 2
+    assert cache_info()["hits"] == 1 and cache_info()["misses"] == 2
+
+def test_least_recently_used_eviction(tmp_path):
+    """The least recently used image is evicted to make room, images larger
+    than the limit are not cached
+    """
+
+    paths = [str(tmp_path / f"{name}.png") for name in "abc"]
+    for value, path in enumerate(paths):
+        write_image(path, value)
+    set_cache_limit(2 * 32 * 32 * 3)
+
+    first = read_image(paths[0])
+    read_image(paths[1])
+    assert read_image(paths[0]) is first
+    read_image(paths[2])
+
+    info = cache_info()
+    assert info["evictions"] == 1 and info["images"] == 2 and info["bytes"] == 2 * 32 * 32 * 3
+    assert read_image(paths[0]) is first
+    misses = cache_info()["misses"]
+    read_image(paths[1])
+    assert cache_info()["misses"] == misses + 1
+
+    large = str(tmp_path / "large.png")
+    write_image(large, 0, 64)
+    read_image(large)
+    assert cache_info()["bytes"] <= 2 * 32 * 32 * 3
+    set_cache_limit(0)
+    assert cache_info()["images"] == 0
+
+def test_changed_file_is_decoded_again(tmp_path):
+    """An image is decoded again when its file is modified, even with the
+    same size, and is then cached in place of the old one
+    """
+
+    path = str(tmp_path / "image.png")
+    write_image(path, 10)
+    old = read_image(path)
+    stat = os.stat(path)
+
+    write_image(path, 200)
+    assert os.stat(path).st_size == stat.st_size
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    new = read_image(path)
+
+    assert old[0, 0, 0] == 10 and new[0, 0, 0] == 200
+    assert read_image(path) is new
+    assert cache_info()["images"] == 1 and cache_info()["bytes"] == new.nbytes
+
+    os.remove(path)
+    assert read_image(path) is None
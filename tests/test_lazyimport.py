@@ -0,0 +1,77 @@
+"""
+Program: Odin Digital
+Tests of the lazy imports
+"""
+
+# IMPORTS
+
+import os
+import subprocess
+import sys
+
+# CONSTANTS
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# modules imported by executing tkinter, NumPy, PIL.Image and OpenCV
+EXECUTED_MARKERS = ["_tkinter", "numpy._core", "PIL._imaging", "cv2.data"]
+
+# FUNCTIONS
+
+def run_python(code):
+    """Runs Python code in a new interpreter, with src on the path
+
+    Args:
+        code (str): code to run
+
+    Returns:
+        str: standard output
+    """
+
+    return subprocess.run([sys.executable, "-c", code], cwd = SOURCE_DIR, check = True,
+        capture_output = True, text = True).stdout
+
+def test_import_odindigital_executes_no_heavy_module():
+    """Importing the interface registers tkinter, its submodules, NumPy, PIL
+    and OpenCV without executing them
+    """
+
+    output = run_python("import sys, odindigital\n"
+        f"print([name for name in {EXECUTED_MARKERS!r} if name in sys.modules])")
+
+    assert output.strip() == "[]"
+
+def test_lazy_submodule_loads_on_use():
+    """A lazy submodule and its lazy parent load on first use, and the
+    submodule is an attribute of its parent as with import
+    """
+
+    output = run_python("import sys\n"
+        "from lazyimport import lazy_import\n"
+        "filedialog = lazy_import('tkinter.filedialog')\n"
+        "print('_tkinter' in sys.modules)\n"
+        "print(callable(filedialog.askopenfilename), '_tkinter' in sys.modules)\n"
+        "import tkinter\n"
+        "print(tkinter.filedialog is filedialog)")
+
+    assert output.split() == ["False", "True", "True", "True"]
+
+def test_lazy_module_first_use_in_threads():
+    """Threads that use a lazy module first at the same time all wait for it
+    to be executed, as the preview and the full image of the interface do
+    """
+
+    output = run_python("import threading\n"
+        "from concurrent import futures\n"
+        "from lazyimport import lazy_import\n"
+        "cv2 = lazy_import('cv2')\n"
+        "np = lazy_import('numpy')\n"
+        "barrier = threading.Barrier(8)\n"
+        "def first_use(index):\n"
+        "    barrier.wait()\n"
+        "    if index % 2:\n"
+        "        return (cv2.IMREAD_COLOR, np.dtype(np.uint8).itemsize)\n"
+        "    return (np.zeros(1).size, cv2.COLOR_BGR2GRAY)\n"
+        "with futures.ThreadPoolExecutor(8) as executor:\n"
+        "    print(sorted(set(executor.map(first_use, range(8)))))")
+
+    assert output.strip() == "[(1, 1), (1, 6)]"
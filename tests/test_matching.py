@@ -0,0 +1,123 @@
+"""
+Program: Odin Digital
+Tests of the matching of several templates
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+
+from matching import (Detection, choose_correlation, match_templates,
+    non_maximum_suppression, prepare_scene, score_map)
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_choose_correlation():
+    """Templates that are a sizeable part of the scene are correlated with
+    Fourier transforms, smaller ones only when the transform is shared
+    """
+
+    assert choose_correlation((512, 512), (64, 64)) == "spatial"
+    assert choose_correlation((512, 512), (64, 64), shared = True) == "fft"
+    assert choose_correlation((512, 512), (200, 200)) == "fft"
+    assert choose_correlation((512, 512), (16, 16), shared = True) == "spatial"
+
+def make_scene():
+    """Builds a scene holding two templates of the baboon image, one of them
+    also enlarged and the other one rotated
+
+    Returns:
+        tuple (numpy.ndarray, list of numpy.ndarray): scene and templates
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    templates = [image[100:164, 200:264], image[300:364, 50:114]]
+
+    scene = np.random.default_rng(0).integers(0, 256, (400, 420, 3), dtype = np.uint8)
+    scene = cv2.GaussianBlur(scene, (0, 0), 2)
+    scene[60:124, 50:114] = templates[0]
+    scene[40:136, 250:346] = cv2.resize(templates[0], (96, 96), interpolation = cv2.INTER_LINEAR)
+    scene[250:314, 100:164] = np.rot90(templates[1])
+
+    return (scene, templates)
+
+def test_match_templates_scales_and_angles():
+    """Every placed variant is found once, with its template, scale, angle
+    and location
+    """
+
+    scene, templates = make_scene()
+
+    detections = match_templates(scene, templates, scales = (1.0, 1.5), angles = (0, 90),
+        threshold = 0.7)
+
+    assert sorted((detection.template, detection.scale, detection.angle, detection.x,
+        detection.y, detection.width) for detection in detections) == [
+        (0, 1.0, 0, 50, 60, 64), (0, 1.5, 0, 250, 40, 96), (1, 1.0, 90, 100, 250, 64)]
+    assert all(detection.score > 0.99 for detection in detections)
+    assert [detection.score for detection in detections] == sorted(
+        (detection.score for detection in detections), reverse = True)
+
+def test_non_maximum_suppression():
+    """Detections overlapping a better one beyond the overlap are dropped,
+    the others are kept, best first
+    """
+
+    best = Detection(10, 10, 20, 20, 0.9, 0, 1.0, 0)
+    overlapping = Detection(12, 12, 20, 20, 0.8, 1, 1.0, 0)
+    touching = Detection(25, 10, 20, 20, 0.85, 0, 1.0, 0)
+    apart = Detection(100, 100, 20, 20, 0.7, 0, 1.0, 0)
+
+    kept = non_maximum_suppression([apart, overlapping, touching, best], 0.3)
+
+    assert kept == [best, touching, apart]
+
+def test_score_map_matches_opencv():
+    """Both correlation methods give the scores of cv2.matchTemplate with
+    TM_CCOEFF_NORMED, and flat windows score 0
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"), cv2.IMREAD_GRAYSCALE)
+    scene = prepare_scene(image)
+
+    for template in (image[100:164, 200:264], image[50:300, 100:400]):
+        expected = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        for method in ("spatial", "fft"):
+            scores = score_map(scene, template.astype(np.float32), method)
+            assert scores.shape == expected.shape
+            assert np.abs(scores - expected).max() < 1e-4
+
+    flat = image.copy()
+    flat[:100, :100] = 128
+    for method in ("spatial", "fft"):
+        scores = score_map(prepare_scene(flat), image[200:232, 200:232].astype(np.float32),
+            method)
+        assert not scores[:60, :60].any()
+
+def test_match_templates_methods_agree():
+    """The detections are the same with either correlation method and with
+    a scene prepared once and shared between calls
+    """
+
+    scene, templates = make_scene()
+    prepared = prepare_scene(scene)
+
+    results = [match_templates(scene, templates, (1.0, 1.5), (0, 90), 0.7, method = method)
+        for method in ("spatial", "fft")]
+    results += [match_templates(scene, [template], (1.0, 1.5), (0, 90), 0.7, scene = prepared)
+        for template in templates]
+
+    def locations(detections):
+        return sorted((detection.scale, detection.angle, detection.x, detection.y)
+            for detection in detections)
+
+    assert locations(results[0]) == locations(results[1])
+    assert locations(results[0]) == locations(results[2] + results[3])
+    assert "spectrum" in prepared
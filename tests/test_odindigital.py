@@ -0,0 +1,209 @@
+"""
+Program: Odin Digital
+Tests of the graphical interface code that runs without a display
+"""
+
+# IMPORTS
+
+import os
+import types
+
+import cv2
+import numpy as np
+
+import odindigital
+from resizing import RESIZE_MODES
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def fake_tk(widgets, scheduled):
+    """Builds a stand-in of the tkinter module for the dialogs
+
+    Args:
+        widgets (list): list the widgets created are appended to
+        scheduled (list): list the callbacks given to after are appended to
+
+    Returns:
+        types.SimpleNamespace: widgets and constants used by the dialogs
+    """
+
+    def make(widget_class):
+        def create(*args, **options):
+            widget = widget_class(args, options, scheduled)
+            widgets.append(widget)
+            return widget
+        return create
+
+    return types.SimpleNamespace(Toplevel = make(FakeWidget), Frame = make(FakeWidget),
+        Label = make(FakeWidget), Button = make(FakeWidget), Scale = make(FakeScale),
+        Entry = make(FakeEntry), OptionMenu = make(FakeOptionMenu), StringVar = FakeVariable,
+        HORIZONTAL = "horizontal", LEFT = "left", RIGHT = "right")
+
+def test_color_to_gray_bgra(monkeypatch):
+    """BGRA images are converted to gray as the other tools convert them"""
+
+    shown = []
+    image = cv2.cvtColor(cv2.imread(os.path.join(IMAGE_DIR, "baboon.png")), cv2.COLOR_BGR2BGRA)
+    monkeypatch.setattr(odindigital, "open_image_dialog", lambda initial_dir, title: image)
+    monkeypatch.setattr(odindigital, "display_image",
+        lambda image, title: shown.append((title, image)))
+
+    assert odindigital.color_to_gray()
+    assert shown[-1][0] == "Gray image"
+    assert np.array_equal(shown[-1][1], cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY))
+
+def test_process_region_single_channel(monkeypatch):
+    """The gray tool checks the region, not the whole image, and the match
+    tool draws its result on single-channel images
+    """
+
+    shown = []
+    warnings = []
+    monkeypatch.setattr(odindigital, "display_image",
+        lambda image, title: shown.append((title, image)))
+    monkeypatch.setattr(odindigital, "messagebox",
+        types.SimpleNamespace(showwarning = lambda **kwargs: warnings.append(kwargs)))
+    monkeypatch.setattr(odindigital, "run_job",
+        lambda title, function, *args, on_done: on_done(function(*args)))
+
+    # a color image whose region is gray
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    image[100:200, 100:200] = 128
+    odindigital.process_region(types.SimpleNamespace(image = image, roi = (100, 100, 100, 100)),
+        "gray")
+    assert len(warnings) == 1 and not shown
+    odindigital.process_region(types.SimpleNamespace(image = image, roi = (0, 0, 100, 100)),
+        "gray")
+    assert shown[-1][0] == "Gray region" and shown[-1][1].shape == (100, 100)
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    monkeypatch.setattr(odindigital, "open_image_dialog",
+        lambda initial_dir, title: np.ascontiguousarray(gray[250:314, 300:364]))
+    odindigital.process_region(types.SimpleNamespace(image = gray, roi = (200, 200, 250, 200)),
+        "match")
+    title, detection = shown[-1]
+    assert title == "Detection" and detection.shape == gray.shape + (3,)
+    assert tuple(detection[250, 330]) == (0, 255, 0)
+
+def test_resize_image(monkeypatch):
+    """The preview and the Resize! button of the dialog resize the image to
+    the size and mode that are entered
+    """
+
+    widgets, scheduled, shown, previews = [], [], [], []
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    monkeypatch.setattr(odindigital, "tk", fake_tk(widgets, scheduled))
+    monkeypatch.setattr(odindigital, "open_image_dialog", lambda initial_dir, title: image)
+    monkeypatch.setattr(odindigital, "display_image",
+        lambda image, title, window = None: shown.append((title, image)))
+    monkeypatch.setattr(odindigital, "image_cv2_to_tk", previews.append)
+    monkeypatch.setattr(odindigital, "run_job",
+        lambda title, function, *args, on_done: on_done(function(*args)))
+
+    odindigital.resize_image()
+    entries = [widget for widget in widgets if isinstance(widget, FakeEntry)]
+    mode = next(widget.args[1] for widget in widgets if isinstance(widget, FakeOptionMenu))
+    button = next(widget for widget in widgets
+        if isinstance(widget, FakeWidget) and widget.options.get("text") == "Resize!")
+
+    for resize_mode in RESIZE_MODES:
+        mode.set(resize_mode)
+        entries[0].options["textvariable"].set("300")
+        entries[1].options["textvariable"].set("200")
+        scheduled[-1]()
+        button.options["command"]()
+
+        expected = odindigital.resize(image, 300, 200, resize_mode)
+        assert shown[-1][0] == "Resized image"
+        assert np.array_equal(shown[-1][1], expected)
+        preview = previews[-1]
+        assert max(preview.shape[:2]) <= odindigital.LIVE_PREVIEW_SIZE
+        assert abs(preview.shape[1] / preview.shape[0]
+            - expected.shape[1] / expected.shape[0]) < 0.02
+        shrunk = cv2.resize(expected, (preview.shape[1], preview.shape[0]),
+            interpolation = cv2.INTER_AREA)
+        assert cv2.absdiff(preview, shrunk).mean() < 8
+
+def test_resize_path():
+    """The calls of the preview and of the resize job give images of the
+    requested size in every mode
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    proxy_image = odindigital.make_preview(image, odindigital.LIVE_PREVIEW_SIZE,
+        odindigital.LIVE_PREVIEW_SIZE)
+
+    for mode in RESIZE_MODES:
+        preview = odindigital.resize(proxy_image, 150, 100, mode)
+        resized = odindigital.resize(image, 300, 200, mode)
+        if mode == "fit":
+            assert max(resized.shape[1] / 300, resized.shape[0] / 200) == 1
+        else:
+            assert resized.shape[:2] == (200, 300)
+            assert preview.shape[:2] == (100, 150)
+
+# CLASSES
+
+class FakeWidget:
+    """Widget that records its options and accepts any layout call"""
+
+    def __init__(self, args, options, scheduled):
+        self.args = args
+        self.options = options
+        self.scheduled = scheduled
+
+    def __getattr__(self, name):
+        return lambda *args, **options: None
+
+    def after(self, delay, callback):
+        """Records a callback instead of scheduling it"""
+
+        self.scheduled.append(callback)
+        return len(self.scheduled)
+
+class FakeEntry(FakeWidget):
+    """Entry whose text is that of its variable"""
+
+    def get(self):
+        """Gets the text of the entry"""
+
+        return self.options["textvariable"].get()
+
+class FakeOptionMenu(FakeWidget):
+    """Option menu, whose variable is its second argument"""
+
+class FakeScale(FakeWidget):
+    """Scale that calls its command when it is set"""
+
+    def set(self, value):
+        """Sets the scale and calls its command"""
+
+        self.options["command"](value)
+
+class FakeVariable:
+    """tkinter.StringVar that calls its traces when it is set"""
+
+    def __init__(self, value = ""):
+        self.value = value
+        self.traces = []
+
+    def get(self):
+        """Gets the value"""
+
+        return self.value
+
+    def set(self, value):
+        """Sets the value and calls the traces"""
+
+        self.value = str(value)
+        for trace in self.traces:
+            trace()
+
+    def trace_add(self, mode, callback):
+        """Adds a trace"""
+
+        self.traces.append(callback)
@@ -0,0 +1,97 @@
+"""
+Program: Odin Digital
+Tests of the image processing pipelines
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from core import find_template, to_gray
+from pipeline import Pipeline
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_gray_of_every_channel_count():
+    """The gray operation converts color and BGRA images as core.to_gray
+    does and keeps single-channel images, reusing its buffer across runs
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    pipeline = Pipeline().gray().canny(50, 120)
+
+    for converted in (image, cv2.cvtColor(image, cv2.COLOR_BGR2BGRA), gray, gray[..., None]):
+        assert np.array_equal(Pipeline().gray().run(converted), to_gray(converted))
+        for _ in range(2):
+            assert np.array_equal(pipeline.run(converted), cv2.Canny(gray, 50, 120))
+
+def test_optimized_steps():
+    """Grayscale conversions move before the resizes and rotations, repeated
+    ones are dropped and the resizes and rotations are fused
+    """
+
+    pipeline = Pipeline().resize(300, 200).gray().rotate(30).gray().canny(50, 120).gray()
+
+    steps = pipeline.optimized_steps()
+
+    assert [step["operation"] for step in steps] == ["gray", "transform", "canny"]
+    assert steps[1]["steps"] == pipeline.steps[0:1] + pipeline.steps[2:3]
+
+def test_fused_run_matches_steps():
+    """A fused pipeline gives, up to rounding, the image of its operations
+    run one after the other
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    pipeline = Pipeline().resize(300, 200).rotate(30).gray()
+
+    expected = image
+    for step in pipeline.steps:
+        expected = Pipeline([step]).run(expected)
+    fused = pipeline.run(image)
+
+    assert fused.shape == expected.shape
+    assert cv2.absdiff(fused, expected).mean() < 4
+
+def test_json_round_trip(tmp_path):
+    """A pipeline saved to JSON and loaded back has the same operations and
+    gives the same image and detections
+    """
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "match_image.png"))
+    template_path = os.path.join(IMAGE_DIR, "match_template.png")
+    pipeline = (Pipeline().resize(480, mode = "fit").rotate(90).match(template_path)
+        .gray().canny(50, 120))
+
+    path = str(tmp_path / "pipeline.json")
+    pipeline.save(path)
+    loaded = Pipeline.load(path)
+
+    assert loaded.steps == pipeline.steps
+    assert Pipeline.from_json(pipeline.to_json()).steps == pipeline.steps
+    assert np.array_equal(loaded.run(image), pipeline.run(image))
+    assert loaded.detections and loaded.detections == pipeline.detections
+    with pytest.raises(ValueError):
+        Pipeline([{"operation": "blur"}])
+
+def test_match_records_detection():
+    """The match operation draws and records the detection of find_template"""
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "match_image.png"))
+    template_path = os.path.join(IMAGE_DIR, "match_template.png")
+    pipeline = Pipeline().match(template_path)
+
+    result = pipeline.run(image)
+
+    assert pipeline.detections == [find_template(image, cv2.imread(template_path))]
+    assert result.shape == image.shape and not np.array_equal(result, image)
+    assert np.array_equal(cv2.imread(os.path.join(IMAGE_DIR, "match_image.png")), image)
@@ -0,0 +1,131 @@
+"""
+Program: Odin Digital
+Tests of the memory-mapped cache of decoded images
+"""
+
+# IMPORTS
+
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+import imagecache
+from rawcache import RAW_EXTENSION, build_raw, main, open_raw, prune_raw, raw_path
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def copy_image(tmp_path, name):
+    """Copies an image of the corpus to a temporary directory
+
+    Args:
+        tmp_path (pathlib.Path): temporary directory
+        name (str): file name of the image in IMAGE_DIR
+
+    Returns:
+        str: path of the copy
+    """
+
+    path = str(tmp_path / name)
+    shutil.copy(os.path.join(IMAGE_DIR, name), path)
+    return path
+
+def touch(path, seconds):
+    """Moves the modification time of a file
+
+    Args:
+        path (str): path of the file
+        seconds (int): seconds added to its modification time
+    """
+
+    stat = os.stat(path)
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+def test_build_and_open_raw(tmp_path):
+    """A raw file maps the decoded pixels read-only, for every set of
+    flags, until its source changes
+    """
+
+    path = copy_image(tmp_path, "baboon.png")
+    cache_dir = str(tmp_path / "cache")
+
+    for flags in (cv2.IMREAD_COLOR, cv2.IMREAD_GRAYSCALE):
+        assert open_raw(path, cache_dir, flags) is None
+        assert build_raw(path, cache_dir, flags) == raw_path(path, cache_dir, flags)
+        image = open_raw(path, cache_dir, flags)
+        assert np.array_equal(image, cv2.imread(path, flags))
+        assert not image.flags.writeable
+
+    touch(path, 1)
+    assert open_raw(path, cache_dir) is None
+    build_raw(path, cache_dir)
+    assert np.array_equal(open_raw(path, cache_dir), cv2.imread(path))
+    assert build_raw(str(tmp_path / "missing.png"), cache_dir) is None
+    assert [name for name in os.listdir(cache_dir) if not name.endswith(RAW_EXTENSION)] == []
+
+def test_prune_raw(tmp_path):
+    """Pruning removes the raw files of changed and removed sources and the
+    invalid ones, then the oldest files beyond the size limit
+    """
+
+    cache_dir = str(tmp_path / "cache")
+    paths = [copy_image(tmp_path, name) for name in ("baboon.png", "image_a.png",
+        "image_b.png", "lena.bmp")]
+    raws = [build_raw(path, cache_dir) for path in paths]
+    with open(os.path.join(cache_dir, f"invalid{RAW_EXTENSION}"), "wb") as file:
+        file.write(b"not a raw file")
+    with open(os.path.join(cache_dir, "notes.txt"), "w", encoding = "utf-8") as file:
+        file.write("kept")
+
+    sizes = [os.path.getsize(raw) for raw in raws]
+
+    touch(paths[0], 1)
+    os.remove(paths[1])
+
+    assert prune_raw(cache_dir) == (3, sizes[0] + sizes[1] + len(b"not a raw file"))
+    assert sorted(os.listdir(cache_dir)) == sorted(["notes.txt",
+        os.path.basename(raws[2]), os.path.basename(raws[3])])
+
+    # the oldest file goes first
+    touch(raws[3], -100)
+    assert prune_raw(cache_dir, sizes[2]) == (1, sizes[3])
+    assert os.path.exists(raws[2]) and not os.path.exists(raws[3])
+
+def test_read_image_through_raw_cache(tmp_path):
+    """With a raw cache set, an image is decoded once and then mapped"""
+
+    path = copy_image(tmp_path, "lena.bmp")
+    cache_dir = str(tmp_path / "cache")
+    imagecache.set_raw_cache(cache_dir)
+    imagecache.set_cache_limit(0)
+    imagecache.clear_cache()
+    try:
+        decoded = imagecache.read_image(path)
+        mapped = imagecache.read_image(path)
+        info = imagecache.cache_info()
+    finally:
+        imagecache.set_raw_cache(None)
+        imagecache.set_cache_limit(imagecache.DEFAULT_MAX_BYTES)
+        imagecache.clear_cache()
+
+    assert np.array_equal(mapped, decoded)
+    assert info["misses"] == 1 and info["raw_hits"] == 1
+
+def test_main_build_and_prune(tmp_path, capsys):
+    """The command line builds the raw files of a directory and prunes them"""
+
+    shutil.copytree(IMAGE_DIR, tmp_path / "img")
+    cache_dir = str(tmp_path / "cache")
+
+    assert main(["--cache-dir", cache_dir, "build", str(tmp_path / "img")]) == 0
+    assert len(os.listdir(cache_dir)) == len(os.listdir(IMAGE_DIR))
+    shutil.rmtree(tmp_path / "img")
+    assert main(["--cache-dir", cache_dir, "prune"]) == 0
+
+    assert os.listdir(cache_dir) == []
+    assert "images cached" in capsys.readouterr().out
@@ -0,0 +1,103 @@
+"""
+Program: Odin Digital
+Tests of the visual regression runner
+"""
+
+# IMPORTS
+
+import json
+import multiprocessing
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import regression
+
+# CONSTANTS
+
+# compare_pair is replaced in the workers only when they are forked
+forked_workers = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+    reason = "the workers are not forked")
+
+# FUNCTIONS
+
+def make_directories(root, count):
+    """Writes a baseline and an identical candidate directory
+
+    Args:
+        root (pathlib.Path): directory where both are created
+        count (int): number of images
+
+    Returns:
+        tuple (str, str): baseline and candidate directories
+    """
+
+    baseline_dir = root / "baseline"
+    candidate_dir = root / "candidate"
+    baseline_dir.mkdir()
+    candidate_dir.mkdir()
+
+    for index in range(count):
+        image = np.full((32, 48, 3), index * 20, np.uint8)
+        cv2.imwrite(str(baseline_dir / f"{index}.png"), image)
+        cv2.imwrite(str(candidate_dir / f"{index}.png"), image)
+
+    return (str(baseline_dir), str(candidate_dir))
+
+def read_report(report_dir):
+    """Reads the JSON report of a run
+
+    Args:
+        report_dir (str): directory of the reports
+
+    Returns:
+        dict: statuses of the pairs by name
+    """
+
+    with open(os.path.join(report_dir, "report.json"), encoding = "utf-8") as file:
+        report = json.load(file)
+
+    return {result["name"]: result["status"] for result in report["results"]}
+
+def failing_pair(baseline_path, *args):
+    """compare_pair that fails with an OpenCV error on the image 1.png"""
+
+    if os.path.basename(baseline_path) == "1.png":
+        raise cv2.error("corrupt pair")
+    return {"status": "identical"}
+
+def dying_worker(*_):
+    """compare_pair whose worker process dies"""
+
+    os._exit(1)
+
+@forked_workers
+def test_pair_error_is_reported(tmp_path, monkeypatch):
+    """An unexpected error of one pair is recorded and the reports stay valid"""
+
+    baseline_dir, candidate_dir = make_directories(tmp_path, 4)
+    report_dir = str(tmp_path / "report")
+    monkeypatch.setattr(regression, "compare_pair", failing_pair)
+
+    summary = regression.run_regression(baseline_dir, candidate_dir, report_dir, workers = 1)
+
+    assert read_report(report_dir) == {"0.png": "identical", "1.png": "error",
+        "2.png": "identical", "3.png": "identical"}
+    assert summary["error"] == 1
+    with open(os.path.join(report_dir, "report.html"), encoding = "utf-8") as file:
+        assert file.read().rstrip().endswith("</html>")
+
+@forked_workers
+def test_broken_pool_is_reported(tmp_path, monkeypatch):
+    """A worker that dies fails its pairs without truncating the reports"""
+
+    baseline_dir, candidate_dir = make_directories(tmp_path, 6)
+    report_dir = str(tmp_path / "report")
+    monkeypatch.setattr(regression, "compare_pair", dying_worker)
+
+    summary = regression.run_regression(baseline_dir, candidate_dir, report_dir, workers = 1)
+
+    assert set(read_report(report_dir).values()) == {"error"}
+    assert summary["error"] == summary["pairs"] == 6
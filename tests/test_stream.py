@@ -0,0 +1,83 @@
+"""
+Program: Odin Digital
+Tests of the video and camera streams on generated video files
+"""
+
+# IMPORTS
+
+import os
+
+import cv2
+import numpy as np
+
+from stream import OUTPUT_FOURCC, FrameStream, TemplateTracker, run_stream
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+FRAMES = 40
+FRAME_SIZE = (320, 240)
+TEMPLATE_SIZE = 48
+# pixels the template moves every frame
+STEP = (6, 3)
+
+# FUNCTIONS
+
+def template_position(index):
+    """Gets the top-left corner of the template in a frame of the clip
+
+    Args:
+        index (int): index of the frame
+
+    Returns:
+        tuple (int, int): (x, y) of the template
+    """
+
+    return (10 + STEP[0] * index, 20 + STEP[1] * index)
+
+def write_clip(path, template):
+    """Writes a clip of a template moving on a plain background
+
+    Args:
+        path (str): path of the video file
+        template (numpy.ndarray): BGR template
+    """
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*OUTPUT_FOURCC), 25, FRAME_SIZE)
+    for index in range(FRAMES):
+        frame = np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), 90, np.uint8)
+        x, y = template_position(index)
+        frame[y:y + TEMPLATE_SIZE, x:x + TEMPLATE_SIZE] = template
+        writer.write(frame)
+    writer.release()
+
+def test_file_stream_and_tracking(tmp_path):
+    """Every frame of a file is decoded and processed, none is dropped, and
+    the tracked template follows the motion
+    """
+
+    template = cv2.resize(cv2.imread(os.path.join(IMAGE_DIR, "baboon.png")),
+        (TEMPLATE_SIZE, TEMPLATE_SIZE), interpolation = cv2.INTER_AREA)
+    path = str(tmp_path / "clip.avi")
+    write_clip(path, template)
+
+    tracker = TemplateTracker(template)
+    corners = {}
+
+    def process(frame):
+        corners[frame.index] = tracker.update(frame.image)
+
+    with FrameStream(path, queue_size = 2) as frames:
+        report = run_stream(frames, process)
+
+    assert frames.decoded == FRAMES
+    assert report["frames"] == FRAMES
+    assert report["dropped"] == 0
+    assert sorted(corners) == list(range(FRAMES))
+    for index, found in corners.items():
+        assert found is not None, f"template lost in frame {index}"
+        x, y = template_position(index)
+        assert abs(found[0][0] - x) <= 1 and abs(found[0][1] - y) <= 1
+        assert found[1] == (found[0][0] + TEMPLATE_SIZE, found[0][1] + TEMPLATE_SIZE)
+    # the template is only searched in the whole frame at the start
+    assert tracker.full_searches == 1
@@ -0,0 +1,90 @@
+"""
+Program: Odin Digital
+Tests of the tiled processing of large images
+"""
+
+# IMPORTS
+
+import os
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from edges import find_edges
+from resizing import resize
+from tiling import create_netpbm, process_tiled
+
+# CONSTANTS
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img")
+
+# FUNCTIONS
+
+def test_tiled_edges_match_whole_image(tmp_path):
+    """Tiled edges are those of the whole image, for any strip height"""
+
+    image = cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"))
+    expected = find_edges(image, (50, 120))
+    input_path = str(tmp_path / "baboon.ppm")
+    cv2.imwrite(input_path, image)
+
+    for strip_rows in (16, 100, 512):
+        output_path = str(tmp_path / f"edges_{strip_rows}.pgm")
+        process_tiled(input_path, output_path, "edges", thresholds = (50, 120),
+            strip_rows = strip_rows)
+        assert np.array_equal(cv2.imread(output_path, cv2.IMREAD_GRAYSCALE), expected)
+
+def test_tiled_resize_matches_whole_image(tmp_path):
+    """Tiled resizes interpolate as resizing.resize does, averaging the
+    input when shrinking, in color and in gray
+    """
+
+    image = cv2.resize(cv2.imread(os.path.join(IMAGE_DIR, "baboon.png")), (1200, 1000))
+
+    for extension, pixels in ((".ppm", image), (".pgm", cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))):
+        input_path = str(tmp_path / f"input{extension}")
+        cv2.imwrite(input_path, pixels)
+        for width, height in ((300, 250), (1200, 100), (97, 1000), (2000, 1500), (600, 1500)):
+            output_path = str(tmp_path / f"output{extension}")
+            process_tiled(input_path, output_path, "resize", width, height, strip_rows = 100)
+            difference = cv2.absdiff(cv2.imread(output_path, cv2.IMREAD_UNCHANGED),
+                resize(pixels, width, height))
+            assert difference.max() <= 1, (extension, width, height)
+
+    # one-pixel lines average to gray instead of aliasing
+    stripes = np.zeros((900, 300), np.uint8)
+    stripes[::2] = 255
+    input_path = str(tmp_path / "stripes.pgm")
+    cv2.imwrite(input_path, stripes)
+    process_tiled(input_path, str(tmp_path / "shrunk.pgm"), "resize", 100, 300, strip_rows = 32)
+    assert np.array_equal(np.unique(cv2.imread(str(tmp_path / "shrunk.pgm"),
+        cv2.IMREAD_GRAYSCALE)), [85, 170])
+
+def test_tiled_memory(tmp_path):
+    """Processing a large PGM file keeps the memory allocated by Python and
+    NumPy well below the size of the image (buffers allocated inside OpenCV
+    are not traced)
+    """
+
+    height, width = 16000, 4000
+    input_path = str(tmp_path / "large.pgm")
+    pixels = create_netpbm(input_path, height, width, 1)
+    tile = cv2.resize(cv2.imread(os.path.join(IMAGE_DIR, "baboon.png"),
+        cv2.IMREAD_GRAYSCALE), (width, 500))
+    for first in range(0, height, 500):
+        pixels[first:first + 500] = tile
+    pixels.flush()
+    del pixels
+
+    for operation, size in (("gray", None), ("resize", (2000, 8000)), ("edges", None)):
+        output_path = str(tmp_path / f"{operation}.pgm")
+        tracemalloc.start()
+        if size is None:
+            process_tiled(input_path, output_path, operation, strip_rows = 128)
+        else:
+            process_tiled(input_path, output_path, operation, *size, strip_rows = 128)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        assert peak < height * width / 4, f"{operation}: {peak} bytes"